@@ -0,0 +1,66 @@
+'''
+Episodes per second of the actor pool versus the number of worker processes.
+
+Run from the repository root:
+
+    python -m benchmarks.actor_pool --workers 0 1 2 4 8 --episodes 40
+
+0 workers plays the episodes in this process with the same acting-only agents. With --learn the learner also
+learns as train() does: it takes every finished episode waiting in the queue and pushes their transitions in bulk,
+learning once every train_every transitions, so every worker count does the same updates per transition.
+Episodes/s only grows with workers up to the number of free cores.
+'''
+import argparse
+import os
+import time
+
+from main import play_episode
+from network.actor_pool import ActorAgent, ActorPool
+from network.agent import D3QNAgent
+from network.environment import GenEnv
+
+
+def run(env: GenEnv, n_workers: int, n_episodes: int, learn: bool) -> float:
+    agent = {stage: D3QNAgent(state_size=obs, action_size=act) for (stage, (obs, act)) in env.agent_spaces.items()}
+    if n_workers == 0:
+        actors = {stage: ActorAgent(obs, act) for (stage, (obs, act)) in env.agent_spaces.items()}
+        start = time.perf_counter()
+        for _ in range(n_episodes):
+            play_episode(env, actors, eps=1.0)
+            for (stage, a) in actors.items():
+                transitions = a.flush()
+                if learn:
+                    agent[stage].extend(transitions)
+        return n_episodes / (time.perf_counter() - start)
+
+    with ActorPool(agent, play_episode, n_workers=n_workers, seed=0) as pool:
+        # the first episodes include process start-up
+        for _ in range(n_workers):
+            pool.next_episode()
+        start = time.perf_counter()
+        played = 0
+        while played < n_episodes:
+            episodes = pool.drain()
+            played += len(episodes)
+            if learn:
+                for (stage, a) in agent.items():
+                    a.extend([transition for (transitions, *_) in episodes for transition in transitions[stage]])
+        return played / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--episodes", type=int, default=20)
+    parser.add_argument("--learn", action="store_true")
+    args = parser.parse_args()
+
+    env = GenEnv()
+    print(f"{os.cpu_count()} cpus, {args.episodes} episodes per run, learning {'on' if args.learn else 'off'}")
+    print(f"{'workers':>8} {'episodes/s':>12}")
+    for n_workers in args.workers:
+        print(f"{n_workers:>8} {run(env, n_workers, args.episodes, args.learn):>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''
+Cost of checkpointing a training run with full replay buffers, see network.checkpoint.
+
+Run from the repository root:
+
+    python -m benchmarks.checkpoint --buffer-size 10000 --dir /tmp/checkpoints
+
+Reports the milliseconds training is paused by a background save (the snapshot), a complete save, and resuming
+with the replay buffers mapped versus read, next to saving and loading every agent with D3QNAgent.save/load.
+'''
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+
+from network.agent import D3QNAgent
+from network.checkpoint import Checkpointer
+from network.environment import GenEnv
+
+
+def agents(env: GenEnv, buffer_size: int, prioritized: bool) -> dict:
+    return {stage: D3QNAgent(state_size=obs, action_size=act, buffer_size=buffer_size, prioritized=prioritized)
+            for (stage, (obs, act)) in env.agent_spaces.items()}
+
+
+def timed(f) -> float:
+    start = time.perf_counter()
+    f()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buffer-size", type=int, default=10000)
+    parser.add_argument("--prioritized", action="store_true")
+    parser.add_argument("--dir", default="benchmark-checkpoints")
+    args = parser.parse_args()
+
+    env = GenEnv()
+    agent = agents(env, args.buffer_size, args.prioritized)
+    rng = np.random.default_rng(0)
+    for (stage, a) in agent.items():
+        obs = a.state_size
+        for _ in range(args.buffer_size):
+            a.memory.push(rng.integers(-1, 4, size=obs), int(rng.integers(0, a.action_size)),
+                          int(rng.integers(-3, 4)), rng.integers(-1, 4, size=obs), False)
+
+    shutil.rmtree(args.dir, ignore_errors=True)
+    checkpointer = Checkpointer(args.dir, background=True)
+    snapshot = timed(lambda: checkpointer.save(agent, episode=0))
+    checkpointer.wait()
+    checkpointer = Checkpointer(args.dir, background=False)
+    full = timed(lambda: checkpointer.save(agent, episode=1))
+    mapped = timed(lambda: checkpointer.load(agents(env, args.buffer_size, args.prioritized), mmap=True))
+    read = timed(lambda: checkpointer.load(agents(env, args.buffer_size, args.prioritized), mmap=False))
+
+    legacy = os.path.join(args.dir, "legacy")
+    os.makedirs(legacy)
+    legacy_save = timed(lambda: [a.save(f"{legacy}/{stage.name}") for (stage, a) in agent.items()])
+    fresh = agents(env, args.buffer_size, args.prioritized)
+    legacy_load = timed(lambda: [a.load(f"{legacy}/{stage.name}") for (stage, a) in fresh.items()])
+    shutil.rmtree(args.dir)
+
+    print(f"{len(agent)} agents, buffers of {args.buffer_size}" + (", prioritized" if args.prioritized else ""))
+    print(f"{'checkpoint':<28} {'ms':>10}")
+    print(f"{'background save, paused':<28} {snapshot:>10.1f}")
+    print(f"{'full save':<28} {full:>10.1f}")
+    print(f"{'load, mapped':<28} {mapped:>10.1f}")
+    print(f"{'load, read':<28} {read:>10.1f}")
+    print(f"{'D3QNAgent.save':<28} {legacy_save:>10.1f}")
+    print(f"{'D3QNAgent.load':<28} {legacy_load:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
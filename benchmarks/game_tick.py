@@ -0,0 +1,81 @@
+'''
+Micro-benchmark of Game.tick and of the CartesianPosition operations it is built from.
+
+Run from the repository root:
+
+    python -m benchmarks.game_tick --map-size 10 --densities 0 0.2 0.5
+
+Every row plays random actions on levels with the given fraction of cells holding an enemy (plus a few walls and
+healing items) and reports microseconds per tick, the best of --runs identically seeded runs. The position rows
+time the arithmetic Game.tick, Entity and Player do on every step.
+'''
+import argparse
+import random
+import time
+import timeit
+
+from game.game import Game
+from game.level import Level
+from game.position import CartesianPosition as Pos
+
+
+def make_level(map_size: int, density: float) -> Level:
+    cells = [Pos(x, y) for x in range(map_size) for y in range(map_size)]
+    cells = [pos for pos in cells if pos not in (Pos(0, 0), Pos(map_size - 1, map_size - 1))]
+    random.shuffle(cells)
+    n = int(len(cells) * density)
+    return Level(enemies=cells[:n], walls=cells[n:n + map_size], healing_items=cells[n + map_size:n + 2 * map_size],
+                 entry_point=Pos(0, 0), exit_point=Pos(map_size - 1, map_size - 1), map_size=map_size)
+
+
+def measure_tick(map_size: int, density: float, levels: int, ticks: int) -> float:
+    elapsed = 0.
+    for _ in range(levels):
+        game = Game(headless=True)
+        game.reset(level=make_level(map_size, density), health=10**6)
+        for _ in range(ticks):
+            action = random.randrange(6)
+            start = time.perf_counter()
+            game.tick(action)
+            elapsed += time.perf_counter() - start
+            game.game_over = False
+    return elapsed / (levels * ticks) * 1e6
+
+
+def measure_positions(repeat: int) -> dict[str, float]:
+    a, b = Pos(x=3, y=4), Pos(x=1, y=2)
+    cases = {
+        "Pos(x, y)": lambda: Pos(x=3, y=4),
+        "a + b": lambda: a + b,
+        "sum(a - b)": lambda: sum(a - b),
+        "a == b": lambda: a == b,
+        "(x, y) = a": lambda: tuple(a),
+    }
+    return {name: min(timeit.repeat(f, number=repeat, repeat=5)) / repeat * 1e9 for (name, f) in cases.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--map-size", type=int, default=10)
+    parser.add_argument("--densities", type=float, nargs="+", default=[0., .2, .5])
+    parser.add_argument("--levels", type=int, default=30)
+    parser.add_argument("--ticks", type=int, default=300)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'enemy density':<16} {'tick us':>10}")
+    for density in args.densities:
+        runs = []
+        for _ in range(args.runs):
+            random.seed(args.seed)
+            runs.append(measure_tick(args.map_size, density, args.levels, args.ticks))
+        print(f"{density:<16.2f} {min(runs):>10.2f}")
+    print(f"{'position op':<16} {'ns':>10}")
+    for (name, ns) in measure_positions(args.repeat).items():
+        print(f"{name:<16} {ns:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+'''
+Load test of a running level server, see serve.py.
+
+Run from the repository root, with the server started first:
+
+    python serve.py --models models &
+    python -m benchmarks.level_service --concurrency 1 8 32 --requests 200
+
+Every row keeps --concurrency requests in flight until --requests levels were received, and reports the
+throughput and the client side p50/p99 latency; the server side metrics are fetched at the end.
+'''
+import argparse
+import json
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+
+def run(url: str, concurrency: int, n_requests: int, query: str) -> tuple[float, np.ndarray]:
+    latencies = []
+    lock = threading.Lock()
+    remaining = [n_requests]
+
+    def client():
+        while True:
+            with lock:
+                if not remaining[0]:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            with urllib.request.urlopen(f"{url}/level?{query}") as response:
+                response.read()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for c in clients:
+        c.start()
+    for c in clients:
+        c.join()
+    return time.perf_counter() - start, np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--query", default="", help="level parameters, e.g. map_size=10&health=5")
+    args = parser.parse_args()
+
+    run(args.url, 1, 1, args.query)
+    print(f"{'concurrency':<12} {'levels/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for concurrency in args.concurrency:
+        elapsed, latencies = run(args.url, concurrency, args.requests, args.query)
+        print(f"{concurrency:<12} {args.requests / elapsed:>10.1f} "
+              f"{np.percentile(latencies, 50):>10.1f} {np.percentile(latencies, 99):>10.1f}")
+    with urllib.request.urlopen(f"{args.url}/metrics") as response:
+        print("server", json.loads(response.read()))
+
+
+if __name__ == '__main__':
+    main()
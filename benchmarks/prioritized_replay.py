@@ -0,0 +1,86 @@
+'''
+Uniform versus prioritized replay: cost per sampled batch, and solver success while training.
+
+Run from the repository root:
+
+    python -m benchmarks.prioritized_replay --episodes 300 --map-size 5
+
+The cost part times sample() (plus update_priorities for the prioritized buffer) on full buffers. The efficiency
+part trains the four agents with main.play_episode in both modes from the same seeds and prints the share of
+episodes in which the solver reached the exit, per window of episodes.
+'''
+import argparse
+import random
+import timeit
+
+import numpy as np
+import torch
+
+from main import play_episode
+from network.agent import D3QNAgent
+from network.environment import GenEnv
+from network.prioritized_replay_buffer import PrioritizedReplayBuffer
+from network.replay_buffer import ReplayBuffer
+
+
+def sample_cost(buffer_size, batch_size, state_size=33, repeat=500):
+    rng = np.random.default_rng(0)
+    state = rng.integers(-1, 4, size=state_size)
+    rows = []
+    for (name, buffer) in (("uniform", ReplayBuffer(buffer_size)), ("prioritized", PrioritizedReplayBuffer(buffer_size))):
+        push = timeit.timeit(lambda: buffer.push(state, 1, 0., state, False), number=buffer_size) / buffer_size
+        if isinstance(buffer, PrioritizedReplayBuffer):
+            def draw():
+                batch = buffer.sample(batch_size)
+                buffer.update_priorities(batch[6], rng.random(batch_size))
+        else:
+            def draw():
+                buffer.sample(batch_size)
+        sample = min(timeit.repeat(draw, number=repeat, repeat=3)) / repeat
+        rows.append((name, push * 1e6, sample * 1e6))
+    return rows
+
+
+def sample_efficiency(prioritized, n_episodes, window, map_size, seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    env = GenEnv(map_size=map_size)
+    agent = {stage: D3QNAgent(state_size=obs, action_size=act, prioritized=prioritized)
+             for (stage, (obs, act)) in env.agent_spaces.items()}
+    eps = 1.0
+    solved = []
+    for i_episode in range(1, n_episodes + 1):
+        play_episode(env, agent, eps)
+        solved.append(env.agent_location == env._l().end_location)
+        eps = max(0.01, 0.995 * eps)
+        if i_episode % 10 == 0:
+            for a in agent.values():
+                a.update_target_network()
+    return [float(np.mean(solved[i:i + window])) for i in range(0, n_episodes, window)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buffer-sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--episodes", type=int, default=200)
+    parser.add_argument("--window", type=int, default=50)
+    parser.add_argument("--map-size", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'buffer':>8} {'mode':<12} {'push us':>9} {'sample us':>10}")
+    for buffer_size in args.buffer_sizes:
+        for (name, push, sample) in sample_cost(buffer_size, args.batch_size):
+            print(f"{buffer_size:>8} {name:<12} {push:>9.2f} {sample:>10.2f}")
+
+    if args.episodes:
+        print(f"\nsolver success rate per {args.window} episodes, map size {args.map_size}")
+        for prioritized in (False, True):
+            rates = sample_efficiency(prioritized, args.episodes, args.window, args.map_size, args.seed)
+            print(f"{'prioritized' if prioritized else 'uniform':<12} " + " ".join(f"{r:.2f}" for r in rates))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''
+Levels per second of the NumPy rasterizer against drawing every level with pygame.
+
+Run from the repository root:
+
+    python -m benchmarks.rasterizer --levels 4096 --tile 16 4
+
+The pygame row draws every level as Game.render does, onto a surface of a hidden display, and reads the pixels
+back; the rasterizer rows draw the same levels in batches of --batch-size.
+'''
+import argparse
+import os
+import time
+
+import numpy as np
+import pygame
+
+from game.level import Level
+from game.rasterizer import rasterize, rasterize_levels
+from game.utils import Utils
+from network.vec_environment import VecGenEnv
+
+
+def random_levels(n: int, seed: int) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    env = VecGenEnv(n, seed=seed)
+    env.reset()
+    levels = env.levels(np.arange(n))
+    for layer in ('wall_map', 'enemy_map', 'heal_map', 'power_map'):
+        levels[layer] = rng.random(levels[layer].shape) < 0.15
+    return levels
+
+
+def draw_pygame(levels: list[Level]) -> float:
+    size = Utils.MAP_SIZE * Utils.TILE_SIZE
+    screen = pygame.Surface((size, size)).convert()
+    start = time.perf_counter()
+    for level in levels:
+        screen.fill((0, 0, 0))
+        level.render(screen)
+        pygame.surfarray.array3d(screen)
+    return len(levels) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, default=4096)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--tile", type=int, nargs="+", default=[16, 4])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+
+    levels = random_levels(args.levels, args.seed)
+    objects = [Level.from_arrays(*(levels[layer][i, :s, :s] for layer in ('wall_map', 'enemy_map', 'heal_map',
+                                                                         'power_map')),
+                                 start=levels["start"][i], end=levels["end"][i])
+               for (i, s) in enumerate(levels["map_size"].tolist())]
+    rasterize_levels(objects[:1])
+
+    print(f"{'renderer':<24} {'levels/s':>12}")
+    print(f"{'pygame, per level':<24} {draw_pygame(objects):>12.0f}")
+    for tile in args.tile:
+        start = time.perf_counter()
+        for first in range(0, args.levels, args.batch_size):
+            batch = {key: value[first:first + args.batch_size] for (key, value) in levels.items()}
+            rasterize(batch["wall_map"], batch["enemy_map"], batch["heal_map"], batch["power_map"], batch["start"],
+                      batch["end"], map_size=batch["map_size"], tile_size=tile)
+        rate = args.levels / (time.perf_counter() - start)
+        print(f"{f'rasterize, tile {tile}':<24} {rate:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
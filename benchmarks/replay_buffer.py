@@ -0,0 +1,88 @@
+'''
+Micro-benchmark of the array-backed ReplayBuffer against the previous deque-of-tuples implementation.
+
+Run from the repository root:
+
+    python -m benchmarks.replay_buffer --buffer-size 10000 --batch-size 64
+
+Each row reports microseconds per push, per sample, and per sample plus conversion into the tensors
+D3QNAgent.update_model trains on.
+'''
+import argparse
+import random
+import timeit
+from collections import deque
+
+import numpy as np
+import torch
+
+from network.replay_buffer import ReplayBuffer
+
+
+class DequeReplayBuffer:
+    '''
+    The ReplayBuffer implementation this benchmark compares against: tuples in a deque, random.sample and np.stack.
+    '''
+
+    def __init__(self, buffer_size=10000):
+        self.buffer = deque(maxlen=buffer_size)
+
+    def push(self, state, action, reward, next_state, done):
+        self.buffer.append((state, action, reward, next_state, done))
+
+    def sample(self, batch_size):
+        states, actions, rewards, next_states, dones = zip(*random.sample(self.buffer, batch_size))
+        return np.stack(states), actions, rewards, np.stack(next_states), dones
+
+    def __len__(self):
+        return len(self.buffer)
+
+
+def to_tensors_deque(batch):
+    states, actions, rewards, next_states, dones = batch
+    return (torch.from_numpy(states).float(),
+            torch.from_numpy(np.array(actions)).long(),
+            torch.from_numpy(np.array(rewards)).float(),
+            torch.from_numpy(next_states).float(),
+            torch.from_numpy(np.array(dones).astype(np.uint8)).float())
+
+
+def to_tensors_array(batch):
+    return tuple(torch.from_numpy(a) for a in batch)
+
+
+def measure(buffer, to_tensors, transitions, batch_size, repeat):
+    it = iter(transitions * 2)
+    push = min(timeit.repeat(lambda: buffer.push(*next(it)), number=len(transitions) // 10, repeat=5))
+    push /= len(transitions) // 10
+    while len(buffer) < len(transitions):
+        buffer.push(*next(it))
+    sample = min(timeit.repeat(lambda: buffer.sample(batch_size), number=repeat, repeat=5)) / repeat
+    convert = min(timeit.repeat(lambda: to_tensors(buffer.sample(batch_size)), number=repeat, repeat=5)) / repeat
+    return push * 1e6, sample * 1e6, convert * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buffer-size", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--state-size", type=int, default=33)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    rng = np.random.default_rng(0)
+    transitions = [(rng.integers(-1, 4, size=args.state_size), int(rng.integers(0, 8)), int(rng.integers(-3, 4)),
+                    rng.integers(-1, 4, size=args.state_size), bool(rng.random() < 0.01))
+                   for _ in range(args.buffer_size)]
+
+    print(f"buffer {args.buffer_size}, batch {args.batch_size}, state {args.state_size}")
+    print(f"{'implementation':<16} {'push us':>10} {'sample us':>10} {'sample+tensor us':>17}")
+    for (name, buffer, to_tensors) in (("deque", DequeReplayBuffer(args.buffer_size), to_tensors_deque),
+                                       ("array", ReplayBuffer(args.buffer_size), to_tensors_array)):
+        push, sample, convert = measure(buffer, to_tensors, transitions, args.batch_size, args.repeat)
+        print(f"{name:<16} {push:>10.2f} {sample:>10.2f} {convert:>17.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+'''
+Deterministic benchmark suite of the game and training hot paths, with JSON results and a baseline comparison.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --out baseline.json
+    python -m benchmarks.suite --out current.json --baseline baseline.json --threshold 0.1
+
+Every case is set up right after seeding ``random`` (which Level draws its entry and exit from and D3QNAgent
+seeds its generator from), NumPy's global RNG (which Level draws its ground tiles from) and torch, so every run
+does the same work. A case is timed as a warm-up round and --rounds rounds of a fixed number of calls, and reports
+the median, min and max microseconds per call over the rounds. With --baseline, every case whose --statistic (the
+min by default, the least disturbed by other load on the machine) is more than --threshold slower than the
+baseline's is flagged as a regression and the exit status is 1.
+
+The other modules of benchmarks/ compare implementations and settings in more depth; this suite tracks one
+configuration of each hot path over time.
+'''
+import argparse
+import itertools
+import json
+import platform
+import random
+import re
+import statistics
+import sys
+import time
+
+import numpy as np
+import torch
+
+from main import play_episode
+from game.game import Game
+from game.level import Level
+from game.position import CartesianPosition as Pos
+from network.agent import D3QNAgent
+from network.environment import GenEnv
+from network.prioritized_replay_buffer import PrioritizedReplayBuffer
+from network.replay_buffer import ReplayBuffer
+
+MAP_SIZE = 10
+STATE_SIZE = 33
+BUFFER_SIZE = 10000
+BATCH_SIZE = 64
+TRAIN_EPISODES = 4
+
+
+def seed_everything(seed: int):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def _level() -> Level:
+    cells = [Pos(x, y) for x in range(MAP_SIZE) for y in range(MAP_SIZE)]
+    cells = [pos for pos in cells if pos not in (Pos(0, 0), Pos(MAP_SIZE - 1, MAP_SIZE - 1))]
+    random.shuffle(cells)
+    return Level(walls=cells[:15], enemies=cells[15:35], healing_items=cells[35:40], power_items=cells[40:45],
+                 entry_point=Pos(0, 0), exit_point=Pos(MAP_SIZE - 1, MAP_SIZE - 1), map_size=MAP_SIZE)
+
+
+def _transitions(buffer, n: int):
+    rng = np.random.default_rng(0)
+    for _ in range(n):
+        buffer.push(rng.integers(-1, 4, size=STATE_SIZE), int(rng.integers(0, 8)), int(rng.integers(-3, 4)),
+                    rng.integers(-1, 4, size=STATE_SIZE), bool(rng.random() < 0.01))
+
+
+def game_tick():
+    game = Game(headless=True)
+    game.reset(level=_level(), health=10**6)
+    actions = iter(np.random.randint(0, 6, size=10**7).tolist())
+
+    def tick():
+        game.tick(next(actions))
+        game.game_over = False
+    return tick
+
+
+def env_obs(builder: str):
+    def setup():
+        env = GenEnv(map_size=MAP_SIZE)
+        env.reset()
+        env.game.reset(level=_level(), health=10)
+        for (x, y) in np.random.randint(0, MAP_SIZE, size=(10, 2)).tolist():
+            env.game.level.add_route_at(Pos(x, y))
+        env.agent_location = Pos(MAP_SIZE // 2, MAP_SIZE // 2)
+        return getattr(env, f'_get_complete_obs_{builder}')
+    return setup
+
+
+def env_reset():
+    return GenEnv().reset
+
+
+def replay_sample(prioritized: bool):
+    def setup():
+        buffer = PrioritizedReplayBuffer(BUFFER_SIZE) if prioritized else ReplayBuffer(BUFFER_SIZE)
+        _transitions(buffer, BUFFER_SIZE)
+        return lambda: buffer.sample(BATCH_SIZE)
+    return setup
+
+
+def agent_act():
+    agent = D3QNAgent(state_size=STATE_SIZE, action_size=8)
+    state = np.random.randint(-1, 4, size=STATE_SIZE).astype(np.float32)
+    return lambda: agent.act(state, eps=0.)
+
+
+def agent_update_model():
+    agent = D3QNAgent(state_size=STATE_SIZE, action_size=8, batch_size=BATCH_SIZE)
+    _transitions(agent.memory, BUFFER_SIZE)
+    return agent.update_model
+
+
+def train_episode():
+    env = GenEnv(map_size=8)
+    agent = {stage: D3QNAgent(state_size=obs, action_size=act) for (stage, (obs, act)) in env.agent_spaces.items()}
+    # episode lengths vary a lot, so every round plays the same TRAIN_EPISODES episodes, each seeded on its own
+    seeds = np.random.randint(0, 2**31, size=TRAIN_EPISODES).tolist()
+    episodes = itertools.cycle(seeds)
+
+    def episode():
+        seed_everything(next(episodes))
+        play_episode(env, agent, eps=1.0)
+    return episode
+
+
+# name: (setup returning the callable to time, calls per round)
+CASES = {
+    "game.tick": (game_tick, 2000),
+    "env.obs.walls": (env_obs('walls'), 20000),
+    "env.obs.enemy": (env_obs('enemy'), 20000),
+    "env.obs.items": (env_obs('items'), 20000),
+    "env.obs.solver": (env_obs('solver'), 20000),
+    "env.reset": (env_reset, 2000),
+    "replay.sample": (replay_sample(False), 2000),
+    "replay.sample.prioritized": (replay_sample(True), 2000),
+    "agent.act": (agent_act, 2000),
+    "agent.update_model": (agent_update_model, 200),
+    "train.episode": (train_episode, TRAIN_EPISODES),
+}
+
+
+def measure(setup, number: int, rounds: int, seed: int) -> dict:
+    seed_everything(seed)
+    call = setup()
+    times = []
+    for _ in range(rounds + 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        times.append((time.perf_counter() - start) / number * 1e6)
+    times = times[1:]
+    return {"median_us": statistics.median(times), "min_us": min(times), "max_us": max(times), "calls": number,
+            "rounds": rounds}
+
+
+def compare(results: dict, baseline: dict, threshold: float, statistic: str = "min") -> dict:
+    '''
+    The ratio of every case's ``statistic`` to the baseline's, and whether it is a regression, an improvement or ok.
+    '''
+    key = f"{statistic}_us"
+    comparison = {}
+    for (name, result) in results.items():
+        if name not in baseline:
+            continue
+        ratio = result[key] / baseline[name][key]
+        status = "regression" if ratio > 1 + threshold else "improvement" if ratio < 1 / (1 + threshold) else "ok"
+        comparison[name] = {"baseline_us": baseline[name][key], "ratio": ratio, "status": status}
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown flagged as a regression")
+    parser.add_argument("--statistic", choices=["min", "median"], default="min", help="what is compared")
+    parser.add_argument("--only", help="regular expression selecting the cases")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the calls per round")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=1, help="torch threads")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    cases = {name: case for (name, case) in CASES.items() if args.only is None or re.search(args.only, name)}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    print(f"{'case':<28} {'median us':>12} {'min us':>12} {'max us':>12}" + (" baseline" if baseline else ""))
+    for (name, (setup, number)) in cases.items():
+        results[name] = measure(setup, max(int(number * args.scale), 1), args.rounds, args.seed)
+        r = results[name]
+        line = f"{name:<28} {r['median_us']:>12.2f} {r['min_us']:>12.2f} {r['max_us']:>12.2f}"
+        if baseline and name in baseline:
+            c = compare({name: r}, baseline, args.threshold, args.statistic)[name]
+            line += f" {c['ratio']:>7.2f}x {c['status']}"
+        print(line)
+
+    report = {
+        "meta": {"seed": args.seed, "threads": args.threads, "rounds": args.rounds, "scale": args.scale,
+                 "statistic": args.statistic,
+                 "python": platform.python_version(), "numpy": np.__version__, "torch": torch.__version__,
+                 "platform": platform.platform(), "machine": platform.machine()},
+        "results": results,
+    }
+    regressions = []
+    if baseline is not None:
+        report["compare"] = compare(results, baseline, args.threshold, args.statistic)
+        regressions = [name for (name, c) in report["compare"].items() if c["status"] == "regression"]
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if regressions:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
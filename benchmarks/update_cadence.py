@@ -0,0 +1,75 @@
+'''
+Environment throughput and learning curves for different D3QNAgent update cadences.
+
+Run from the repository root:
+
+    python -m benchmarks.update_cadence --episodes 200 --configs 1:1 4:1 4:4 4:4:fused 16:16:fused
+
+Every config is train_every:gradient_steps, with a trailing ":fused" to run the gradient steps as one larger
+batch. Each config trains the four agents with main.play_episode from the same seeds and reports agent steps per
+second, updates per second, and per window of episodes the mean solver score and solver success rate.
+'''
+import argparse
+import random
+import time
+
+import numpy as np
+import torch
+
+from main import play_episode
+from network.agent import D3QNAgent
+from network.environment import GenEnv
+
+
+def parse_config(config: str) -> dict:
+    parts = config.split(":")
+    return {
+        "train_every": int(parts[0]),
+        "gradient_steps": int(parts[1]) if len(parts) > 1 else 1,
+        "fuse_gradient_steps": len(parts) > 2 and parts[2] == "fused",
+    }
+
+
+def run(config: dict, n_episodes: int, window: int, map_size: int, seed: int):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    env = GenEnv(map_size=map_size)
+    agent = {stage: D3QNAgent(state_size=obs, action_size=act, **config)
+             for (stage, (obs, act)) in env.agent_spaces.items()}
+    eps = 1.0
+    scores, solved = [], []
+    start = time.perf_counter()
+    for i_episode in range(1, n_episodes + 1):
+        scores.append(play_episode(env, agent, eps)[3])
+        solved.append(env.agent_location == env._l().end_location)
+        eps = max(0.01, 0.995 * eps)
+        if i_episode % 10 == 0:
+            for a in agent.values():
+                a.update_target_network()
+    elapsed = time.perf_counter() - start
+    steps = sum(a.t_step for a in agent.values())
+    updates = sum(max(0, a.t_step - a.batch_size) // a.train_every * (1 if a.fuse_gradient_steps else a.gradient_steps)
+                  for a in agent.values())
+    curve = [(float(np.mean(scores[i:i + window])), float(np.mean(solved[i:i + window])))
+             for i in range(0, n_episodes, window)]
+    return steps / elapsed, updates / elapsed, curve
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="+", default=["1:1", "4:1", "4:4", "4:4:fused", "16:16:fused"])
+    parser.add_argument("--episodes", type=int, default=100)
+    parser.add_argument("--window", type=int, default=25)
+    parser.add_argument("--map-size", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'config':<14} {'steps/s':>9} {'updates/s':>10}  solver score / success per {args.window} episodes")
+    for config in args.configs:
+        steps, updates, curve = run(parse_config(config), args.episodes, args.window, args.map_size, args.seed)
+        print(f"{config:<14} {steps:>9.0f} {updates:>10.0f}  " + "  ".join(f"{s:.0f}/{r:.2f}" for (s, r) in curve))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import pygame
+from pygame import Surface
+from pygame.font import Font
+
+from game.utils import Utils
+
+
+class Atlas:
+    '''
+    Process-wide cache of decoded sprite sheets and fonts.
+
+    Every sheet is decoded and sliced once, on first use, and the resulting tuples are shared by reference
+    between all entities and levels. Loading needs an initialised display, so it only happens from render().
+    '''
+
+    __images: dict[str, Surface] = {}
+    __tiles: dict[tuple[str, bool], tuple[Surface, ...]] = {}
+    __fonts: dict[int, Font] = {}
+
+    @staticmethod
+    def image(path: str) -> Surface:
+        if path not in Atlas.__images:
+            Atlas.__images[path] = Utils.load_image(path).convert_alpha()
+        return Atlas.__images[path]
+
+    @staticmethod
+    def tiles(path: str, flip: bool = False) -> tuple[Surface, ...]:
+        key = (path, flip)
+        if key not in Atlas.__tiles:
+            if flip:
+                tiles = tuple(pygame.transform.flip(tile, True, False) for tile in Atlas.tiles(path))
+            else:
+                tiles = tuple(Utils.get_tile_set(Atlas.image(path), Utils.TILE_SIZE))
+            Atlas.__tiles[key] = tiles
+        return Atlas.__tiles[key]
+
+    @staticmethod
+    def font(size: int) -> Font:
+        if size not in Atlas.__fonts:
+            Atlas.__fonts[size] = Font(Utils.FONT, size)
+        return Atlas.__fonts[size]
+
+    @staticmethod
+    def clear():
+        Atlas.__images.clear()
+        Atlas.__tiles.clear()
+        Atlas.__fonts.clear()
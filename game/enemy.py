@@ -1,26 +1,107 @@
+import numpy as np
+
+from game.atlas import Atlas
 from game.entity import Entity
+from game.entity_store import EntityStore
 from game.utils import Utils
+from game.position import CartesianPosition as Pos
 
 
 class Enemy(Entity):
-    FRAME = 0
-    COOLDOWN = 1
+    '''
+    View of one enemy of a level. Enemies keep no state of their own, every attribute is read from and written to
+    the slot of the enemy in the level's EntityStore, and tick_all advances all enemies of a store at once.
+    '''
 
     __IDLE_FRAMES = 4
     __ATTACK_FRAMES = 4
     __HURT_FRAMES = 4
 
+    # offsets of each animation in the slime sheet
+    __IDLE_OFFSET = 0
+    __ATTACK_OFFSET = 4
+    __HURT_OFFSET = 8
+
+    # frames of each animation by state value, for tick_all
+    __STATE_FRAMES = np.zeros(len(Utils.EntityState) + 1, dtype=np.int64)
+    __STATE_FRAMES[Utils.EntityState.IDLE.value] = __IDLE_FRAMES
+    __STATE_FRAMES[Utils.EntityState.ATTACK.value] = __ATTACK_FRAMES
+    __STATE_FRAMES[Utils.EntityState.HURT.value] = __HURT_FRAMES
+    __IDLE = Utils.EntityState.IDLE.value
+    __ATTACK = Utils.EntityState.ATTACK.value
+    __HURT = Utils.EntityState.HURT.value
+
     __SPEED = 1
     __HEALTH = 9
     __POWER = 2
     __XP = 3
 
-    def __init__(self, pos):
-        super().__init__(pos=pos, speed=self.__SPEED, health=self.__HEALTH, power=self.__POWER)
-        self.__enemy = Utils.get_tile_set(Utils.ENEMY, Utils.TILE_SIZE)
-        self.__idle = self.__enemy[:4]
-        self.__attack = self.__enemy[4:8]
-        self.__hurt = self.__enemy[8:]
+    _speed = __SPEED
+    _direction = Utils.Direction.RIGHT
+
+    def __init__(self, store: EntityStore, slot: int):
+        self.__store = store
+        self.__slot = slot
+
+    @staticmethod
+    def spawn(store: EntityStore, pos: Pos) -> int:
+        return store.add(pos, health=Enemy.__HEALTH, power=Enemy.__POWER, cooldown=1)
+
+    @staticmethod
+    def spawn_many(store: EntityStore, positions) -> np.ndarray:
+        return store.add_many(positions, health=Enemy.__HEALTH, power=Enemy.__POWER, cooldown=1)
+
+    def get_slot(self) -> int:
+        return self.__slot
+
+    @property
+    def _pos(self) -> Pos:
+        (x, y) = self.__store.pos[self.__slot]
+        return Pos(x=int(x), y=int(y))
+
+    @_pos.setter
+    def _pos(self, pos: Pos):
+        self.__store.pos[self.__slot] = tuple(pos)
+
+    @property
+    def _health(self) -> int:
+        return int(self.__store.health[self.__slot])
+
+    @_health.setter
+    def _health(self, health: int):
+        self.__store.health[self.__slot] = health
+
+    @property
+    def _power(self) -> int:
+        return int(self.__store.power[self.__slot])
+
+    @_power.setter
+    def _power(self, power: int):
+        self.__store.power[self.__slot] = power
+
+    @property
+    def _state(self) -> Utils.EntityState:
+        return Utils.EntityState(int(self.__store.state[self.__slot]))
+
+    @_state.setter
+    def _state(self, state: Utils.EntityState):
+        self.__store.state[self.__slot] = state.value
+
+    @property
+    def FRAME(self) -> int:
+        return int(self.__store.frame[self.__slot])
+
+    @FRAME.setter
+    def FRAME(self, frame: int):
+        self.__store.frame[self.__slot] = frame
+
+    @property
+    def COOLDOWN(self) -> int:
+        return int(self.__store.cooldown[self.__slot])
+
+    @COOLDOWN.setter
+    def COOLDOWN(self, cooldown: int):
+        self.__store.cooldown[self.__slot] = cooldown
 
     def get_current_xp(self) -> int:
         return self.__XP
@@ -44,13 +125,31 @@ class Enemy(Entity):
         if self.FRAME >= self.get_state_frames():
             self.FRAME = -self.get_state_frames() + 1
 
+    @staticmethod
+    def tick_all(store: EntityStore):
+        '''
+        Enemy.tick for every enemy of the store at once.
+        '''
+        if not store.count:
+            return
+        frames = Enemy.__STATE_FRAMES
+        frame = store.frame[:store.size]
+        state = store.state[:store.size]
+        frame += 1
+        done = ((state == Enemy.__ATTACK) | (state == Enemy.__HURT)) & (frame == frames[state])
+        state[done] = Enemy.__IDLE
+        frame[done] = 0
+        wrap = frame >= frames[state]
+        frame[wrap] = 1 - frames[state[wrap]]
+
     def render(self, screen):
+        sprites = Atlas.tiles(Utils.ENEMY)
         coord = self._pos * Utils.TILE_SIZE
         coord = (coord.x, coord.y)
         match self._state:
             case Utils.EntityState.IDLE:
-                screen.blit(self.__idle[abs(self.FRAME)], coord)
+                screen.blit(sprites[self.__IDLE_OFFSET + abs(self.FRAME)], coord)
             case Utils.EntityState.ATTACK:
-                screen.blit(self.__attack[abs(self.FRAME)], coord)
+                screen.blit(sprites[self.__ATTACK_OFFSET + abs(self.FRAME)], coord)
             case Utils.EntityState.HURT:
-                screen.blit(self.__hurt[abs(self.FRAME)], coord)
+                screen.blit(sprites[self.__HURT_OFFSET + abs(self.FRAME)], coord)
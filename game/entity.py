@@ -1,6 +1,3 @@
-import pygame
-from pygame import Surface
-
 from game.utils import Utils
 from game.position import CartesianPosition as Pos
 
@@ -22,13 +19,8 @@ class Entity:
         self._pos = pos
 
     def get_near_pos(self) -> list[Pos]:
-        return [
-            self.get_pos(),
-            self.get_pos() + Pos(x=1, y=0),
-            self.get_pos() + Pos(x=-1, y=0),
-            self.get_pos() + Pos(x=0, y=1),
-            self.get_pos() + Pos(x=0, y=-1),
-        ]
+        pos = self.get_pos()
+        return [pos, pos.offset(1, 0), pos.offset(-1, 0), pos.offset(0, 1), pos.offset(0, -1)]
 
     def get_power(self) -> int:
         return self._power
@@ -45,12 +37,8 @@ class Entity:
     def get_health(self) -> int:
         return self._health
 
-    def render_damage(self, damage: int) -> tuple[Pos, Surface]:
-        font = pygame.font.Font('assets/Gamepixies.ttf', 12)
-        damage_text = font.render(f'-{damage}', False, (255, 255, 255))
-        damage_display = Surface(damage_text.get_size(), pygame.SRCALPHA)
-        damage_display.blit(damage_text, (0, 0))
-        return self.get_pos(), damage_display
+    def get_damage_label(self, damage: int) -> tuple[Pos, str]:
+        return self.get_pos(), f'-{damage}'
 
     def hurt(self, damage: int):
         if self._state != Utils.EntityState.HURT:
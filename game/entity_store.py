@@ -0,0 +1,92 @@
+import numpy as np
+
+from game.utils import Utils
+
+
+class EntityStore:
+    '''
+    Structure-of-arrays storage for the entities of a level.
+
+    Every entity gets a slot, handed out in the order the entities are added, and its components live at that
+    index of the arrays below. Removed slots are not reused, so the order of the slots is the order the entities
+    were added in. The arrays double in size whenever they run out of slots.
+
+    Parameters
+    ----------
+    capacity: int, default=16
+        The number of slots allocated up front.
+    '''
+
+    def __init__(self, capacity: int = 16):
+        self.size: int = 0
+        self.count: int = 0
+        self.pos: np.ndarray = np.zeros((capacity, 2), dtype=np.int64)
+        self.health: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self.power: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self.kind: np.ndarray = np.zeros(capacity, dtype=np.int8)
+        self.state: np.ndarray = np.zeros(capacity, dtype=np.int8)
+        self.frame: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self.cooldown: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self.alive: np.ndarray = np.zeros(capacity, dtype=bool)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, pos, health: int = 0, power: int = 0, kind: int = 0,
+            state: Utils.EntityState = Utils.EntityState.IDLE, frame: int = 0, cooldown: int = 0) -> int:
+        if self.size == len(self.alive):
+            self.__grow()
+        slot = self.size
+        self.pos[slot] = tuple(pos)
+        self.health[slot] = health
+        self.power[slot] = power
+        self.kind[slot] = kind
+        self.state[slot] = state.value
+        self.frame[slot] = frame
+        self.cooldown[slot] = cooldown
+        self.alive[slot] = True
+        self.size += 1
+        self.count += 1
+        return slot
+
+    def add_many(self, positions, health: int = 0, power: int = 0, kind=0,
+                 state: Utils.EntityState = Utils.EntityState.IDLE, frame: int = 0, cooldown: int = 0) -> np.ndarray:
+        '''
+        Add one entity per row of the (N, 2) ``positions``, in order, and return their slots. ``kind`` may also be
+        given per entity.
+        '''
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        n = len(positions)
+        while self.size + n > len(self.alive):
+            self.__grow()
+        new = slice(self.size, self.size + n)
+        if n:
+            self.pos[new] = positions
+            self.health[new] = health
+            self.power[new] = power
+            self.kind[new] = kind
+            self.state[new] = state.value
+            self.frame[new] = frame
+            self.cooldown[new] = cooldown
+            self.alive[new] = True
+        self.size += n
+        self.count += n
+        return np.arange(new.start, new.stop)
+
+    def remove(self, slot: int):
+        if self.alive[slot]:
+            self.alive[slot] = False
+            self.count -= 1
+
+    def slots(self) -> np.ndarray:
+        '''
+        The slots of the entities that were not removed, in the order they were added.
+        '''
+        return np.flatnonzero(self.alive[:self.size])
+
+    def __grow(self):
+        for name in ('pos', 'health', 'power', 'kind', 'state', 'frame', 'cooldown', 'alive'):
+            array = getattr(self, name)
+            grown = np.zeros((2 * len(array),) + array.shape[1:], dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
@@ -1,7 +1,9 @@
 import numpy as np
 import pygame
-from pygame import Surface
+from pygame import Rect, Surface
 
+from game.atlas import Atlas
+from game.enemy import Enemy
 from game.level import Level
 from game.level_gen import LevelGenerator
 from game.player import Player
@@ -11,94 +13,106 @@ from game.position import CartesianPosition as Pos
 
 class Game:
 
-    def __init__(self, window=None):
-        pygame.init()
-        pygame.display.set_caption("Buenos Dias, Fuckboy")
-        pygame.display.set_icon(Utils.ICON)
-
-        self.font = pygame.font.Font('assets/Gamepixies.ttf', 24)
-        if window is None:
-            self.window = pygame.display.set_mode((Utils.SCREEN_WIDTH, Utils.SCREEN_HEIGHT), pygame.RESIZABLE)
-        else:
-            self.window = window
-        self.screen = Surface((Utils.TILE_SIZE * Utils.MAP_SIZE, Utils.TILE_SIZE * Utils.MAP_SIZE))
+    def __init__(self, window=None, headless: bool = False):
+        self.window = window
+        self.screen: Surface | None = None
+        if not headless:
+            self.init_display()
 
-        self.render_queue: list[tuple[Pos, Surface]] = []
+        self.render_queue: list[tuple[Pos, str]] = []
         self.render_delay: int = 120
+        # what the last frame was drawn over, the rectangles of its sprites and the scaled screen it was shown with
+        self.__frame: tuple | None = None
+        self.__drawn: list[Rect] = []
+        self.__scaled: Surface | None = None
         self.game_over: bool = False
         self.level: Level = LevelGenerator().make_level()
         self.player: Player = Player(pos=self.level.get_start_pos())
 
+    def init_display(self):
+        pygame.init()
+        pygame.display.set_caption("Buenos Dias, Fuckboy")
+        pygame.display.set_icon(Utils.load_image(Utils.ICON))
+
+        if self.window is None:
+            self.window = pygame.display.set_mode((Utils.SCREEN_WIDTH, Utils.SCREEN_HEIGHT), pygame.RESIZABLE)
+        self.screen = Surface((Utils.TILE_SIZE * Utils.MAP_SIZE, Utils.TILE_SIZE * Utils.MAP_SIZE))
+
     def reset(self, level: Level = None, health: int = 10):
         if level is None:
             level = LevelGenerator().make_level()
         self.game_over: bool = False
+        self.render_queue = []
         self.level: Level = level
         self.player: Player = Player(pos=self.level.get_start_pos())
         self.player._health = health
 
     def move_player(self, direction: Utils.Direction) -> bool:
         next_pos = self.player.get_next_pos(direction)
-        if (next_pos.x not in range(self.level.map_size)
-                or next_pos.y not in range(self.level.map_size)
-                or next_pos in self.level.get_walls()):
+        if not self.level.in_bounds(next_pos) or self.level.wall_map[*next_pos]:
             return False
-        self.player.set_pos(self.player.get_next_pos(direction))
+        self.player.set_pos(next_pos)
         return True
 
     def grab_item(self) -> int:
-        grabbed = 0
-        for item in self.level.get_items():
-            if self.player.get_pos() == item.get_pos():
-                self.player.receive_bonus(item)
-                item.render_bonus(self.screen)
-                self.level.remove_item(item)
-                grabbed += 1
-        return grabbed
+        item = self.level.get_item_at(self.player.get_pos())
+        if item is None:
+            return 0
+        self.player.receive_bonus(item)
+        self.render_queue.append(item.get_bonus_label())
+        self.level.remove_item(item)
+        return 1
 
     def attack_enemy(self) -> tuple[int, int]:
         if self.player.get_state() != Utils.EntityState.ATTACK:
             self.player.FRAME = 0
             self.player.set_state(Utils.EntityState.ATTACK)
 
-        killed = 0
-        damaged = 0
-        for enemy in self.level.get_enemies():
-            if enemy.get_pos() not in self.player.get_near_pos():
-                continue
-            enemy.hurt(self.player.get_power())
-            self.render_queue.append(enemy.render_damage(self.player.get_power()))
-            if enemy.get_health() <= 0:
-                self.player.receive_xp(enemy.get_current_xp())
-                self.level.remove_enemy(enemy)
-                killed += 1
-            else:
-                damaged += 1
-        return killed, damaged
+        enemies = self.level.enemies
+        near = self.level.get_enemy_slots_near(self.player.get_pos())
+        power = self.player.get_power()
+        fresh = enemies.state[near] != Utils.EntityState.HURT.value
+        dies = enemies.health[near] - power * fresh <= 0
+        # enemies used to be attacked while iterating over the list they are removed from, which skips the enemy
+        # listed right after a killed one; the skip is kept so that rewards stay the same
+        hit = np.ones(near.size, dtype=bool)
+        for i in range(1, near.size):
+            hit[i] = not (hit[i - 1] and dies[i - 1] and not self.level.has_enemies_between(near[i - 1], near[i]))
+
+        hurt = near[hit & fresh]
+        enemies.health[hurt] -= power
+        enemies.state[hurt] = Utils.EntityState.HURT.value
+        enemies.frame[hurt] = -1
+        for slot in near[hit]:
+            self.render_queue.append(Enemy(enemies, slot).get_damage_label(power))
+        for slot in near[hit & dies]:
+            enemy = Enemy(enemies, slot)
+            self.player.receive_xp(enemy.get_current_xp())
+            self.level.remove_enemy(enemy)
+        killed = int((hit & dies).sum())
+        return killed, int(hit.sum()) - killed
 
     def attack_player(self) -> int:
-        hurt = 0
         if self.player.get_state() == Utils.EntityState.ATTACK:
             return 0
-        for enemy in self.level.get_enemies():
-            if self.player.get_pos() not in enemy.get_near_pos():
-                continue
-            if enemy.get_state() != Utils.EntityState.ATTACK:
-                enemy.COOLDOWN += 1
-                enemy.COOLDOWN %= Utils.COOLDOWN
-            if enemy.COOLDOWN == 0:
-                enemy.FRAME = -1
-                enemy.set_state(Utils.EntityState.ATTACK)
-                self.player.hurt(enemy.get_power())
-                self.render_queue.append(self.player.render_damage(enemy.get_power()))
-                hurt += 1
-        return hurt
+        enemies = self.level.enemies
+        near = self.level.get_enemy_slots_near(self.player.get_pos())
+        if not near.size:
+            return 0
+        waiting = near[enemies.state[near] != Utils.EntityState.ATTACK.value]
+        enemies.cooldown[waiting] = (enemies.cooldown[waiting] + 1) % Utils.COOLDOWN
+        attackers = near[enemies.cooldown[near] == 0]
+        enemies.frame[attackers] = -1
+        enemies.state[attackers] = Utils.EntityState.ATTACK.value
+        for power in enemies.power[attackers].tolist():
+            self.player.hurt(power)
+            self.render_queue.append(self.player.get_damage_label(power))
+        return attackers.size
 
     def tick(self, player_action) -> int:
         self.render_queue = []
         self.player.tick()
-        for enemy in self.level.get_enemies():
-            enemy.tick()
+        Enemy.tick_all(self.level.enemies)
 
         if self.game_over:
             return 0
@@ -139,26 +153,73 @@ class Game:
         return -100
 
     def render(self, side, center):
+        '''
+        Draw a frame into a (side, side) square of the window starting at x = center.
+
+        The ground and walls come from the level's static layer. While the level, its walls and the window stay the
+        same, only the rectangles of the previous frame's sprites are restored from it and redrawn, and only those
+        are copied to the window and updated on the display; otherwise the whole frame is redrawn. The screen is
+        scaled into a surface kept for the window size.
+        '''
+        if self.screen is None:
+            self.init_display()
         pygame.time.delay(self.render_delay)
-        self.screen.fill((0, 0, 0))
 
-        self.level.render(self.screen)
+        static = self.level.static_layer()
+        frame = (static, side, center)
+        full = self.__frame is None or self.__frame[0] is not static or self.__frame[1:] != (side, center)
+        if full:
+            self.screen.fill((0, 0, 0))
+            self.screen.blit(static, (0, 0))
+        else:
+            for rect in {tuple(rect): rect for rect in self.__drawn}.values():
+                self.screen.fill((0, 0, 0), rect)
+                self.screen.blit(static, rect, rect)
+
+        drawn = self.level.render(self.screen, static=False)
         self.player.render(self.screen)
+        drawn.append(Utils.tile_rect(self.player.get_pos()))
         for enemy in self.level.get_enemies():
             enemy.render(self.screen)
-        for ((x, y), render_item) in self.render_queue:
-            self.screen.blit(render_item, (x * Utils.TILE_SIZE, y * Utils.TILE_SIZE - 8))
-        scaled_screen = pygame.transform.scale(self.screen, (side, side))
-        self.window.blit(scaled_screen, (center, 0))
-        # self._render_stats(center)
-        pygame.display.update()
+            drawn.append(Utils.tile_rect(enemy.get_pos()))
+        for ((x, y), label) in self.render_queue:
+            render_item = Atlas.font(12).render(label, False, (255, 255, 255))
+            drawn.append(self.screen.blit(render_item, (x * Utils.TILE_SIZE, y * Utils.TILE_SIZE - 8)))
+
+        if self.__scaled is None or self.__scaled.get_width() != side:
+            self.__scaled = Surface((side, side)).convert()
+        pygame.transform.scale(self.screen, (side, side), self.__scaled)
+        if full:
+            self.window.blit(self.__scaled, (center, 0))
+            # self._render_stats(center)
+            pygame.display.update()
+        else:
+            self.__present({tuple(rect): rect for rect in self.__drawn + drawn}.values(), side, center)
+        self.__frame = frame
+        self.__drawn = drawn
+
+    def __present(self, rects, side: int, center: int):
+        # copy the pixels of the scaled screen that the rectangles of the screen cover to the window, and update
+        # only those
+        width = self.screen.get_width()
+        bounds = self.screen.get_rect()
+        updated = []
+        for rect in rects:
+            rect = rect.clip(bounds)
+            (x0, y0) = (rect.left * side // width, rect.top * side // width)
+            (x1, y1) = (-(-rect.right * side // width), -(-rect.bottom * side // width))
+            if x1 <= x0 or y1 <= y0:
+                continue
+            area = Rect(x0, y0, x1 - x0, y1 - y0)
+            updated.append(self.window.blit(self.__scaled, (center + x0, y0), area))
+        pygame.display.update(updated)
 
     def _render_stats(self, center):
-        hp_stat = self.font.render('health : ' + str(self.player.get_health()), False, (255, 255, 255))
+        hp_stat = Atlas.font(24).render('health : ' + str(self.player.get_health()), False, (255, 255, 255))
         hp_display = Surface(hp_stat.get_size(), pygame.SRCALPHA)
         hp_display.blit(hp_stat, (0, 0))
 
-        xp_stat = self.font.render('score : ' + str(self.player.get_current_xp()), False, (255, 255, 255))
+        xp_stat = Atlas.font(24).render('score : ' + str(self.player.get_current_xp()), False, (255, 255, 255))
         xp_display = Surface(xp_stat.get_size(), pygame.SRCALPHA)
         xp_display.blit(xp_stat, (0, 0))
 
@@ -1,43 +1,54 @@
-import pygame
-from pygame import Surface
+import numpy as np
+
+from game.atlas import Atlas
+from game.entity_store import EntityStore
 from game.utils import Utils
 from game.position import CartesianPosition as Pos
 
 
 class Item:
-    def __init__(self, pos: Pos, item_type: Utils.ItemType):
-        self.__font = pygame.font.Font('assets/Gamepixies.ttf', 12)
-        self.__pos: Pos = pos
-        self.__item = Utils.get_tile_set(Utils.ITEM, Utils.TILE_SIZE)
-        self.__item_type: Utils.ItemType = item_type
+    '''
+    View of one item of a level, its position and type live in the slot of the item in the level's EntityStore.
+    '''
+
+    def __init__(self, store: EntityStore, slot: int):
+        self.__store = store
+        self.__slot = slot
+
+    @staticmethod
+    def spawn(store: EntityStore, pos: Pos, item_type: Utils.ItemType) -> int:
+        return store.add(pos, kind=item_type.value)
+
+    @staticmethod
+    def spawn_many(store: EntityStore, positions, item_type: Utils.ItemType) -> np.ndarray:
+        return store.add_many(positions, kind=item_type.value)
+
+    def get_slot(self) -> int:
+        return self.__slot
 
     def get_pos(self) -> Pos:
-        return self.__pos
+        (x, y) = self.__store.pos[self.__slot]
+        return Pos(x=int(x), y=int(y))
 
     def get_type(self) -> Utils.ItemType:
-        return self.__item_type
+        return Utils.ItemType(int(self.__store.kind[self.__slot]))
 
     def get_bonus(self) -> int:
-        match self.__item_type:
+        match self.get_type():
             case Utils.ItemType.HEALTH:
                 return 2
             case Utils.ItemType.POWER:
                 return 3
 
-    def render_bonus(self, screen):
-        bonus = self.__font.render(f'+{self.get_bonus()} {self.__item_type.name}',
-                                   False,
-                                   (255, 255, 255))
-        bonus_display = Surface(bonus.get_size(), pygame.SRCALPHA)
-        bonus_display.blit(bonus, (0, 0))
-        coord = self.__pos * Utils.TILE_SIZE
-        screen.blit(bonus_display, (coord.x, coord.y))
+    def get_bonus_label(self) -> tuple[Pos, str]:
+        return self.get_pos(), f'+{self.get_bonus()} {self.get_type().name}'
 
     def render(self, screen):
-        coord = self.__pos * Utils.TILE_SIZE
+        sprites = Atlas.tiles(Utils.ITEM)
+        coord = self.get_pos() * Utils.TILE_SIZE
         coord = (coord.x, coord.y)
         match self.get_type():
             case Utils.ItemType.HEALTH:
-                screen.blit(self.__item[0], coord)
+                screen.blit(sprites[0], coord)
             case Utils.ItemType.POWER:
-                screen.blit(self.__item[1], coord)
+                screen.blit(sprites[1], coord)
@@ -1,57 +1,137 @@
-from random import randint
+from functools import lru_cache
+from random import randrange
 import numpy as np
-from copy import copy
+from pygame import Rect, Surface
 
+from game.atlas import Atlas
 from game.item import Item
 from game.utils import Utils
 from game.enemy import Enemy
+from game.entity_store import EntityStore
 from game.position import CartesianPosition as Pos
+from game.solvability import shortest_path
+
+
+@lru_cache
+def _indices(size: int) -> np.ndarray:
+    return np.indices((size, size))
+
+
+@lru_cache
+def _offsets(size: int) -> np.ndarray:
+    # _offsets(size)[a][b] = |a - b|
+    cells = np.arange(size)
+    return abs(cells[:, None] - cells[None, :])
+
+
+def _positions(positions) -> np.ndarray:
+    positions = () if positions is None else positions
+    return np.array([tuple(pos) for pos in positions], dtype=np.int64).reshape(-1, 2)
 
 
 class Level:
     BONFIRE_FRAME = 0
     BONFIRE_FRAMES = 4
+    VIEW_PAD = 2
 
     def __init__(self, walls=None, healing_items=None, power_items=None, enemies=None, exit_point=None,
                  entry_point=None, map_size=Utils.MAP_SIZE):
-        walls: list[Pos] = [] if walls is None else walls
-        enemies: list[Pos] = [] if enemies is None else enemies
-        power_items: list[Pos] = [] if power_items is None else power_items
-        healing_items: list[Pos] = [] if healing_items is None else healing_items
         if exit_point is None:
-            exit_point = Pos(*np.random.default_rng(seed=randint(0, 1000)).integers(0, map_size, size=2, dtype=int))
+            exit_point = Pos(randrange(map_size), randrange(map_size))
         if entry_point is None:
-            entry_point = Pos(*np.random.default_rng(seed=randint(0, 1000)).integers(0, map_size, size=2, dtype=int))
+            entry_point = Pos(randrange(map_size), randrange(map_size))
             while sum(entry_point - exit_point) > map_size / 3:
-                entry_point = Pos(*np.random.default_rng(seed=randint(0, 1000)).integers(0, map_size, size=2, dtype=int))
+                entry_point = Pos(randrange(map_size), randrange(map_size))
+        wall_map = np.zeros(shape=(map_size, map_size), dtype=bool)
+        wall_map[*_positions(walls).T] = True
+        self.__build(wall_map, _positions(enemies), _positions(healing_items), _positions(power_items),
+                     entry_point, exit_point)
+
+    @classmethod
+    def from_arrays(cls, wall_map, enemy_map, heal_map, power_map, start, end) -> 'Level':
+        '''
+        Build a level from (S, S) boolean maps of its walls, enemies and healing and power items, and its (x, y)
+        start and end, without going through the add_* methods. Enemies and items are added in row-major order;
+        where a healing and a power item share a cell the power item is kept.
+        '''
+        level = cls.__new__(cls)
+        level.__build(np.array(wall_map, dtype=bool), np.argwhere(enemy_map), np.argwhere(heal_map),
+                      np.argwhere(power_map), Pos(*map(int, start)), Pos(*map(int, end)))
+        return level
 
-        self.wall_map = np.zeros(shape=(map_size, map_size), dtype=bool)
+    def __build(self, wall_map: np.ndarray, enemies: np.ndarray, healing_items: np.ndarray, power_items: np.ndarray,
+                entry_point: Pos, exit_point: Pos):
+        map_size = len(wall_map)
+        self.wall_map = wall_map
         self.enemy_map = np.zeros(shape=(map_size, map_size), dtype=bool)
         self.heal_map = np.zeros(shape=(map_size, map_size), dtype=bool)
         self.power_map = np.zeros(shape=(map_size, map_size), dtype=bool)
         self.route = np.zeros(shape=(map_size, map_size), dtype=bool)
 
-        self.__grass = Utils.get_tile_set(Utils.GRASS, Utils.TILE_SIZE)
-        self.__exit = Utils.get_tile_set(Utils.EXIT, Utils.TILE_SIZE)
-
-        self.items: list[Item] = []
-        self.enemies: list[Enemy] = []
+        self.items: EntityStore = EntityStore()
+        self.enemies: EntityStore = EntityStore()
         self.end_location: Pos = exit_point
         self.start_location: Pos = entry_point
         self.map_size: int = map_size
 
-        self.__ground: np.ndarray = np.ndarray(shape=(self.map_size, self.map_size), dtype=int)
-        for i in np.ndindex((self.map_size, self.map_size)):
-            self.__ground[i] = randint(0, len(self.__grass) - 1)
+        # manhattan distances of every cell to the entry and the exit, one cell larger than the map because the
+        # generator sweep ends one row past the last one
+        offsets = _offsets(map_size + 1)
+        self.start_distance: np.ndarray = offsets[entry_point.x][:, None] + offsets[entry_point.y][None, :]
+        self.end_distance: np.ndarray = offsets[exit_point.x][:, None] + offsets[exit_point.y][None, :]
+
+        # slot of the enemy and of the item in every cell, -1 when empty; a level holds at most one of each per cell,
+        # the entity added last wins
+        self.enemy_slots: np.ndarray = np.full(shape=(map_size, map_size), fill_value=-1, dtype=np.int64)
+        self.item_slots: np.ndarray = np.full(shape=(map_size, map_size), fill_value=-1, dtype=np.int64)
+        self.__place(self.enemies, self.enemy_slots, Enemy.spawn_many(self.enemies, enemies), enemies)
+        heal_slots = Item.spawn_many(self.items, healing_items, Utils.ItemType.HEALTH)
+        power_slots = Item.spawn_many(self.items, power_items, Utils.ItemType.POWER)
+        self.__place(self.items, self.item_slots, np.concatenate((heal_slots, power_slots)),
+                     np.concatenate((healing_items, power_items)))
+        if len(self.enemies):
+            self.enemy_map[...] = self.enemy_slots >= 0
+        if len(self.items):
+            kind = np.where(self.item_slots >= 0, self.items.kind[self.item_slots], 0)
+            self.heal_map[...] = kind == Utils.ItemType.HEALTH.value
+            self.power_map[...] = kind == Utils.ItemType.POWER.value
 
-        for pos in walls:
-            self.add_wall_at(pos)
-        for pos in enemies:
-            self.add_enemy_at(pos)
-        for pos in healing_items:
-            self.add_healing_item_at(pos)
-        for pos in power_items:
-            self.add_power_item_at(pos)
+        # first cell of a layer in row-major order with the smallest x + y, kept up to date by the setters
+        self.__layers: dict[str, np.ndarray] = {'route': self.route, 'heal': self.heal_map, 'power': self.power_map}
+        self.__first: dict[str, tuple[int, int] | None] = {name: None for name in self.__layers}
+        if len(self.items):
+            self.__rescan('heal')
+            self.__rescan('power')
+
+        # observation views padded by VIEW_PAD cells before and VIEW_PAD + 1 after the map, so a window of radius up to
+        # VIEW_PAD around any cell of the generator sweep is a plain slice; kept up to date by the setters
+        pad = 2 * self.VIEW_PAD + 1
+        inner = (slice(self.VIEW_PAD, self.VIEW_PAD + map_size),) * 2
+        exit_cell = (exit_point.x + self.VIEW_PAD, exit_point.y + self.VIEW_PAD)
+        self.padded_wall_map: np.ndarray = np.zeros(shape=(map_size + pad, map_size + pad), dtype=np.int8)
+        self.padded_wall_map[inner] = self.wall_map
+        self.padded_enemy_map: np.ndarray = np.zeros(shape=(map_size + pad, map_size + pad), dtype=np.int8)
+        self.padded_enemy_map[inner] = self.enemy_map
+        # walls with the exit as -1
+        self.wall_view: np.ndarray = self.padded_wall_map.copy()
+        self.wall_view[exit_cell] = -1
+        # -1 for walls and outside the map, 3 for the exit, otherwise the number of enemies and items in the cell
+        self.solver_view: np.ndarray = np.full(shape=(map_size + pad, map_size + pad), fill_value=-1, dtype=np.int8)
+        self.solver_view[inner] = np.where(self.wall_map, -1, self.padded_enemy_map[inner] + (self.item_slots >= 0))
+        self.solver_view[exit_cell] = 3
+
+        self.__ground: np.ndarray = np.random.randint(0, Utils.GROUND_TILES, size=(map_size, map_size))
+        # ground and walls composited once, dropped when a wall is added
+        self.__static: Surface | None = None
+
+    @staticmethod
+    def __place(store: EntityStore, grid: np.ndarray, slots: np.ndarray, positions: np.ndarray):
+        # later entities overwrite earlier ones on the same cell, which are then dropped from the store
+        if not slots.size:
+            return
+        grid[*positions.T] = slots
+        for slot in slots[grid[*positions.T] != slots].tolist():
+            store.remove(slot)
 
     def get_walls(self) -> list[Pos]:
         walls = []
@@ -60,43 +140,152 @@ class Level:
         return walls
 
     def get_enemies(self) -> list[Enemy]:
-        return self.enemies
+        return [Enemy(self.enemies, slot) for slot in self.enemies.slots()]
 
     def get_items(self) -> list[Item]:
-        return self.items
+        return [Item(self.items, slot) for slot in self.items.slots()]
+
+    def in_bounds(self, pos: Pos) -> bool:
+        return 0 <= pos.x < self.map_size and 0 <= pos.y < self.map_size
+
+    def get_enemy_at(self, pos: Pos) -> Enemy | None:
+        if not self.in_bounds(pos) or self.enemy_slots[*pos] < 0:
+            return None
+        return Enemy(self.enemies, int(self.enemy_slots[*pos]))
+
+    def get_item_at(self, pos: Pos) -> Item | None:
+        if not self.in_bounds(pos) or self.item_slots[*pos] < 0:
+            return None
+        return Item(self.items, int(self.item_slots[*pos]))
+
+    def get_enemy_slots_near(self, pos: Pos) -> np.ndarray:
+        '''
+        The slots of the enemies on a cell and the four cells around it, in the order the enemies were added.
+        '''
+        slots = []
+        if self.enemies.count:
+            for (dx, dy) in ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)):
+                (x, y) = (pos.x + dx, pos.y + dy)
+                if 0 <= x < self.map_size and 0 <= y < self.map_size and self.enemy_slots[x, y] >= 0:
+                    slots.append(self.enemy_slots[x, y])
+        return np.sort(np.array(slots, dtype=np.int64))
+
+    def has_enemies_between(self, first: int, last: int) -> bool:
+        '''
+        Whether any enemy was added after the one in slot ``first`` and before the one in slot ``last``.
+        '''
+        return bool(self.enemies.alive[first + 1:last].any())
 
     def add_wall_at(self, pos: Pos):
         self.wall_map[*pos] = True
+        self.__refresh(pos)
+        self.__static = None
 
     def add_enemy_at(self, pos: Pos):
+        if self.enemy_slots[*pos] >= 0:
+            self.remove_enemy(self.get_enemy_at(pos))
         self.enemy_map[*pos] = True
-        self.enemies.append(Enemy(pos=copy(pos)))
+        self.__refresh(pos)
+        self.enemy_slots[*pos] = Enemy.spawn(self.enemies, pos)
+
+    def add_route_at(self, pos: Pos):
+        self.route[*pos] = True
+        self.__mark('route', pos)
 
     def add_healing_item_at(self, pos: Pos):
-        self.heal_map[*pos] = True
-        self.items.append(Item(pos=copy(pos), item_type=Utils.ItemType.HEALTH))
+        self.__add_item(pos, Utils.ItemType.HEALTH)
 
     def add_power_item_at(self, pos: Pos):
-        self.power_map[*pos] = True
-        self.items.append(Item(pos=copy(pos), item_type=Utils.ItemType.POWER))
+        self.__add_item(pos, Utils.ItemType.POWER)
+
+    def __add_item(self, pos: Pos, item_type: Utils.ItemType):
+        if self.item_slots[*pos] >= 0:
+            self.remove_item(self.get_item_at(pos))
+        match item_type:
+            case Utils.ItemType.HEALTH:
+                self.heal_map[*pos] = True
+                self.__mark('heal', pos)
+            case Utils.ItemType.POWER:
+                self.power_map[*pos] = True
+                self.__mark('power', pos)
+        self.__refresh(pos)
+        self.item_slots[*pos] = Item.spawn(self.items, pos, item_type)
 
     def remove_item(self, item: Item):
+        pos = item.get_pos()
+        if self.item_slots[*pos] != item.get_slot():
+            return
         match item.get_type():
             case Utils.ItemType.HEALTH:
-                self.heal_map[*item.get_pos()] = False
+                self.heal_map[*pos] = False
+                self.__unmark('heal', pos)
             case Utils.ItemType.POWER:
-                self.power_map[*item.get_pos()] = False
-        try:
-            self.items.remove(item)
-        except ValueError:
-            return
+                self.power_map[*pos] = False
+                self.__unmark('power', pos)
+        self.__refresh(pos)
+        self.item_slots[*pos] = -1
+        self.items.remove(item.get_slot())
 
     def remove_enemy(self, enemy: Enemy):
-        self.enemy_map[*enemy.get_pos()] = False
-        try:
-            self.enemies.remove(enemy)
-        except ValueError:
+        pos = enemy.get_pos()
+        if self.enemy_slots[*pos] != enemy.get_slot():
+            return
+        self.enemy_map[*pos] = False
+        self.__refresh(pos)
+        self.enemy_slots[*pos] = -1
+        self.enemies.remove(enemy.get_slot())
+
+    def get_first_of(self, layer: str) -> tuple[int, int] | None:
+        '''
+        The cell of 'route', 'heal' or 'power' with the smallest x + y (the first one in row-major order on ties),
+        or None when the layer is empty. This is the cell GenEnv reports as the closest one of that layer.
+        '''
+        return self.__first[layer]
+
+    def __mark(self, layer: str, pos: Pos):
+        first = self.__first[layer]
+        if first is None or (pos.x + pos.y, pos.x) < (first[0] + first[1], first[0]):
+            self.__first[layer] = (int(pos.x), int(pos.y))
+
+    def __unmark(self, layer: str, pos: Pos):
+        if self.__first[layer] == (pos.x, pos.y):
+            self.__rescan(layer)
+
+    def __rescan(self, layer: str):
+        _map = self.__layers[layer]
+        if not _map.any():
+            self.__first[layer] = None
             return
+        x, y = _indices(self.map_size)
+        first = np.argmin(np.where(_map, x + y, 2 * self.map_size))
+        self.__first[layer] = (int(first // self.map_size), int(first % self.map_size))
+
+    def __refresh(self, pos: Pos):
+        (x, y) = pos
+        cell = (x + self.VIEW_PAD, y + self.VIEW_PAD)
+        wall = int(self.wall_map[x, y])
+        self.padded_wall_map[cell] = wall
+        self.padded_enemy_map[cell] = self.enemy_map[x, y]
+        if pos == self.end_location:
+            return
+        self.wall_view[cell] = wall
+        if wall:
+            self.solver_view[cell] = -1
+        else:
+            self.solver_view[cell] = int(self.enemy_map[x, y]) + int(self.heal_map[x, y]) + int(self.power_map[x, y])
+
+    def solvability(self) -> tuple[bool, int]:
+        '''
+        Whether the exit can be reached from the start through the walls, and the length of the shortest path.
+        '''
+        return shortest_path(self.wall_map, self.start_location, self.end_location)
+
+    def get_ground(self) -> np.ndarray:
+        return self.__ground
+
+    def set_ground(self, ground: np.ndarray):
+        self.__ground = np.array(ground)
+        self.__static = None
 
     def get_start_pos(self) -> Pos:
         return self.start_location
@@ -104,25 +293,39 @@ class Level:
     def get_exit_pos(self) -> Pos:
         return self.end_location
 
-    def render(self, screen):
+    def static_layer(self) -> Surface:
+        '''
+        The ground and the walls of the level, composited on first use and again after a wall was added.
+        '''
+        if self.__static is None:
+            grass = Atlas.tiles(Utils.GRASS)
+            wall = Atlas.image(Utils.WALL)
+            size = self.map_size * Utils.TILE_SIZE
+            self.__static = Surface((size, size)).convert()
+            self.__static.blits([(grass[tile], (x * Utils.TILE_SIZE, y * Utils.TILE_SIZE))
+                                 for ((x, y), tile) in np.ndenumerate(self.__ground)], doreturn=False)
+            self.__static.blits([(wall, (x * Utils.TILE_SIZE, y * Utils.TILE_SIZE))
+                                 for (x, y) in np.argwhere(self.wall_map).tolist()], doreturn=False)
+        return self.__static
+
+    def render(self, screen, static: bool = True) -> list[Rect]:
+        '''
+        Draw the level on ``screen``: the static layer unless ``static`` is False because it is already there, then
+        the items and the bonfire, whose rectangles are returned.
+        '''
+        bonfire = Atlas.tiles(Utils.EXIT)
         self.BONFIRE_FRAME %= (self.BONFIRE_FRAMES - 1)
         self.BONFIRE_FRAME += 1
 
-        # render ground
-        for (x, y) in np.ndindex((self.map_size, self.map_size)):
-            pos = Pos(x=x, y=y)
-            coord = pos * Utils.TILE_SIZE
-            screen.blit(self.__grass[self.__ground[*pos]], (coord.x, coord.y))
-
-        # render walls
-        for wall_pos in self.get_walls():
-            coord = wall_pos * Utils.TILE_SIZE
-            screen.blit(Utils.WALL, (coord.x, coord.y))
+        if static:
+            screen.blit(self.static_layer(), (0, 0))
 
-        # render items
+        drawn = []
         for item in self.get_items():
             item.render(screen)
+            drawn.append(Utils.tile_rect(item.get_pos()))
 
-        # render bonfire
         end_coord = self.end_location * Utils.TILE_SIZE
-        screen.blit(self.__exit[self.BONFIRE_FRAME], (end_coord.x, end_coord.y))
+        screen.blit(bonfire[self.BONFIRE_FRAME], (end_coord.x, end_coord.y))
+        drawn.append(Utils.tile_rect(self.end_location))
+        return drawn
@@ -0,0 +1,249 @@
+import os
+
+import numpy as np
+
+from game.level import Level
+
+MAGIC = b'LVLS'
+VERSION = 1
+LAYERS = ('wall_map', 'enemy_map', 'heal_map', 'power_map')
+META = ('density', 'damage', 'health', 'item', 'safe_zone', 'solved', 'path_length')
+
+# file header, followed by `count` records of record_dtype(max_size)
+HEADER = np.dtype([('magic', 'S4'), ('version', '<u2'), ('max_size', '<u2'), ('count', '<u8')])
+
+
+def record_dtype(max_size: int) -> np.dtype:
+    '''
+    Fixed-size record of one level of a dataset whose levels are at most ``max_size`` cells wide.
+
+    Every layer is a bit-packed (max_size, max_size) map with the level in its top left corner. ``solved`` is 1 or 0
+    when the level was checked and -1 otherwise, ``path_length`` is -1 when unknown or unreachable, and the float
+    metadata is NaN when unknown.
+    '''
+    nbytes = (max_size * max_size + 7) // 8
+    return np.dtype([('map_size', 'u1'), ('start', 'u1', (2,)), ('end', 'u1', (2,))]
+                    + [(layer, 'u1', (nbytes,)) for layer in LAYERS]
+                    + [('density', '<f4'), ('damage', '<f4'), ('health', '<u2'), ('item', '<u2'),
+                       ('safe_zone', 'u1'), ('solved', 'i1'), ('path_length', '<i2')])
+
+
+def pack_maps(maps: np.ndarray, max_size: int) -> np.ndarray:
+    '''
+    Bit-pack a batch of (N, S, S) boolean maps, S <= max_size, into the (N, bytes) layout of a record.
+    '''
+    maps = np.asarray(maps, dtype=bool)
+    (n, size) = maps.shape[:2]
+    if size > max_size:
+        raise ValueError(f'levels of size {size} do not fit a dataset of max_size {max_size}')
+    if size != max_size:
+        padded = np.zeros((n, max_size, max_size), dtype=bool)
+        padded[:, :size, :size] = maps
+        maps = padded
+    return np.packbits(maps.reshape(n, -1), axis=1)
+
+
+def unpack_maps(packed: np.ndarray, max_size: int) -> np.ndarray:
+    '''
+    Inverse of pack_maps, a batch of (N, max_size, max_size) boolean maps.
+    '''
+    packed = np.asarray(packed)
+    maps = np.unpackbits(packed, axis=1, count=max_size * max_size)
+    return maps.reshape(len(packed), max_size, max_size).view(bool)
+
+
+def pack_records(max_size: int, wall_map, enemy_map, heal_map, power_map, map_size, start, end,
+                 **meta) -> np.ndarray:
+    '''
+    Records of N levels, with the arguments of LevelWriter.write_batch. Packing can run apart from the writer, e.g.
+    in the process that generated the levels.
+    '''
+    map_size = np.asarray(map_size)
+    records = np.zeros(len(map_size), dtype=record_dtype(max_size))
+    records['map_size'] = map_size
+    records['start'] = start
+    records['end'] = end
+    for (layer, maps) in zip(LAYERS, (wall_map, enemy_map, heal_map, power_map)):
+        records[layer] = pack_maps(maps, max_size)
+    records['density'] = records['damage'] = np.nan
+    records['solved'] = records['path_length'] = -1
+    for (key, value) in meta.items():
+        if key not in META:
+            raise TypeError(f'unknown level metadata {key!r}')
+        records[key] = value
+    return records
+
+
+def _read_header(f) -> np.void:
+    header = np.frombuffer(f.read(HEADER.itemsize), dtype=HEADER)
+    if len(header) != 1 or header[0]['magic'] != MAGIC:
+        raise ValueError(f'{getattr(f, "name", f)} is not a level dataset')
+    if header[0]['version'] != VERSION:
+        raise ValueError(f'unsupported level dataset version {header[0]["version"]}')
+    return header[0]
+
+
+class LevelWriter:
+    '''
+    Streams levels into a dataset file readable with LevelReader.
+
+    Records are buffered and appended in blocks; the header count is rewritten after every block, so a file whose
+    writer died part way is still readable up to the last flushed block.
+
+    Parameters
+    ----------
+    path: str
+        The dataset file.
+    max_size: int, default=10
+        The largest level size the dataset can hold.
+    append: bool, default=False
+        Add to an existing dataset instead of truncating it, its max_size is used.
+    buffer_size: int, default=4096
+        The number of records kept in memory between writes.
+    '''
+
+    def __init__(self, path, max_size=10, append=False, buffer_size=4096):
+        self.path = path
+        if append and os.path.exists(path):
+            self.file = open(path, 'r+b')
+            header = _read_header(self.file)
+            self.max_size = int(header['max_size'])
+            self.count = int(header['count'])
+            self.file.seek(HEADER.itemsize + self.count * record_dtype(self.max_size).itemsize)
+            self.file.truncate()
+        else:
+            self.file = open(path, 'w+b')
+            self.max_size = max_size
+            self.count = 0
+            self.__write_header()
+        self.buffer = np.zeros(buffer_size, dtype=record_dtype(self.max_size))
+        self.buffered = 0
+
+    def write(self, level: Level, **meta):
+        '''
+        Add one level. ``meta`` takes the fields of META, see record_dtype.
+        '''
+        s = level.map_size
+        self.write_batch(level.wall_map[None], level.enemy_map[None], level.heal_map[None], level.power_map[None],
+                         map_size=[s], start=[tuple(level.start_location)], end=[tuple(level.end_location)],
+                         **{key: [value] for (key, value) in meta.items()})
+
+    def write_batch(self, wall_map, enemy_map, heal_map, power_map, map_size, start, end, **meta):
+        '''
+        Add N levels from (N, S, S) layer maps, their (N,) sizes and (N, 2) starts and ends. Every level occupies
+        the top left map_size x map_size corner of its maps. ``meta`` takes (N,) arrays of the fields of META.
+        '''
+        self.write_records(pack_records(self.max_size, wall_map, enemy_map, heal_map, power_map,
+                                        map_size, start, end, **meta))
+
+    def write_records(self, records: np.ndarray):
+        '''
+        Add already packed records, e.g. a batch read from another dataset with the same max_size.
+        '''
+        if records.dtype != self.buffer.dtype:
+            raise ValueError(f'records do not match the layout of a dataset of max_size {self.max_size}')
+        start = 0
+        while start < len(records):
+            n = min(len(records) - start, len(self.buffer) - self.buffered)
+            self.buffer[self.buffered:self.buffered + n] = records[start:start + n]
+            self.buffered += n
+            start += n
+            if self.buffered == len(self.buffer):
+                self.flush()
+
+    def flush(self):
+        if not self.buffered:
+            return
+        self.file.write(self.buffer[:self.buffered].tobytes())
+        self.count += self.buffered
+        self.buffered = 0
+        self.__write_header()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __write_header(self):
+        end = self.file.tell()
+        self.file.seek(0)
+        self.file.write(np.array((MAGIC, VERSION, self.max_size, self.count), dtype=HEADER).tobytes())
+        self.file.flush()
+        self.file.seek(max(end, HEADER.itemsize))
+
+    def __enter__(self) -> 'LevelWriter':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class LevelReader:
+    '''
+    Memory-mapped view of a dataset written by LevelWriter. Records are only read from disk when they are accessed,
+    and batches are unpacked with a few array operations.
+
+    Parameters
+    ----------
+    path: str
+        The dataset file.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = _read_header(f)
+        self.max_size = int(header['max_size'])
+        dtype = record_dtype(self.max_size)
+        count = int(header['count'])
+        if count:
+            self.records = np.memmap(path, dtype=dtype, mode='r', offset=HEADER.itemsize, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=dtype)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index: int) -> Level:
+        return self.level(index)
+
+    def level(self, index: int) -> Level:
+        batch = self.load([index])
+        s = int(batch['map_size'][0])
+        return Level.from_arrays(*(batch[layer][0, :s, :s] for layer in LAYERS),
+                                 start=batch['start'][0], end=batch['end'][0])
+
+    def load(self, indices) -> dict[str, np.ndarray]:
+        '''
+        Unpack the records at ``indices`` (an index array or a slice).
+
+        Returns
+        -------
+        dict of numpy.ndarray
+            (N, max_size, max_size) boolean maps under the names of LAYERS, and map_size, start, end and the
+            fields of META with one row per level.
+        '''
+        records = self.records[indices]
+        batch = {layer: unpack_maps(records[layer], self.max_size) for layer in LAYERS}
+        for key in ('map_size', 'start', 'end') + META:
+            batch[key] = np.array(records[key])
+        return batch
+
+    def sample(self, n: int, rng: np.random.Generator = None) -> dict[str, np.ndarray]:
+        '''
+        Load ``n`` levels drawn uniformly with replacement, in the order they were drawn.
+        '''
+        rng = np.random.default_rng() if rng is None else rng
+        indices = rng.integers(0, len(self), size=n)
+        # read the memmap in file order, then put the rows back in the drawn order
+        order = np.argsort(indices, kind='stable')
+        batch = self.load(indices[order])
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(n)
+        return {key: value[inverse] for (key, value) in batch.items()}
+
+    def batches(self, batch_size: int = 4096):
+        '''
+        Iterate over the whole dataset in loaded batches of ``batch_size`` levels.
+        '''
+        for start in range(0, len(self), batch_size):
+            yield self.load(slice(start, start + batch_size))
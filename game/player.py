@@ -1,5 +1,4 @@
-import pygame
-
+from game.atlas import Atlas
 from game.entity import Entity
 from game.item import Item
 from game.utils import Utils
@@ -14,6 +13,13 @@ class Player(Entity):
     __HURT_FRAMES = 4
     __DEAD_FRAMES = 4
 
+    # offsets of each animation in the necromancer sheet
+    __IDLE_OFFSET = 0
+    __MOVE_OFFSET = 4
+    __ATTACK_OFFSET = 8
+    __HURT_OFFSET = 12
+    __DEAD_OFFSET = 16
+
     __SPEED = 1
     __HEALTH = 10
     __POWER = 3
@@ -21,25 +27,18 @@ class Player(Entity):
 
     def __init__(self, pos):
         super().__init__(pos=pos, speed=self.__SPEED, health=self.__HEALTH, power=self.__POWER)
-        self.__player = Utils.get_tile_set(Utils.PLAYER, Utils.TILE_SIZE)
-        self.__idle = self.__player[:4]
-        self.__move = self.__player[4:8]
-        self.__attack = self.__player[8:12]
-        self.__hurt = self.__player[12:16]
-        self.__die = self.__player[16:]
 
     def get_next_pos(self, direction: Utils.Direction) -> Pos:
-        diff = Pos(0, 0)
         match direction:
             case Utils.Direction.UP:
-                diff = Pos(0, 1)
+                return self._pos.offset(0, 1)
             case Utils.Direction.DOWN:
-                diff = Pos(0, -1)
+                return self._pos.offset(0, -1)
             case Utils.Direction.LEFT:
-                diff = Pos(-1, 0)
+                return self._pos.offset(-1, 0)
             case Utils.Direction.RIGHT:
-                diff = Pos(1, 0)
-        return self._pos + diff
+                return self._pos.offset(1, 0)
+        return self._pos
 
     def receive_bonus(self, item: Item):
         match item.get_type():
@@ -83,21 +82,20 @@ class Player(Entity):
         self.FRAME %= self.get_state_frames()
 
     def render(self, screen):
+        sprites = Atlas.tiles(Utils.PLAYER, flip=self._direction == Utils.Direction.LEFT)
         coord = self._pos * Utils.TILE_SIZE
         coord = (coord.x, coord.y)
-        flip = self._direction == Utils.Direction.LEFT
         match self._state:
             case Utils.EntityState.IDLE:
-                surface = self.__idle[self.FRAME]
+                offset = self.__IDLE_OFFSET
             case Utils.EntityState.MOVE:
-                surface = self.__move[self.FRAME]
+                offset = self.__MOVE_OFFSET
             case Utils.EntityState.HURT:
-                surface = self.__hurt[self.FRAME]
+                offset = self.__HURT_OFFSET
             case Utils.EntityState.ATTACK:
-                surface = self.__attack[self.FRAME]
+                offset = self.__ATTACK_OFFSET
             case Utils.EntityState.DEAD:
-                surface = self.__die[self.FRAME]
+                offset = self.__DEAD_OFFSET
             case _:
                 return
-        surface = pygame.transform.flip(surface, flip, False)
-        screen.blit(surface, coord)
+        screen.blit(sprites[offset + self.FRAME], coord)
@@ -1,22 +1,25 @@
-from dataclasses import dataclass
+from typing import NamedTuple
 
 
-@dataclass
-class CartesianPosition:
+class CartesianPosition(NamedTuple):
+    '''
+    Immutable (x, y) cell of a level. Being a tuple it carries no per-instance dict, hashes and compares like
+    ``(x, y)``, and unpacks and indexes NumPy arrays without going through Python-level methods.
+    '''
     x: int
     y: int
 
     def __add__(self, other: 'CartesianPosition'):
-        return CartesianPosition(x=self.x + other.x, y=self.y + other.y)
+        return CartesianPosition(self.x + other.x, self.y + other.y)
 
     def __sub__(self, other: 'CartesianPosition'):
-        return CartesianPosition(x=self.x - other.x, y=self.y - other.y)
+        return CartesianPosition(self.x - other.x, self.y - other.y)
 
     def __mul__(self, other: int):
-        return CartesianPosition(x=self.x * other, y=self.y * other)
-
-    def __iter__(self):
-        return iter((self.x, self.y))
+        return CartesianPosition(self.x * other, self.y * other)
 
     def __copy__(self):
-        return CartesianPosition(x=self.x, y=self.y)
+        return self
+
+    def offset(self, dx: int, dy: int) -> 'CartesianPosition':
+        return CartesianPosition(self.x + dx, self.y + dy)
@@ -0,0 +1,159 @@
+from functools import lru_cache
+
+import numpy as np
+import pygame
+
+from game.level import Level
+from game.utils import Utils
+
+# every cell is drawn as one pre-composited tile, picked by a code of its ground tile, wall, item (none, healing,
+# power), enemy and marker (none, start, exit, both); the last tile of the table is the black outside of a level
+ITEMS = 3
+MARKERS = 4
+CODES = Utils.GROUND_TILES * 2 * ITEMS * 2 * MARKERS
+OUTSIDE = CODES
+
+
+@lru_cache
+def _sprites(path: str) -> tuple[np.ndarray, np.ndarray]:
+    # (n, T, T, 3) colours and (n, T, T) alphas of a sprite sheet, sliced row by row like Utils.get_tile_set;
+    # decoded without a display
+    image = pygame.image.load(path)
+    rgb = pygame.surfarray.array3d(image).transpose(1, 0, 2).astype(np.int32)
+    alpha = pygame.surfarray.array_alpha(image).T.astype(np.int32)
+    t = Utils.TILE_SIZE
+    (rows, columns) = (rgb.shape[0] // t, rgb.shape[1] // t)
+    rgb = rgb[:rows * t, :columns * t].reshape(rows, t, columns, t, 3).transpose(0, 2, 1, 3, 4)
+    alpha = alpha[:rows * t, :columns * t].reshape(rows, t, columns, t).transpose(0, 2, 1, 3)
+    return rgb.reshape(-1, t, t, 3), alpha.reshape(-1, t, t)
+
+
+def _blend(dst: np.ndarray, sprite: tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+    # pygame's blit of a per-pixel alpha sprite onto an opaque surface
+    (rgb, alpha) = sprite
+    return (((rgb - dst) * alpha[..., None] + rgb) >> 8) + dst
+
+
+def _sprite(path: str, index: int) -> tuple[np.ndarray, np.ndarray]:
+    (rgb, alpha) = _sprites(path)
+    return rgb[index], alpha[index]
+
+
+@lru_cache
+def tile_table(tile_size: int = Utils.TILE_SIZE) -> np.ndarray:
+    '''
+    The (CODES + 1, tile_size, tile_size, 3) tiles of all cell codes, composited in the order Game.render draws:
+    ground, wall, item, bonfire, player, enemy. Smaller tiles than Utils.TILE_SIZE are averaged down from it.
+    '''
+    if Utils.TILE_SIZE % tile_size:
+        raise ValueError(f'tile_size must divide {Utils.TILE_SIZE}')
+    t = Utils.TILE_SIZE
+    (ground, _) = _sprites(Utils.GRASS)
+    table = np.broadcast_to(ground[:Utils.GROUND_TILES, None, None, None, None],
+                            (Utils.GROUND_TILES, 2, ITEMS, 2, MARKERS, t, t, 3)).copy()
+    table[:, 1] = _blend(table[:, 1], _sprite(Utils.WALL, 0))
+    table[:, :, 1] = _blend(table[:, :, 1], _sprite(Utils.ITEM, 0))
+    table[:, :, 2] = _blend(table[:, :, 2], _sprite(Utils.ITEM, 1))
+    # the bonfire as drawn by the first frame of a level, the player and enemies idle
+    table[..., 2:, :, :, :] = _blend(table[..., 2:, :, :, :], _sprite(Utils.EXIT, 1))
+    table[..., 1::2, :, :, :] = _blend(table[..., 1::2, :, :, :], _sprite(Utils.PLAYER, 0))
+    table[:, :, :, 1] = _blend(table[:, :, :, 1], _sprite(Utils.ENEMY, 0))
+    table = np.concatenate((table.reshape(CODES, t, t, 3), np.zeros((1, t, t, 3), dtype=table.dtype)))
+    f = t // tile_size
+    table = table.reshape(CODES + 1, tile_size, f, tile_size, f, 3).mean(axis=(2, 4))
+    return np.round(table).astype(np.uint8)
+
+
+@lru_cache
+def default_ground(size: int) -> np.ndarray:
+    '''
+    The ground tiles of levels rasterized without their own, the same for every level of a size.
+    '''
+    return np.random.default_rng(size).integers(0, Utils.GROUND_TILES, size=(size, size))
+
+
+def rasterize(wall_map, enemy_map, heal_map, power_map, start, end, map_size=None, ground=None,
+              tile_size: int = Utils.TILE_SIZE) -> np.ndarray:
+    '''
+    RGB images of a batch of levels, drawn as Game.render draws them before the first tick, without a display.
+
+    Parameters
+    ----------
+    wall_map, enemy_map, heal_map, power_map: array-like
+        (N, S, S) boolean maps indexed [x][y], with every level in the top left corner, as loaded from a level
+        dataset (see game.level_dataset.LevelReader.load).
+    start, end: array-like
+        (N, 2) entry and exit cells.
+    map_size: array-like, optional
+        (N,) sizes of the levels, the cells beyond them are black. All levels are S wide when not given.
+    ground: array-like, optional
+        (N, S, S) ground tile numbers, default_ground(S) when not given.
+    tile_size: int, default=Utils.TILE_SIZE
+        Pixels per cell, a divisor of Utils.TILE_SIZE; smaller tiles make thumbnails.
+
+    Returns
+    -------
+    numpy.ndarray
+        (N, S * tile_size, S * tile_size, 3) uint8 images, rows going down y.
+    '''
+    wall_map = np.asarray(wall_map, dtype=bool)
+    (n, size) = wall_map.shape[:2]
+    rows = np.arange(n)
+    heal_map = np.asarray(heal_map, dtype=bool)
+    power_map = np.asarray(power_map, dtype=bool)
+    # a healing and a power item on one cell are loaded by Level.from_arrays as the power item
+    item = np.where(power_map, 2, heal_map.astype(np.int64))
+    marker = np.zeros((n, size, size), dtype=np.int64)
+    (start, end) = (np.asarray(start, dtype=np.int64), np.asarray(end, dtype=np.int64))
+    marker[rows, start[:, 0], start[:, 1]] += 1
+    marker[rows, end[:, 0], end[:, 1]] += 2
+    ground = default_ground(size) if ground is None else np.asarray(ground, dtype=np.int64)
+
+    codes = (((ground * 2 + wall_map) * ITEMS + item) * 2 + np.asarray(enemy_map, dtype=bool)) * MARKERS + marker
+    if map_size is not None:
+        cells = np.arange(size)
+        limit = np.asarray(map_size)[:, None, None]
+        codes = np.where((cells[None, :, None] < limit) & (cells[None, None, :] < limit), codes, OUTSIDE)
+
+    # (N, y, x) codes pick (N, y, x, t, t, 3) tiles, which are laid out into whole images
+    tiles = tile_table(tile_size)[codes.transpose(0, 2, 1)]
+    return tiles.transpose(0, 1, 3, 2, 4, 5).reshape(n, size * tile_size, size * tile_size, 3)
+
+
+def rasterize_levels(levels: list[Level], tile_size: int = Utils.TILE_SIZE) -> np.ndarray:
+    '''
+    rasterize() for Level objects, with their own ground tiles, padded to the largest of them.
+    '''
+    size = max(level.map_size for level in levels)
+    batch = {name: np.zeros((len(levels), size, size), dtype=bool)
+             for name in ('wall_map', 'enemy_map', 'heal_map', 'power_map')}
+    ground = np.zeros((len(levels), size, size), dtype=np.int64)
+    for (i, level) in enumerate(levels):
+        s = level.map_size
+        for (name, maps) in batch.items():
+            maps[i, :s, :s] = getattr(level, name)
+        ground[i, :s, :s] = level.get_ground()
+    return rasterize(**batch, start=[level.start_location for level in levels],
+                     end=[level.end_location for level in levels], map_size=[level.map_size for level in levels],
+                     ground=ground, tile_size=tile_size)
+
+
+def contact_sheet(images: np.ndarray, columns: int, padding: int = 2) -> np.ndarray:
+    '''
+    Lay out (N, H, W, 3) images in a grid of ``columns`` columns, separated by ``padding`` black pixels.
+    '''
+    (n, h, w) = images.shape[:3]
+    rows = -(-n // columns)
+    grid = np.zeros((rows * columns, h + padding, w + padding, 3), dtype=np.uint8)
+    grid[:n, padding:, padding:] = images
+    grid = grid.reshape(rows, columns, h + padding, w + padding, 3).transpose(0, 2, 1, 3, 4)
+    sheet = np.zeros((rows * (h + padding) + padding, columns * (w + padding) + padding, 3), dtype=np.uint8)
+    sheet[:-padding or None, :-padding or None] = grid.reshape(rows * (h + padding), columns * (w + padding), 3)
+    return sheet
+
+
+def save_png(path: str, image: np.ndarray):
+    '''
+    Write an (H, W, 3) image, works without a display.
+    '''
+    pygame.image.save(pygame.surfarray.make_surface(np.ascontiguousarray(image.transpose(1, 0, 2))), path)
@@ -0,0 +1,107 @@
+import numpy as np
+
+
+def _grow(frontier: np.ndarray) -> np.ndarray:
+    '''
+    Cells one step (up, down, left or right) away from any frontier cell, for a batch of (N, S, S) masks.
+    '''
+    grown = np.zeros_like(frontier)
+    grown[:, 1:, :] |= frontier[:, :-1, :]
+    grown[:, :-1, :] |= frontier[:, 1:, :]
+    grown[:, :, 1:] |= frontier[:, :, :-1]
+    grown[:, :, :-1] |= frontier[:, :, 1:]
+    return grown
+
+
+def _as_batch(wall_maps, points, inside):
+    walls = np.asarray(wall_maps, dtype=bool)
+    single = walls.ndim == 2
+    if single:
+        walls = walls[None]
+        points = [points]
+        inside = None if inside is None else np.asarray(inside)[None]
+    free = ~walls if inside is None else ~walls & np.asarray(inside, dtype=bool)
+    return single, walls, np.asarray([tuple(p) for p in points], dtype=np.int64).reshape(-1, 2), free
+
+
+def distance_field(wall_maps, sources, inside=None) -> np.ndarray:
+    '''
+    Breadth-first distances from a source cell to every cell of a level, moving like the player does.
+
+    The player moves one cell up, down, left or right per step and cannot enter walls. The source itself counts as
+    reachable even when it is a wall, because the player can be placed on one.
+
+    Parameters
+    ----------
+    wall_maps: array-like
+        An (S, S) wall map, or a batch of (N, S, S) wall maps.
+    sources: array-like
+        The (x, y) source, or N of them.
+    inside: array-like, optional
+        Mask of the cells that belong to the level, for batches of levels of different sizes padded to S.
+
+    Returns
+    -------
+    numpy.ndarray
+        Step counts with the shape of ``wall_maps``, -1 where the cell cannot be reached.
+    '''
+    single, walls, sources, free = _as_batch(wall_maps, sources, inside)
+    n = len(walls)
+    dist = np.full(walls.shape, -1, dtype=np.int32)
+    frontier = np.zeros(walls.shape, dtype=bool)
+    frontier[np.arange(n), sources[:, 0], sources[:, 1]] = True
+    visited = frontier.copy()
+    dist[frontier] = 0
+    d = 0
+    while frontier.any():
+        d += 1
+        frontier = _grow(frontier) & free & ~visited
+        visited |= frontier
+        dist[frontier] = d
+    return dist[0] if single else dist
+
+
+def shortest_path(wall_maps, starts, ends, inside=None) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Whether the exit of each level can be reached from its start, and in how many steps.
+
+    The search expands all levels together one step per iteration and stops as soon as every exit has been reached
+    or no level can grow any further.
+
+    Parameters
+    ----------
+    wall_maps: array-like
+        An (S, S) wall map, or a batch of (N, S, S) wall maps.
+    starts, ends: array-like
+        The (x, y) start and exit, or N of each.
+    inside: array-like, optional
+        Mask of the cells that belong to the level, see distance_field.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        The reachable flags and the shortest path lengths (-1 when unreachable); scalars for a single level.
+    '''
+    single, walls, starts, free = _as_batch(wall_maps, starts, inside)
+    ends = np.asarray([tuple(p) for p in ([ends] if single else ends)], dtype=np.int64).reshape(-1, 2)
+    n = len(walls)
+    rows = np.arange(n)
+    length = np.full(n, -1, dtype=np.int64)
+    frontier = np.zeros(walls.shape, dtype=bool)
+    frontier[rows, starts[:, 0], starts[:, 1]] = True
+    visited = frontier.copy()
+    d = 0
+    while True:
+        reached = (length < 0) & frontier[rows, ends[:, 0], ends[:, 1]]
+        length[reached] = d
+        # levels whose exit was reached stop growing
+        frontier[length >= 0] = False
+        if not frontier.any():
+            break
+        d += 1
+        frontier = _grow(frontier) & free & ~visited
+        visited |= frontier
+    reachable = length >= 0
+    if single:
+        return bool(reachable[0]), int(length[0])
+    return reachable, length
@@ -8,25 +8,39 @@ class Utils:
     SCREEN_HEIGHT = 480
     FRAME_RATE = 8
     COOLDOWN = 4
-    ICON = pygame.image.load('assets/icon.png')
+    ICON = 'assets/icon.png'
 
     MAP_SIZE = 16
     TILE_SIZE = 16
 
-    GRASS = pygame.image.load('assets/grass.png')
-    ITEM = pygame.image.load('assets/mushroom.png')
-    WALL = pygame.image.load('assets/wall.png')
-    EXIT = pygame.image.load('assets/bonfire.png')
-    PLAYER = pygame.image.load('assets/necromancer.png')
-    ENEMY = pygame.image.load('assets/slime.png')
+    # sprite sheets are only decoded when something is rendered, see load_image
+    GRASS = 'assets/grass.png'
+    ITEM = 'assets/mushroom.png'
+    WALL = 'assets/wall.png'
+    EXIT = 'assets/bonfire.png'
+    PLAYER = 'assets/necromancer.png'
+    ENEMY = 'assets/slime.png'
+    FONT = 'assets/Gamepixies.ttf'
+
+    GROUND_TILES = 9
 
     LevelObject = Enum('LevelObject', ['GRASS', 'WALL', 'ITEM_HEAL', 'ITEM_POWER', 'ENEMY', 'ENTER', 'EXIT'])
     EntityState = Enum('EntityState', ['IDLE', 'MOVE', 'HURT', 'ATTACK', 'DEAD'])
     Direction = Enum('Direction', ['UP', 'DOWN', 'LEFT', 'RIGHT'])
     ItemType = Enum('ItemType', ['HEALTH', 'POWER'])
 
+    @staticmethod
+    def load_image(path):
+        return pygame.image.load(path)
+
+    @staticmethod
+    def tile_rect(pos) -> pygame.Rect:
+        return pygame.Rect(pos[0] * Utils.TILE_SIZE, pos[1] * Utils.TILE_SIZE, Utils.TILE_SIZE, Utils.TILE_SIZE)
+
     @staticmethod
     def get_tile_set(image, tile_size):
+        if isinstance(image, str):
+            image = Utils.load_image(image)
         tiles = []
         x0 = y0 = 0
 
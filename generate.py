@@ -0,0 +1,183 @@
+'''
+Mass-produce levels with the trained WALLS, ENEMY and ITEM generators, without learning or rendering.
+
+Run from the repository root:
+
+    python generate.py --levels 100000 --out levels.lvl --models models --solvable
+
+Every worker process loads the q networks of the generators from --models (see load_generators) and runs a
+VecGenEnv batch of levels through the generator stages greedily, deciding many cells of all levels with one
+forward pass (see VecGenEnv.generate; --sweep steps the levels cell by cell instead). Finished levels are packed
+in the worker and written in bulk to a level dataset (see game.level_dataset) by this process. With --solvable,
+levels whose exit cannot be reached from their start are dropped and generation goes on until --levels levels were
+written.
+'''
+import argparse
+import os
+import time
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from game.level_dataset import LevelReader, LevelWriter, pack_records
+from game.solvability import shortest_path
+from network.agent import D3QNAgent
+from network.checkpoint import Checkpointer
+from network.environment import Stage
+from network.vec_environment import VecGenEnv
+
+GENERATORS = (Stage.WALLS, Stage.ENEMY, Stage.ITEM)
+
+# generators of a worker process, loaded once by _init_worker
+_agent: dict[Stage, D3QNAgent] = {}
+
+
+def load_generators(models: str, agent_spaces: dict[Stage, tuple[int, int]],
+                    hidden_size: int = 64) -> dict[Stage, D3QNAgent]:
+    '''
+    Acting-only agents of the generator stages with the q networks of the newest checkpoint in ``models`` (see
+    network.checkpoint), or else the ones saved by D3QNAgent.save under ``<models>/<STAGE>``.
+    '''
+    networks = Checkpointer(models).q_networks()
+    agent = {}
+    for stage in GENERATORS:
+        (obs, act) = agent_spaces[stage]
+        agent[stage] = D3QNAgent(state_size=obs, action_size=act, hidden_size=hidden_size, buffer_size=1)
+        weights = torch.load(f"{models}/{stage.name}.q") if networks is None else networks[stage.name]
+        agent[stage].q_network.load_state_dict(weights)
+    return agent
+
+
+def generate(env: VecGenEnv, agent: dict[Stage, D3QNAgent], n_levels: int, solvable: bool = False,
+             sweep: bool = False, max_size: int = None) -> tuple[np.ndarray, int]:
+    '''
+    Play ``env`` greedily until ``n_levels`` levels finished their ITEM stage, in whole-map passes (see
+    VecGenEnv.generate) or, with ``sweep``, stepping the levels cell by cell. The records are packed for a dataset
+    of ``max_size``, env.S when not given.
+
+    Returns
+    -------
+    tuple
+        The packed records of the levels that were kept, and the number of levels generated.
+    '''
+    cells = np.arange(env.S)
+    max_size = env.S if max_size is None else max_size
+    records = []
+    made = 0
+    for levels in (_swept_levels(env, agent) if sweep else _whole_map_levels(env, agent)):
+        n = min(len(levels["map_size"]), n_levels - made)
+        if not n:
+            continue
+        levels = {key: value[:n] for (key, value) in levels.items()}
+        made += n
+
+        size = levels["map_size"][:, None, None]
+        inside = (cells[None, :, None] < size) & (cells[None, None, :] < size)
+        solved, length = shortest_path(levels["wall_map"], levels["start"], levels["end"], inside)
+        if solvable:
+            levels = {key: value[solved] for (key, value) in levels.items()}
+            (solved, length) = (solved[solved], length[solved])
+        records.append(pack_records(max_size, **levels, solved=solved, path_length=length))
+        if made == n_levels:
+            break
+    return np.concatenate(records), made
+
+
+def _whole_map_levels(env: VecGenEnv, agent: dict[Stage, D3QNAgent]):
+    act = {stage: agent[stage].act_batch for stage in GENERATORS}
+    env.reset()
+    while True:
+        yield env.generate(act)
+
+
+def _swept_levels(env: VecGenEnv, agent: dict[Stage, D3QNAgent]):
+    obs, _ = env.reset()
+    actions = np.zeros(env.n_envs, dtype=np.int64)
+    while True:
+        for stage in GENERATORS:
+            rows = np.flatnonzero(env.stage == stage.value)
+            if rows.size:
+                actions[rows] = agent[stage].act_batch(obs[rows, :env.obs_width(stage)])
+        obs, _, _, _, info = env.step(actions)
+        yield info["levels"]
+
+
+def _init_worker(models: str, agent_spaces: dict[Stage, tuple[int, int]], hidden_size: int):
+    torch.set_num_threads(1)
+    _agent.update(load_generators(models, agent_spaces, hidden_size))
+
+
+def _generate_chunk(n_levels: int, batch_size: int, seed: int, env_kwargs: dict, solvable: bool,
+                    sweep: bool, max_size: int) -> tuple[np.ndarray, int]:
+    env = VecGenEnv(batch_size, seed=seed, solve=False, **env_kwargs)
+    return generate(env, _agent, n_levels, solvable, sweep, max_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, default=10000)
+    parser.add_argument("--out", default="levels.lvl")
+    parser.add_argument("--append", action="store_true")
+    parser.add_argument("--models", default="models")
+    parser.add_argument("--hidden-size", type=int, default=64)
+    parser.add_argument("--solvable", action="store_true")
+    parser.add_argument("--sweep", action="store_true", help="step the generators cell by cell")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=1024, help="levels stepped together by a worker")
+    parser.add_argument("--chunk", type=int, default=4096, help="levels generated per worker task")
+    parser.add_argument("--seed", type=int, default=0)
+    for name in ("map-size", "item", "health", "damage", "safe-zone"):
+        parser.add_argument(f"--{name}", type=int)
+    parser.add_argument("--wall-density", type=float)
+    args = parser.parse_args()
+
+    env_kwargs = {key: getattr(args, key) for key in ("map_size", "wall_density", "item", "health", "damage",
+                                                      "safe_zone")}
+    agent_spaces = VecGenEnv(1, **env_kwargs).agent_spaces
+    # levels of random size are up to 10 cells wide
+    size = 10 if args.map_size is None else args.map_size
+    max_size = size
+    if args.append and os.path.exists(args.out):
+        # the records must be packed for the dataset appended to
+        max_size = LevelReader(args.out).max_size
+        if size > max_size:
+            parser.error(f"{args.out} holds levels up to size {max_size}, pass --map-size {max_size} or smaller")
+    init = (args.models, agent_spaces, args.hidden_size)
+
+    start = time.perf_counter()
+    (made, kept) = (0, 0)
+    with LevelWriter(args.out, max_size=max_size, append=args.append) as writer:
+        written = 0
+        if args.workers <= 1:
+            _init_worker(*init)
+            seed = args.seed
+            while written < args.levels:
+                records, n = _generate_chunk(min(args.chunk, args.levels - written), args.batch_size, seed,
+                                             env_kwargs, args.solvable, args.sweep, max_size)
+                writer.write_records(records)
+                (written, made, kept, seed) = (written + len(records), made + n, kept + len(records), seed + 1)
+        else:
+            # keep two tasks per worker in flight, with --solvable it is not known up front how many are needed
+            with mp.get_context("spawn").Pool(args.workers, initializer=_init_worker, initargs=init) as pool:
+                tasks = []
+                seed = args.seed
+                while written < args.levels:
+                    while len(tasks) < 2 * args.workers:
+                        tasks.append(pool.apply_async(_generate_chunk, (args.chunk, args.batch_size, seed, env_kwargs,
+                                                                        args.solvable, args.sweep, max_size)))
+                        seed += 1
+                    records, n = tasks.pop(0).get()
+                    (made, kept) = (made + n, kept + len(records))
+                    records = records[:args.levels - written]
+                    writer.write_records(records)
+                    written += len(records)
+                pool.terminate()
+    elapsed = time.perf_counter() - start
+
+    print(f"wrote {written} levels to {args.out} in {elapsed:.1f}s, {written / elapsed:.0f} levels/s"
+          + (f", {kept / max(made, 1):.1%} of {made} generated were solvable" if args.solvable else ""))
+
+
+if __name__ == '__main__':
+    main()
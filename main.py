@@ -1,23 +1,45 @@
 from collections import deque
+from functools import partial
 
 import numpy as np
 
+from network.actor_pool import ActorPool
 from network.agent import D3QNAgent
+from network.checkpoint import Checkpointer
 from network.environment import GenEnv, Stage
+from network.episode_trace import TraceLog
+from network.instrumentation import Instrumentation
 
+WALL_CHECKS = ("rollout", "prefilter", "oracle")
 
-def train(n_episodes=100, eps_start=1.0, eps_end=0.01, eps_decay=0.995, target_update=10):
+
+def train(n_episodes=100, eps_start=1.0, eps_end=0.01, eps_decay=0.995, target_update=10, n_workers=0,
+          sync_every=1, agent_kwargs=None, wall_check="rollout", checkpoint_dir=None, checkpoint_every=200,
+          stats_log=None, stats_every=10, profile=None, trace_dir=None):
+    '''
+    With n_workers > 0 episodes are played by an ActorPool. Every time the learner runs out of episodes it takes
+    all that the workers finished in the meantime and pushes their transitions into the replay memories in bulk
+    (see D3QNAgent.extend), learning once every train_every transitions as the serial loop does.
+
+    With checkpoint_dir training is checkpointed there every checkpoint_every episodes and at the end, and resumes
+    from its latest checkpoint (see network.checkpoint.Checkpointer) instead of starting from models/.
+
+    Training never renders. With trace_dir every episode is recorded into a rotating log there, watch them with
+    replay.py.
+
+    stats_log appends throughput, episode latency and time per stage every stats_every episodes to a JSONL (or
+    .csv) file, and profile=(first, last) runs cProfile over those episodes into train.prof,
+    see network.instrumentation.Instrumentation. Neither times anything when left out. With workers the env, game
+    and acting timers are those of the worker processes, merged as their episodes are taken, and cProfile only
+    covers the learner.
+    '''
+    if wall_check not in WALL_CHECKS:
+        raise ValueError(f"wall_check must be one of {WALL_CHECKS}, not {wall_check!r}")
     env = GenEnv()
 
     agent: dict[Stage, D3QNAgent] = {}
-    recover = False
     for (stage, (obs, act)) in env.agent_spaces.items():
-        agent[stage] = D3QNAgent(state_size=obs, action_size=act)
-        try:
-            agent[stage].load(f"models/{stage.name}")
-            recover = True
-        except:
-            recover = False
+        agent[stage] = D3QNAgent(state_size=obs, action_size=act, **(agent_kwargs or {}))
 
     wall_scores = []
     enemy_scores = []
@@ -29,6 +51,30 @@ def train(n_episodes=100, eps_start=1.0, eps_end=0.01, eps_decay=0.995, target_u
     item_scores_window = deque(maxlen=100)
     solver_scores_window = deque(maxlen=100)
     eps = eps_start
+    start_episode = 1
+
+    # resume from the latest checkpoint, or start from saved models when there is none
+    checkpointer = Checkpointer(checkpoint_dir) if checkpoint_dir is not None else None
+    state = checkpointer.load(agent) if checkpointer is not None else None
+    if state is not None:
+        eps = state["eps"]
+        start_episode = state["episode"] + 1
+        print(f"resuming from episode {state['episode']} of {checkpoint_dir}")
+        for (window, scores) in zip((wall_scores_window, enemy_scores_window, item_scores_window,
+                                     solver_scores_window), state["scores"]):
+            window.extend(scores)
+        recover = True
+    else:
+        recover = True
+        for (stage, a) in agent.items():
+            try:
+                a.load(f"models/{stage.name}")
+            except FileNotFoundError:
+                recover = False
+                break
+            except ValueError as error:
+                # the weights are loaded by then, only the experiences are lost
+                print(f"{error}, {stage.name} starts with an empty replay buffer")
 
     if not recover:
         for _ in range(0, 20):
@@ -47,34 +93,46 @@ def train(n_episodes=100, eps_start=1.0, eps_end=0.01, eps_decay=0.995, target_u
                   end="")
         print()
 
-    for i_episode in range(1, n_episodes + 1):
-        env.render = i_episode % 50 == 0
-
-        state, _ = env.reset()
-        wall = generator_episode(env, agent[Stage.WALLS], state, eps)
+    # with workers, whole episodes are played by actor processes and only learned from here
+    episode = partial(play_episode, wall_check=wall_check)
+    recording = trace_dir is not None
+    instrumented = stats_log is not None or profile is not None
+    pool = None
+    if n_workers > 0:
+        pool = ActorPool(agent, episode, n_workers=n_workers, record=recording, instrument=instrumented).start()
+    env.recording = recording
+    traces = TraceLog(trace_dir) if recording else None
 
-        state, _ = env.advance()
-        wall_solver = solver_episode(env, agent[Stage.SOLVER], state, eps)
-        wall_reward = 100 if wall_solver[5] else -100
-        agent[Stage.WALLS].step(wall[0], wall[1], wall_reward, wall[3], True)
+    stats = None
+    if instrumented:
+        stats = Instrumentation(stats_log, log_every=stats_every, profile=profile).instrument(env, agent)
+        if pool is not None:
+            stats.wrap(pool, 'drain', 'pool.drain')
+    pending = deque()
 
-        state, _ = env.advance()
-        enemy = generator_episode(env, agent[Stage.ENEMY], state, eps)
+    for i_episode in range(start_episode, n_episodes + 1):
+        if stats is not None:
+            stats.begin_episode(i_episode)
+        if pool is None:
+            scores = episode(env, agent, eps)
+            trace = env.trace
+        else:
+            if not pending:
+                pool.set_eps(eps)
+                pending.extend(pool.drain())
+                for (stage, a) in agent.items():
+                    a.extend([transition for (transitions, *_) in pending for transition in transitions[stage]])
+            (_, scores, trace, timings) = pending.popleft()
+            if stats is not None:
+                stats.merge(timings)
+            if i_episode % sync_every == 0:
+                pool.sync(agent)
 
-        state, _ = env.advance()
-        item = generator_episode(env, agent[Stage.ITEM], state, eps)
-
-        state, _ = env.advance()
-        solver = solver_episode(env, agent[Stage.SOLVER], state, eps, render_first=True)
-
-        reward = 100 if solver[5] else -100
-        agent[Stage.ENEMY].step(enemy[0], enemy[1], reward, enemy[3], True)
-        agent[Stage.ITEM].step(item[0], item[1], reward, item[3], True)
-
-        wall_scores_window.append(wall[4])
-        enemy_scores_window.append(enemy[4])
-        item_scores_window.append(item[4])
-        solver_scores_window.append(solver[4] + wall_solver[4])
+        wall_score, enemy_score, item_score, solver_score = scores
+        wall_scores_window.append(wall_score)
+        enemy_scores_window.append(enemy_score)
+        item_scores_window.append(item_score)
+        solver_scores_window.append(solver_score)
         eps = max(eps_end, eps_decay * eps)
         print(f"\rEpisode {i_episode}\tAverage Score: "
               f"W: {np.mean(wall_scores_window):.2f} "
@@ -87,9 +145,63 @@ def train(n_episodes=100, eps_start=1.0, eps_end=0.01, eps_decay=0.995, target_u
                 a.update_target_network()
         if i_episode % 100 == 0:
             print('\rEpisode {}\tAverage Score: {:.2f}'.format(i_episode, np.mean(wall_scores_window + enemy_scores_window + item_scores_window + solver_scores_window)))
-        # if i_episode % 200 == 0:
-        #     for (stage, _) in env.agent_spaces.items():
-        #         agent[stage].save(f"models/{stage.name}")
+        if checkpointer is not None and (i_episode % checkpoint_every == 0 or i_episode == n_episodes):
+            checkpointer.save(agent, eps=eps, episode=i_episode,
+                              scores=[list(window) for window in (wall_scores_window, enemy_scores_window,
+                                                                  item_scores_window, solver_scores_window)])
+        if traces is not None:
+            traces.write(i_episode, trace)
+        if stats is not None:
+            stats.end_episode(i_episode)
+
+    if stats is not None:
+        stats.close()
+    if checkpointer is not None:
+        checkpointer.close()
+    if traces is not None:
+        traces.close()
+    if pool is not None:
+        pool.close()
+
+
+def play_episode(env: GenEnv, agent: dict[Stage, D3QNAgent], eps: float = 1.0, render: bool = False,
+                 wall_check: str = "rollout"):
+    '''
+    wall_check decides how the wall generator learns whether its level can be passed:
+    "rollout" plays the wall solver stage and rewards its outcome,
+    "prefilter" rewards the BFS check and only plays the wall solver stage on levels that can be passed,
+    "oracle" rewards the BFS check and never plays the wall solver stage.
+    '''
+    if wall_check not in WALL_CHECKS:
+        raise ValueError(f"wall_check must be one of {WALL_CHECKS}, not {wall_check!r}")
+    state, _ = env.reset()
+    wall = generator_episode(env, agent[Stage.WALLS], state, eps)
+
+    state, _ = env.advance()
+    # the BFS only runs when its result is used
+    solvable = None if wall_check == "rollout" else env.solvability()[0]
+    if wall_check == "oracle" or (wall_check == "prefilter" and not solvable):
+        wall_solver = (state, None, 0, state, 0, solvable)
+    else:
+        wall_solver = solver_episode(env, agent[Stage.SOLVER], state, eps)
+    wall_done = wall_solver[5] if wall_check == "rollout" else solvable
+    wall_reward = 100 if wall_done else -100
+    agent[Stage.WALLS].step(wall[0], wall[1], wall_reward, wall[3], True)
+
+    state, _ = env.advance()
+    enemy = generator_episode(env, agent[Stage.ENEMY], state, eps)
+
+    state, _ = env.advance()
+    item = generator_episode(env, agent[Stage.ITEM], state, eps)
+
+    state, _ = env.advance()
+    solver = solver_episode(env, agent[Stage.SOLVER], state, eps, render_first=render)
+
+    reward = 100 if solver[5] else -100
+    agent[Stage.ENEMY].step(enemy[0], enemy[1], reward, enemy[3], True)
+    agent[Stage.ITEM].step(item[0], item[1], reward, item[3], True)
+
+    return wall[4], enemy[4], item[4], solver[4] + wall_solver[4]
 
 
 def pretrain_walls(env: GenEnv, agent: D3QNAgent, eps: float = 1.0):
@@ -0,0 +1,192 @@
+import queue
+import random
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from .agent import D3QNAgent
+from .dqn import DuelingDQN
+from .environment import GenEnv, Stage
+from .instrumentation import Instrumentation
+
+
+class ActorAgent(D3QNAgent):
+    '''
+    Acting-only copy of a D3QNAgent used inside actor processes. It selects actions with its own copy of the
+    q network and records every transition passed to step() instead of learning from it, so it builds none of
+    the learner's state (target network, optimizer, replay buffer).
+    '''
+
+    def __init__(self, state_size=8, action_size=4, hidden_size=64):
+        self.device = torch.device("cpu")
+        self.state_size = state_size
+        self.action_size = action_size
+        self.hidden_size = hidden_size
+        self.q_network = DuelingDQN(state_size, action_size, hidden_size).to(self.device)
+        self.rng = np.random.default_rng(seed=random.getrandbits(32))
+        self.transitions: list[tuple] = []
+
+    def step(self, state, action, reward, next_state, done):
+        self.transitions.append((state, action, reward, next_state, done))
+
+    def flush(self) -> list[tuple]:
+        transitions, self.transitions = self.transitions, []
+        return transitions
+
+
+def _actor(worker_id, play_episode, env_kwargs, agent_sizes, shared, lock, version, eps, stop, results, seed, record,
+           instrument):
+    torch.set_num_threads(1)
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    torch.manual_seed(seed)
+
+    env = GenEnv(**env_kwargs)
+    env.recording = record
+    agent = {stage: ActorAgent(*sizes) for (stage, sizes) in agent_sizes.items()}
+    stats = None
+    if instrument:
+        # the learner times the learning itself, only acting is timed here
+        stats = Instrumentation().instrument(env)
+        for (stage, a) in agent.items():
+            stats.wrap(a, 'act', f'agent.act.{stage.name}')
+    synced = -1
+    while not stop.is_set():
+        if version.value != synced:
+            with lock:
+                synced = version.value
+                for (stage, network) in shared.items():
+                    agent[stage].q_network.load_state_dict(network.state_dict())
+        scores = play_episode(env, agent, eps.value)
+        transitions = {stage: a.flush() for (stage, a) in agent.items()}
+        timings = stats.collect() if stats is not None else None
+        while not stop.is_set():
+            try:
+                results.put((worker_id, synced, transitions, scores, env.trace, timings), timeout=0.1)
+                break
+            except queue.Full:
+                continue
+
+
+class ActorPool:
+    '''
+    Pool of actor processes that play whole episodes with synced copies of the learner's q networks.
+
+    Every worker holds its own GenEnv and runs ``play_episode(env, agent, eps)`` with acting-only agents, then
+    sends the recorded transitions of every stage and the episode scores back to the learner. The learner
+    publishes new weights with sync(), which copies them into networks kept in shared memory; workers pick
+    them up before their next episode.
+
+    Parameters
+    ----------
+    agent: dict[Stage, D3QNAgent]
+        The learner's agents, their q networks are the ones shared with the workers.
+    play_episode: callable
+        Top level function playing one episode, ``play_episode(env, agent, eps) -> scores``.
+    n_workers: int, default=2
+        The number of actor processes.
+    env_kwargs: dict, optional
+        Keyword arguments for the GenEnv of every worker.
+    seed: int, optional
+        Base seed, worker i is seeded with seed + i.
+    record: bool, default=False
+        Record every episode in the workers, the EpisodeTrace of the last one returned by next_episode() is kept
+        in ``trace``.
+    instrument: bool, default=False
+        Time the environment, the game and acting in the workers with network.instrumentation.Instrumentation,
+        the timer totals of every episode are returned by drain().
+    '''
+
+    def __init__(self, agent: dict[Stage, D3QNAgent], play_episode, n_workers=2, env_kwargs=None, seed=None,
+                 record=False, instrument=False):
+        self.n_workers = n_workers
+        self.trace = None
+        self.ctx = mp.get_context("spawn")
+        self.shared: dict[Stage, DuelingDQN] = {}
+        for (stage, a) in agent.items():
+            network = DuelingDQN(a.state_size, a.action_size, a.hidden_size)
+            network.load_state_dict(a.q_network.state_dict())
+            self.shared[stage] = network.share_memory()
+        self.lock = self.ctx.Lock()
+        self.version = self.ctx.Value('l', 0)
+        self.eps = self.ctx.Value('d', 1.0)
+        self.stop = self.ctx.Event()
+        self.results = self.ctx.Queue(maxsize=2 * n_workers)
+        agent_sizes = {stage: (a.state_size, a.action_size, a.hidden_size) for (stage, a) in agent.items()}
+        seed = random.randint(0, 2**31) if seed is None else seed
+        self.workers = [
+            self.ctx.Process(target=_actor,
+                             args=(i, play_episode, env_kwargs or {}, agent_sizes, self.shared, self.lock,
+                                   self.version, self.eps, self.stop, self.results, seed + i, record,
+                                   instrument),
+                             daemon=True)
+            for i in range(n_workers)
+        ]
+
+    def start(self) -> 'ActorPool':
+        for worker in self.workers:
+            worker.start()
+        return self
+
+    def set_eps(self, eps: float):
+        self.eps.value = eps
+
+    def sync(self, agent: dict[Stage, D3QNAgent]):
+        '''
+        Broadcast the learner's current q network weights to the workers.
+        '''
+        with self.lock:
+            for (stage, network) in self.shared.items():
+                network.load_state_dict(agent[stage].q_network.state_dict())
+            self.version.value += 1
+
+    def next_episode(self) -> tuple[dict[Stage, list[tuple]], tuple]:
+        '''
+        Wait for the next finished episode of any worker.
+
+        Returns
+        -------
+        tuple
+            The recorded transitions of every stage and the scores returned by play_episode.
+        '''
+        (_, _, transitions, scores, self.trace, _) = self.results.get()
+        return transitions, scores
+
+    def drain(self) -> list[tuple[dict[Stage, list[tuple]], tuple, object, dict | None]]:
+        '''
+        Wait for the next finished episode, then take every other episode already waiting in the queue.
+
+        Returns
+        -------
+        list of tuple
+            The recorded transitions of every stage, the scores returned by play_episode, the EpisodeTrace (None
+            unless recording) and the worker's timer totals (None unless instrumented, see
+            Instrumentation.collect) of every episode, oldest first.
+        '''
+        episodes = [self.results.get()]
+        while True:
+            try:
+                episodes.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        self.trace = episodes[-1][4]
+        return [(transitions, scores, trace, timings) for (_, _, transitions, scores, trace, timings) in episodes]
+
+    def close(self):
+        self.stop.set()
+        # workers cannot exit while their last episode is still buffered in the queue
+        while any(worker.is_alive() for worker in self.workers):
+            try:
+                self.results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for worker in self.workers:
+            worker.join()
+        self.results.close()
+
+    def __enter__(self) -> 'ActorPool':
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,29 +1,72 @@
+import copy
 import random
 import numpy as np
 import torch
 from .replay_buffer import ReplayBuffer
+from .prioritized_replay_buffer import PrioritizedReplayBuffer
 from .dqn import DuelingDQN
 
 
 class D3QNAgent:
     def __init__(self, state_size=8, action_size=4, hidden_size=64,
-                 learning_rate=1e-3, gamma=0.99, buffer_size=10000, batch_size=64):
+                 learning_rate=1e-3, gamma=0.99, buffer_size=10000, batch_size=64,
+                 prioritized=False, alpha=0.6, beta=0.4, beta_increment=1e-4,
+                 train_every=1, gradient_steps=1, fuse_gradient_steps=False):
 
         self.device = torch.device("cpu")
         self.gamma = gamma
         self.batch_size = batch_size
+        self.state_size = state_size
         self.action_size = action_size
+        self.hidden_size = hidden_size
         self.q_network = DuelingDQN(state_size, action_size, hidden_size).to(self.device)
         self.target_network = DuelingDQN(state_size, action_size, hidden_size).to(self.device)
         self.target_network.load_state_dict(self.q_network.state_dict())
         self.target_network.eval()
         self.optimizer = torch.optim.Adam(self.q_network.parameters(), lr=learning_rate)
-        self.memory = ReplayBuffer(buffer_size)
+        self.rng = np.random.default_rng(seed=random.getrandbits(32))
+        # learn every train_every steps, with gradient_steps minibatches (or one batch that many times larger)
+        self.train_every = train_every
+        self.gradient_steps = gradient_steps
+        self.fuse_gradient_steps = fuse_gradient_steps
+        self.t_step = 0
+        self.prioritized = prioritized
+        if prioritized:
+            self.memory = PrioritizedReplayBuffer(buffer_size, alpha=alpha, beta=beta, beta_increment=beta_increment)
+        else:
+            self.memory = ReplayBuffer(buffer_size)
 
     def step(self, state, action, reward, next_state, done):
         self.memory.push(state, action, reward, next_state, done)
-        if len(self.memory) > self.batch_size:
-            self.update_model()
+        self.t_step += 1
+        if self.t_step % self.train_every == 0:
+            self.learn()
+
+    def extend(self, transitions: list[tuple]):
+        '''
+        Push (state, action, reward, next_state, done) transitions into the replay memory in one go, then learn as
+        many times as step() would have for them, once for every train_every steps passed.
+        '''
+        if not transitions:
+            return
+        self.memory.push_batch(*(np.asarray(field) for field in zip(*transitions)))
+        updates = (self.t_step + len(transitions)) // self.train_every - self.t_step // self.train_every
+        self.t_step += len(transitions)
+        self.learn(updates)
+
+    def learn(self, updates=1):
+        '''
+        Learn ``updates`` times as step() does every train_every steps, with gradient_steps minibatches (or one
+        fused batch). Nothing is learned while the memory holds no more than batch_size experiences.
+        '''
+        if len(self.memory) <= self.batch_size:
+            return
+        for _ in range(updates):
+            if self.fuse_gradient_steps:
+                self.update_model(self.batch_size * self.gradient_steps)
+            else:
+                for _ in range(self.gradient_steps):
+                    self.update_model()
 
     def act(self, state, eps=0.):
         if random.random() > eps:
@@ -37,19 +80,49 @@ class D3QNAgent:
         else:
             return random.choice(np.arange(self.action_size))
 
-    def update_model(self):
+    def act_batch(self, states, eps=0.):
+        '''
+        Epsilon-greedy actions for a batch of states with a single forward pass.
+
+        One uniform number per row decides both whether the row explores (u < eps) and, rescaled by eps, which
+        random action it takes. The network has no train/eval dependent layers, so its mode is left as it is.
+
+        Parameters
+        ----------
+        states: array-like
+            The (N, state_size) states to act on.
+        eps: float, default=0.
+            The probability of taking a random action.
+
+        Returns
+        -------
+        numpy.ndarray
+            The (N,) chosen actions.
+        '''
+        states = torch.as_tensor(np.asarray(states, dtype=np.float32), device=self.device)
+        with torch.no_grad():
+            actions = self.q_network(states).argmax(dim=1).cpu().numpy()
+        if eps > 0.:
+            u = self.rng.random(len(actions))
+            explore = u < eps
+            actions[explore] = (u[explore] / eps * self.action_size).astype(np.int64)
+        return actions
+
+    def update_model(self, batch_size=None):
         '''
         Update the Q-network based on a batch of experiences from the replay memory.
+        The batch has batch_size experiences, self.batch_size when not given.
         '''
         # Sample a batch of experiences from memory
-        states, actions, rewards, next_states, dones = self.memory.sample(self.batch_size)
+        batch = self.memory.sample(self.batch_size if batch_size is None else batch_size)
+        states, actions, rewards, next_states, dones = batch[:5]
 
-        # Convert numpy arrays to PyTorch tensors
-        states = torch.from_numpy(states).float().to(self.device)
-        actions = torch.from_numpy(np.array(actions)).long().to(self.device)
-        rewards = torch.from_numpy(np.array(rewards)).float().to(self.device)
-        next_states = torch.from_numpy(next_states).float().to(self.device)
-        dones = torch.from_numpy(np.array(dones).astype(np.uint8)).float().to(self.device)
+        # Wrap the sampled numpy arrays as PyTorch tensors, they already have the right dtypes
+        states = torch.from_numpy(states).to(self.device)
+        actions = torch.from_numpy(actions).to(self.device)
+        rewards = torch.from_numpy(rewards).to(self.device)
+        next_states = torch.from_numpy(next_states).to(self.device)
+        dones = torch.from_numpy(dones).to(self.device)
 
         # Get Q-values for the actions that were actually taken
         q_values = self.q_network(states).gather(1, actions.unsqueeze(-1)).squeeze(-1)
@@ -64,7 +137,14 @@ class D3QNAgent:
         expected_q_values = rewards + self.gamma * next_q_values * (1 - dones)
 
         # Compute the loss between the current and expected Q values
-        loss = torch.nn.MSELoss()(q_values, expected_q_values)
+        if self.prioritized:
+            # Weight every squared error by its importance-sampling weight and refresh the sampled priorities
+            weights, indices = batch[5:]
+            td_errors = expected_q_values - q_values
+            loss = (torch.from_numpy(weights).to(self.device) * td_errors.pow(2)).mean()
+            self.memory.update_priorities(indices, td_errors.detach().cpu().numpy())
+        else:
+            loss = torch.nn.MSELoss()(q_values, expected_q_values)
 
         # Zero all gradients
         self.optimizer.zero_grad()
@@ -81,6 +161,32 @@ class D3QNAgent:
         '''
         self.target_network.load_state_dict(self.q_network.state_dict())
 
+    def state_dict(self) -> dict:
+        '''
+        Copies of the networks, the optimizer state, the step counter and the RNG state of the agent, and the
+        state of its replay buffer without the experiences (see ReplayBuffer.arrays).
+        '''
+        return {
+            "q_network": {key: value.detach().clone() for (key, value) in self.q_network.state_dict().items()},
+            "target_network": {key: value.detach().clone()
+                               for (key, value) in self.target_network.state_dict().items()},
+            "optimizer": copy.deepcopy(self.optimizer.state_dict()),
+            "t_step": self.t_step,
+            "rng": self.rng.bit_generator.state,
+            "memory": self.memory.state_dict(),
+        }
+
+    def load_state_dict(self, state: dict, arrays: dict[str, np.ndarray]):
+        '''
+        Restore the agent from state_dict() and the experience arrays of its replay buffer.
+        '''
+        self.q_network.load_state_dict(state["q_network"])
+        self.target_network.load_state_dict(state["target_network"])
+        self.optimizer.load_state_dict(state["optimizer"])
+        self.t_step = state["t_step"]
+        self.rng.bit_generator.state = state["rng"]
+        self.memory.load_state_dict(state["memory"], arrays)
+
     def save(self, path):
         torch.save(self.q_network.state_dict(), f'{path}.q')
         torch.save(self.target_network.state_dict(), f'{path}.target')
@@ -0,0 +1,185 @@
+import os
+import random
+import shutil
+import threading
+
+import numpy as np
+import torch
+
+from .agent import D3QNAgent
+from .environment import Stage
+
+LATEST = 'LATEST'
+
+
+def _fsync_dir(path: str):
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_atomic(path: str, write):
+    '''
+    Call ``write(f)`` on a temporary file next to ``path`` and rename it into place once it is on disk.
+    '''
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Checkpointer:
+    '''
+    Saves and restores whole training runs: the networks, optimizers and replay buffers of all agents, the RNG
+    states of the agents, of ``random``, NumPy and torch, and any training state such as epsilon, the episode
+    counter and score windows.
+
+    Every checkpoint is a new directory ``<directory>/<number>`` holding a ``state.pt`` with everything but the
+    experiences, and one raw ``.npy`` array per replay buffer field. The directory is completed under a temporary
+    name and renamed, then the ``LATEST`` file is atomically replaced to point at it, so an interrupted save never
+    damages the checkpoint a run resumes from. Only the newest ``keep`` checkpoints are kept.
+
+    With ``background`` the files are written by a thread: save() only copies the state, which is then written while
+    training goes on. A save waits for the previous one to finish first.
+
+    Parameters
+    ----------
+    directory: str
+        Where checkpoints are kept.
+    keep: int, default=2
+        The number of checkpoints kept.
+    background: bool, default=True
+        Write checkpoints from a background thread.
+    '''
+
+    def __init__(self, directory: str, keep: int = 2, background: bool = True):
+        self.directory = directory
+        self.keep = keep
+        self.background = background
+        self.writer: threading.Thread | None = None
+        self.error: BaseException | None = None
+
+    def save(self, agent: dict[Stage, D3QNAgent], **state):
+        '''
+        Checkpoint the agents and the training state ``state``, which must be picklable.
+        '''
+        self.wait()
+        snapshot = {
+            "agents": {stage.name: a.state_dict() for (stage, a) in agent.items()},
+            "train": state,
+            "random": random.getstate(),
+            "numpy": np.random.get_state(),
+            "torch": torch.get_rng_state(),
+        }
+        arrays = {f'{stage.name}.{name}': np.array(array) for (stage, a) in agent.items()
+                  for (name, array) in a.memory.arrays().items()}
+        if self.background:
+            self.writer = threading.Thread(target=self.__write_guarded, args=(snapshot, arrays))
+            self.writer.start()
+        else:
+            self.__write(snapshot, arrays)
+
+    def wait(self):
+        '''
+        Wait for the checkpoint being written in the background, and raise the error it failed with, if any.
+        '''
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+        if self.error is not None:
+            (error, self.error) = (self.error, None)
+            raise error
+
+    def latest(self) -> str | None:
+        '''
+        The directory of the newest complete checkpoint, None if there is none.
+        '''
+        try:
+            with open(os.path.join(self.directory, LATEST)) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return os.path.join(self.directory, name)
+
+    def load(self, agent: dict[Stage, D3QNAgent], mmap: bool = True) -> dict | None:
+        '''
+        Restore the agents and the global RNG states from the newest checkpoint.
+
+        Parameters
+        ----------
+        agent: dict[Stage, D3QNAgent]
+            The agents to restore, built with the same sizes as the saved ones.
+        mmap: bool, default=True
+            Map the replay buffer arrays copy-on-write instead of reading them, so resuming does not wait for
+            them and they are paged in as they are sampled.
+
+        Returns
+        -------
+        dict or None
+            The training state passed to save(), None when there is no checkpoint to resume from.
+        '''
+        path = self.latest()
+        if path is None:
+            return None
+        snapshot = torch.load(os.path.join(path, 'state.pt'), weights_only=False)
+        for (stage, a) in agent.items():
+            prefix = f'{stage.name}.'
+            arrays = {name[len(prefix):-len('.npy')]: np.load(os.path.join(path, name),
+                                                               mmap_mode='c' if mmap else None)
+                      for name in os.listdir(path) if name.startswith(prefix) and name.endswith('.npy')}
+            a.load_state_dict(snapshot["agents"][stage.name], arrays)
+        random.setstate(snapshot["random"])
+        np.random.set_state(snapshot["numpy"])
+        torch.set_rng_state(snapshot["torch"])
+        return snapshot["train"]
+
+    def q_networks(self) -> dict[str, dict] | None:
+        '''
+        The q network weights of the newest checkpoint by stage name, for agents that only act.
+        '''
+        path = self.latest()
+        if path is None:
+            return None
+        snapshot = torch.load(os.path.join(path, 'state.pt'), weights_only=False)
+        return {stage: state["q_network"] for (stage, state) in snapshot["agents"].items()}
+
+    def close(self):
+        self.wait()
+
+    def __enter__(self) -> 'Checkpointer':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __write_guarded(self, snapshot: dict, arrays: dict[str, np.ndarray]):
+        try:
+            self.__write(snapshot, arrays)
+        except BaseException as e:
+            self.error = e
+
+    def __write(self, snapshot: dict, arrays: dict[str, np.ndarray]):
+        os.makedirs(self.directory, exist_ok=True)
+        numbers = self.__numbers()
+        name = f'{(numbers[-1] + 1 if numbers else 0):06d}'
+        tmp = os.path.join(self.directory, f'{name}.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        _write_atomic(os.path.join(tmp, 'state.pt'), lambda f: torch.save(snapshot, f))
+        for (key, array) in arrays.items():
+            _write_atomic(os.path.join(tmp, f'{key}.npy'), lambda f: np.save(f, array))
+        _fsync_dir(tmp)
+        os.rename(tmp, os.path.join(self.directory, name))
+        _write_atomic(os.path.join(self.directory, LATEST), lambda f: f.write(name.encode()))
+        _fsync_dir(self.directory)
+        for old in numbers[:max(len(numbers) + 1 - self.keep, 0)]:
+            shutil.rmtree(os.path.join(self.directory, f'{old:06d}'), ignore_errors=True)
+
+    def __numbers(self) -> list[int]:
+        return sorted(int(name) for name in os.listdir(self.directory) if name.isdigit())
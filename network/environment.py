@@ -11,6 +11,7 @@ from game.utils import Utils
 from game.level import Level
 from game.position import CartesianPosition as Pos
 import matplotlib.pyplot as plt
+from .episode_trace import EpisodeTrace
 
 
 class Stage(Enum):
@@ -30,8 +31,10 @@ class GenEnv(Env):
                  damage: int = None,
                  safe_zone: int = None):
 
-        self.window = pygame.display.set_mode((Utils.SCREEN_WIDTH, Utils.SCREEN_HEIGHT), pygame.RESIZABLE)
         self.render = False
+        # with recording, every episode is kept as an EpisodeTrace in trace from reset() on
+        self.recording = False
+        self.trace: EpisodeTrace | None = None
         self.clock = None
         self.side: int = min(Utils.SCREEN_WIDTH, Utils.SCREEN_HEIGHT)
         self.center: int = (Utils.SCREEN_WIDTH - self.side) // 2
@@ -42,6 +45,11 @@ class GenEnv(Env):
             Stage.SOLVER: (33, 8),
         }
 
+        # observations are written into one buffer per stage, step() and advance() hand out copies of them
+        self.obs_buffers: dict[Stage, np.ndarray] = {
+            stage: np.zeros(width, dtype=np.float32) for (stage, (width, _)) in self.agent_spaces.items()
+        }
+
         self.SIZE: int = map_size
         self.DENSITY: float = wall_density
         self.DAMAGE: int = damage
@@ -54,27 +62,51 @@ class GenEnv(Env):
         self.current_item = 0
         self.current_safe_zone = 0
 
-        self.game: Game = Game(window=self.window)
+        # the window and sprites are only created once render is switched on
+        self.game: Game = Game(headless=True)
+        self.game.render_delay = 20
         self.stage: Stage = Stage.WALLS
         self.steps: int = 0
         self.agent_location: Pos = Pos(0, 0)
         self.reset()
 
     def reset(self, seed=None, options=None) -> tuple[np.array, dict]:
+        '''
+        Start an episode on a new empty level. ``options`` may fix the level instead of drawing it, with the keys
+        of EpisodeTrace.level: map_size, start, end, density, damage, health, item, safe_zone and ground.
+        '''
         super().reset(seed=random.randint(0, 10000))
-        map_size = random.randint(5, 10) if self.SIZE is None else self.SIZE
-        health = random.randint(2, 10) if self.HEALTH is None else self.HEALTH
-        self.current_density = random.randint(10, 500) / 1000 if self.DENSITY is None else self.DENSITY
-        self.current_damage = random.randint(10, 600) / 1000 * health if self.DAMAGE is None else self.DAMAGE
-        self.current_item = random.randint(1, map_size**2 // 8) if self.ITEM is None else self.ITEM
-        self.current_safe_zone = random.randint(0, map_size // 3) if self.SAFE_ZONE is None else self.SAFE_ZONE
-        self.game = Game(window=self.window)
-        self.game.render_delay = 20
-        self.game.reset(level=Level(map_size=map_size), health=health)
+        options = options or {}
+        map_size = options['map_size'] if 'map_size' in options else (
+            random.randint(5, 10) if self.SIZE is None else self.SIZE)
+        health = options['health'] if 'health' in options else (
+            random.randint(2, 10) if self.HEALTH is None else self.HEALTH)
+        self.current_density = options['density'] if 'density' in options else (
+            random.randint(10, 500) / 1000 if self.DENSITY is None else self.DENSITY)
+        self.current_damage = options['damage'] if 'damage' in options else (
+            random.randint(10, 600) / 1000 * health if self.DAMAGE is None else self.DAMAGE)
+        self.current_item = options['item'] if 'item' in options else (
+            random.randint(1, map_size**2 // 8) if self.ITEM is None else self.ITEM)
+        self.current_safe_zone = options['safe_zone'] if 'safe_zone' in options else (
+            random.randint(0, map_size // 3) if self.SAFE_ZONE is None else self.SAFE_ZONE)
+        if 'start' in options:
+            level = Level(map_size=map_size, entry_point=Pos(*options['start']), exit_point=Pos(*options['end']))
+        else:
+            level = Level(map_size=map_size)
+        if 'ground' in options:
+            level.set_ground(options['ground'])
+        self.game.reset(level=level, health=health)
         self.stage = Stage.WALLS
         self.steps = 0
         self.agent_location: Pos = Pos(0, 0)
-        return np.array(self._get_complete_obs_walls()), {}
+        self.trace = None
+        if self.recording:
+            self.trace = EpisodeTrace({
+                'map_size': map_size, 'start': tuple(level.start_location), 'end': tuple(level.end_location),
+                'density': self.current_density, 'damage': self.current_damage, 'health': health,
+                'item': self.current_item, 'safe_zone': self.current_safe_zone, 'ground': level.get_ground(),
+            })
+        return self._get_complete_obs_walls().copy(), {}
 
     def step(self, action: int) -> tuple[np.array, int, bool, bool, dict]:
         reward = 0
@@ -109,15 +141,15 @@ class GenEnv(Env):
                 stage_done = (self.agent_location == self._l().end_location
                               or self.steps > self._l().map_size ** 2 * 8)
 
-        for event in pygame.event.get():
-            if event.type == pygame.VIDEORESIZE:
-                self.side = min(event.size[0], event.size[1])
-                self.center = (event.size[0] - self.side) // 2
+        if self.trace is not None:
+            self.trace.record(self.stage.value, int(action), reward)
+        if self.game.window is not None:
+            self._poll_events()
         if self.render:
             self.game.render(self.side, self.center)
 
         return (
-            np.array(obs),
+            obs.copy(),
             reward,
             stage_done,
             truncated,
@@ -149,20 +181,25 @@ class GenEnv(Env):
                 self.steps = 0
                 obs = self._get_complete_obs_solver()
 
-        return np.array(obs), {"stage": self.stage}
+        return obs.copy(), {"stage": self.stage}
+
+    def _poll_events(self):
+        for event in pygame.event.get():
+            if event.type == pygame.VIDEORESIZE:
+                self.side = min(event.size[0], event.size[1])
+                self.center = (event.size[0] - self.side) // 2
+
+    def solvability(self) -> tuple[bool, int]:
+        return self._l().solvability()
 
     def _l(self) -> Level:
         return self.game.level
 
     def _get_obs_entry_distance(self) -> list[int]:  # 1
-        start_delta = self._l().start_location - self.agent_location
-        start_distance = abs(start_delta.x) + abs(start_delta.y)
-        return [start_distance]
+        return [int(self._l().start_distance[*self.agent_location])]
 
     def _get_obs_exit_distance(self) -> list[int]:  # 1
-        end_delta = self._l().end_location - self.agent_location
-        end_distance = abs(end_delta.x) + abs(end_delta.y)
-        return [end_distance]
+        return [int(self._l().end_distance[*self.agent_location])]
 
     def _get_obs_exit_direction(self) -> list[int]:  # 2
         diff: Pos = self._l().end_location - self.agent_location
@@ -170,33 +207,21 @@ class GenEnv(Env):
         vertical = diff.y / (abs(diff.y) + .01)
         return [round(horizontal), round(vertical)]
 
-    def _get_obs_closest_delta_to(self, _map: np.ndarray) -> list[int]:  # 2
-        idx = np.argwhere(_map)
-        closest_direction = None
-        for (x, y) in idx:
-            diff = Pos(x=x, y=y) - self.agent_location
-            if closest_direction is None or sum(diff) < sum(closest_direction):
-                closest_direction = diff
-        if closest_direction is None:
+    def _get_obs_closest_delta_to(self, layer: str) -> list[int]:  # 2
+        closest = self._l().get_first_of(layer)
+        if closest is None:
             return [0, 0]
-        return [closest_direction.x, closest_direction.y]
-
-    def _get_obs_near_amount(self, _map: np.ndarray) -> list[int]:  # 1
-        _map = np.pad(_map.astype(int), ((1, 1), (1, 1)), "constant", constant_values=0)
-        pos = self.agent_location + Pos(x=1, y=1)
-        objects = [
-            _map[*pos],
-            _map[*(pos + Pos(x=1, y=0))],
-            _map[*(pos + Pos(x=0, y=1))],
-            _map[*(pos + Pos(x=-1, y=0))],
-            _map[*(pos + Pos(x=0, y=-1))],
-        ]
-        return [sum(objects)]
-
-    def _get_obs_of(self, _map: np.ndarray, r: int = 1) -> np.ndarray:
+        return [closest[0] - self.agent_location.x, closest[1] - self.agent_location.y]
+
+    def _get_obs_near_amount(self) -> list[int]:  # 1
+        view = self._l().padded_enemy_map
+        (x, y) = self.agent_location + Pos(x=Level.VIEW_PAD, y=Level.VIEW_PAD)
+        return [int(view[x, y] + view[x+1, y] + view[x, y+1] + view[x-1, y] + view[x, y-1])]
+
+    def _get_obs_of(self, view: np.ndarray, out: np.ndarray, r: int = 1):
         (x, y) = self.agent_location
-        world = np.pad(_map.astype(int), ((r, r+1), (r, r+1)), "constant", constant_values=0)
-        return world[x:x+2*r+1, y:y+2*r+1]
+        o = Level.VIEW_PAD - r
+        out.reshape(2*r+1, 2*r+1)[:] = view[x+o:x+o+2*r+1, y+o:y+o+2*r+1]
 
     def _get_obs_health(self) -> list:  # 1
         return [self.game.player.get_health()]
@@ -207,49 +232,39 @@ class GenEnv(Env):
     def _get_obs_item_density(self) -> list:  # 1
         return [self.current_item / self._l().map_size**2]
 
-    def _get_complete_obs_walls(self) -> list:  # 26
-        world = self._l().wall_map.astype(int)
-        world[*self._l().get_exit_pos()] = -1
-        world[*self._l().get_exit_pos()] = -1
-        view = self._get_obs_of(world, r=2)  # 25
-        return view.flatten().tolist() + [self.current_density]  # 1
-
-    def _get_complete_obs_enemy(self) -> list:  # 14
-        obs = self._get_obs_of(self._l().wall_map).flatten().tolist()  # 9
-        obs += [sum(self._get_obs_closest_delta_to(self._l().route))]  # 1
-        obs += self._get_obs_entry_distance()  # 1
-        obs += self._get_obs_exit_distance()  # 1
-        obs += self._get_obs_enemy_density()  # 1
-        obs += self._get_obs_health()  # 1
+    def _get_complete_obs_walls(self) -> np.ndarray:  # 26
+        obs = self.obs_buffers[Stage.WALLS]
+        self._get_obs_of(self._l().wall_view, obs[:25], r=2)  # 25
+        obs[25] = self.current_density  # 1
         return obs
 
-    def _get_complete_obs_items(self) -> list[int]:  # 21
-        obs = self._get_obs_of(self._l().wall_map).flatten().tolist()  # 9
-        obs += self._get_obs_of(self._l().enemy_map).flatten().tolist()  # 9
-        obs += [sum(self._get_obs_closest_delta_to(self._l().route))]  # 1
-        obs += self._get_obs_health()  # 1
-        obs += self._get_obs_item_density()  # 1
+    def _get_complete_obs_enemy(self) -> np.ndarray:  # 14
+        obs = self.obs_buffers[Stage.ENEMY]
+        self._get_obs_of(self._l().padded_wall_map, obs[:9])  # 9
+        obs[9] = sum(self._get_obs_closest_delta_to('route'))  # 1
+        obs[10:11] = self._get_obs_entry_distance()  # 1
+        obs[11:12] = self._get_obs_exit_distance()  # 1
+        obs[12:13] = self._get_obs_enemy_density()  # 1
+        obs[13:14] = self._get_obs_health()  # 1
         return obs
 
-    def _get_complete_obs_solver(self) -> list[int]:  # 33
-        world = self._l().wall_map.astype(int)
-        world = -world
-        idx = (np.argwhere(self._l().enemy_map).tolist()
-               + np.argwhere(self._l().heal_map).tolist()
-               + np.argwhere(self._l().power_map).tolist())
-        for (x, y) in idx:
-            if Pos(x, y) not in self._l().get_walls():
-                world[x, y] += 1
-        world[*self._l().end_location] = 3
-        world = np.pad(world, ((2, 3), (2, 3)), "constant", constant_values=-1)
-        (x, y) = self.agent_location
-        view = world[x:x+5, y:y+5]
-        obs = view.flatten().tolist()  # 25
-        obs += self._get_obs_near_amount(self._l().enemy_map)  # 1
-        obs += self._get_obs_closest_delta_to(self._l().heal_map)  # 2
-        obs += self._get_obs_closest_delta_to(self._l().power_map)  # 2
-        obs += self._get_obs_exit_direction()  # 2
-        obs += self._get_obs_health()  # 1
+    def _get_complete_obs_items(self) -> np.ndarray:  # 21
+        obs = self.obs_buffers[Stage.ITEM]
+        self._get_obs_of(self._l().padded_wall_map, obs[:9])  # 9
+        self._get_obs_of(self._l().padded_enemy_map, obs[9:18])  # 9
+        obs[18] = sum(self._get_obs_closest_delta_to('route'))  # 1
+        obs[19:20] = self._get_obs_health()  # 1
+        obs[20:21] = self._get_obs_item_density()  # 1
+        return obs
+
+    def _get_complete_obs_solver(self) -> np.ndarray:  # 33
+        obs = self.obs_buffers[Stage.SOLVER]
+        self._get_obs_of(self._l().solver_view, obs[:25], r=2)  # 25
+        obs[25:26] = self._get_obs_near_amount()  # 1
+        obs[26:28] = self._get_obs_closest_delta_to('heal')  # 2
+        obs[28:30] = self._get_obs_closest_delta_to('power')  # 2
+        obs[30:32] = self._get_obs_exit_direction()  # 2
+        obs[32:33] = self._get_obs_health()  # 1
         return obs
 
     def _apply_action_walls(self, action) -> int:
@@ -273,7 +288,7 @@ class GenEnv(Env):
             end_distance = self._get_obs_exit_distance()[0]
             if start_distance < self.current_safe_zone or end_distance < self.current_safe_zone:
                 reward -= 10
-            if self.agent_location in self._l().get_walls():
+            if self._l().wall_map[*self.agent_location]:
                 reward -= 5
             if self._l().enemy_map.sum() > left:
                 reward -= 1
@@ -295,20 +310,20 @@ class GenEnv(Env):
                 if self.game.player.get_health() - self.current_damage * enemies >= self.current_damage:
                     reward += 1
             if (self.agent_location in (self._l().start_location, self._l().end_location)
-                    or self.agent_location in self._l().get_walls()
+                    or self._l().wall_map[*self.agent_location]
                     or self.agent_location in self._l().get_enemies()):
                 reward -= 10
         return reward
 
     def _apply_action_solver(self, action):
-        self._l().route[*self.game.player.get_pos()] = True
+        self._l().add_route_at(self.game.player.get_pos())
         reward = self.game.tick(action)
         self.agent_location = self.game.player.get_pos()
         return reward
 
     def _move_agent_sweep(self) -> bool:
-        if self.agent_location.x == self._l().map_size - 1:
-            self.agent_location.y += 1
-        self.agent_location.x += 1
-        self.agent_location.x %= self._l().map_size
+        (x, y) = self.agent_location
+        if x == self._l().map_size - 1:
+            y += 1
+        self.agent_location = Pos(x=(x + 1) % self._l().map_size, y=y)
         return self.agent_location.y >= self._l().map_size
@@ -0,0 +1,175 @@
+import os
+
+import numpy as np
+
+MAGIC = b'TRCS'
+VERSION = 1
+EXTENSION = '.trc'
+
+# file header, followed by episode records
+HEADER = np.dtype([('magic', 'S4'), ('version', '<u2')])
+# episode record, followed by the (map_size, map_size) ground tiles and `segments` stage segments
+EPISODE = np.dtype([('episode', '<u8'), ('map_size', 'u1'), ('start', 'u1', (2,)), ('end', 'u1', (2,)),
+                    ('density', '<f8'), ('damage', '<f8'), ('health', '<u2'), ('item', '<u2'), ('safe_zone', 'u1'),
+                    ('segments', 'u1')])
+# stage segment, followed by `steps` actions as u1 and `steps` rewards as <i2
+SEGMENT = np.dtype([('stage', 'u1'), ('steps', '<u4')])
+
+
+class EpisodeTrace:
+    '''
+    Everything needed to replay an episode of GenEnv: the level it was reset to, as the ``options`` of
+    GenEnv.reset, and the actions taken and rewards received, in segments of consecutive steps of one stage.
+
+    Parameters
+    ----------
+    level: dict
+        map_size, start, end, density, damage, health, item, safe_zone and the (map_size, map_size) ground tiles.
+    '''
+
+    def __init__(self, level: dict):
+        self.level = level
+        self.stages: list[int] = []
+        self.actions: list[list[int]] = []
+        self.rewards: list[list[int]] = []
+
+    def record(self, stage: int, action: int, reward: int):
+        if not self.stages or self.stages[-1] != stage:
+            self.stages.append(stage)
+            self.actions.append([])
+            self.rewards.append([])
+        self.actions[-1].append(action)
+        self.rewards[-1].append(reward)
+
+    def segments(self):
+        '''
+        (stage, actions, rewards) of every segment, the stage as a Stage value.
+        '''
+        return zip(self.stages, self.actions, self.rewards)
+
+    def to_bytes(self, episode: int) -> bytes:
+        level = self.level
+        header = np.zeros(1, dtype=EPISODE)
+        header['episode'] = episode
+        header['segments'] = len(self.stages)
+        for key in ('map_size', 'start', 'end', 'density', 'damage', 'health', 'item', 'safe_zone'):
+            header[key] = level[key]
+        parts = [header.tobytes(), np.asarray(level['ground'], dtype=np.uint8).tobytes()]
+        for (stage, actions, rewards) in self.segments():
+            segment = np.array([(stage, len(actions))], dtype=SEGMENT)
+            parts += [segment.tobytes(), np.array(actions, dtype=np.uint8).tobytes(),
+                      np.array(rewards, dtype='<i2').tobytes()]
+        return b''.join(parts)
+
+    @classmethod
+    def from_buffer(cls, buffer, offset: int = 0) -> tuple[int, 'EpisodeTrace', int]:
+        '''
+        Parse the episode record at ``offset`` of ``buffer``.
+
+        Returns
+        -------
+        tuple
+            The episode number, its trace and the offset after the record. Raises ValueError when the record is
+            cut short, as the last one of a log whose writer was killed can be.
+        '''
+        def take(dtype, count):
+            nonlocal offset
+            end = offset + np.dtype(dtype).itemsize * count
+            if end > len(buffer):
+                raise ValueError('truncated episode record')
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            offset = end
+            return array
+
+        header = take(EPISODE, 1)[0]
+        size = int(header['map_size'])
+        level = {key: header[key].item() for key in ('map_size', 'density', 'damage', 'health', 'item', 'safe_zone')}
+        level['start'] = tuple(header['start'].tolist())
+        level['end'] = tuple(header['end'].tolist())
+        level['ground'] = take(np.uint8, size * size).reshape(size, size)
+        trace = cls(level)
+        for _ in range(int(header['segments'])):
+            segment = take(SEGMENT, 1)[0]
+            steps = int(segment['steps'])
+            trace.stages.append(int(segment['stage']))
+            trace.actions.append(take(np.uint8, steps).tolist())
+            trace.rewards.append(take('<i2', steps).tolist())
+        return int(header['episode']), trace, offset
+
+
+class TraceLog:
+    '''
+    Rotating on-disk log of episode traces.
+
+    Traces are appended to ``<directory>/<number>.trc``. Once that file holds ``max_bytes`` a new one is started,
+    and only the newest ``max_files`` files are kept. A log reopened on the same directory starts a new file.
+    Read it back with read_traces.
+
+    Parameters
+    ----------
+    directory: str
+        Where the trace files are kept.
+    max_bytes: int, default=16 MiB
+        The size after which a new file is started.
+    max_files: int, default=8
+        The number of files kept.
+    '''
+
+    def __init__(self, directory: str, max_bytes: int = 16 * 2**20, max_files: int = 8):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, episode: int, trace: EpisodeTrace):
+        if self.file is None or self.file.tell() >= self.max_bytes:
+            self.__rotate()
+        self.file.write(trace.to_bytes(episode))
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self) -> 'TraceLog':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __rotate(self):
+        self.close()
+        numbers = _numbers(self.directory)
+        number = numbers[-1] + 1 if numbers else 0
+        self.file = open(os.path.join(self.directory, f'{number:06d}{EXTENSION}'), 'wb')
+        self.file.write(np.array([(MAGIC, VERSION)], dtype=HEADER).tobytes())
+        for old in numbers[:max(len(numbers) + 1 - self.max_files, 0)]:
+            os.remove(os.path.join(self.directory, f'{old:06d}{EXTENSION}'))
+
+
+def read_traces(directory: str):
+    '''
+    Iterate over the (episode, EpisodeTrace) of a TraceLog, oldest first.
+    '''
+    for number in _numbers(directory):
+        with open(os.path.join(directory, f'{number:06d}{EXTENSION}'), 'rb') as f:
+            buffer = f.read()
+        if len(buffer) < HEADER.itemsize:
+            continue
+        header = np.frombuffer(buffer, dtype=HEADER, count=1)[0]
+        if header['magic'] != MAGIC or header['version'] != VERSION:
+            raise ValueError(f'{f.name} is not a version {VERSION} trace file')
+        offset = HEADER.itemsize
+        while offset < len(buffer):
+            try:
+                (episode, trace, offset) = EpisodeTrace.from_buffer(buffer, offset)
+            except ValueError:
+                break
+            yield episode, trace
+
+
+def _numbers(directory: str) -> list[int]:
+    names = (name[:-len(EXTENSION)] for name in os.listdir(directory) if name.endswith(EXTENSION))
+    return sorted(int(name) for name in names if name.isdigit())
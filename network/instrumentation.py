@@ -0,0 +1,235 @@
+import cProfile
+import csv
+import json
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from .agent import D3QNAgent
+from .environment import GenEnv, Stage
+
+
+class Instrumentation:
+    '''
+    Timers and counters around the environment, the game and the agents of a training run, logged every
+    ``log_every`` episodes.
+
+    instrument() replaces methods of the given objects by timed wrappers, as instance attributes, so objects that
+    are not instrumented pay nothing and remove() restores them. Every timer keeps the seconds spent in it and its
+    number of calls:
+
+        env.step.<STAGE>, env.reset, env.advance      the environment, env.step by the stage it stepped
+        env.obs.<stage>, env.action.<stage>           observation building and action application inside env.step
+        env.events, game.tick, game.render            pygame event polling, the game tick of the solvers, rendering
+        agent.act.<STAGE>, agent.step.<STAGE>         the agents, agent.step includes agent.update_model
+        agent.extend.<STAGE>, agent.update_model.<STAGE>
+                                                      agent.extend counts the transitions it pushed as its calls, and
+                                                      includes the agent.update_model calls it made
+
+    Timers nest, so the time of env.step.<STAGE> includes the env.obs, env.action and game timers it called.
+    With an ActorPool the env, game and agent.act timers run in the worker processes and are merged into the
+    learner's (see ActorPool and merge()); their seconds are summed over the workers, so together they can exceed
+    the elapsed time of a row.
+
+    Every logged row covers the episodes since the previous one: the steps, transitions, updates and episodes per
+    second, the p50/p90/p99 episode latency in milliseconds, and ``time/<timer>`` seconds and ``calls/<timer>``
+    calls of every timer. Rows are appended to ``log_path`` as JSON lines, or as CSV when it ends with ``.csv``.
+
+    Parameters
+    ----------
+    log_path: str, optional
+        The file rows are appended to, they are only kept in ``rows`` when not given.
+    log_every: int, default=10
+        The number of episodes a row covers.
+    profile: tuple[int, int], optional
+        The first and the last episode to run cProfile over, the statistics are dumped to ``profile_path``.
+    profile_path: str, default='train.prof'
+        Where the cProfile statistics are dumped, read them with ``python -m pstats train.prof``.
+    '''
+
+    def __init__(self, log_path: str = None, log_every: int = 10, profile: tuple[int, int] = None,
+                 profile_path: str = 'train.prof'):
+        self.log_path = log_path
+        self.log_every = log_every
+        self.profile = profile
+        self.profile_path = profile_path
+        self.profiler: cProfile.Profile | None = None
+        self.totals: dict[str, list] = {}
+        self.wrapped: list[tuple[object, str]] = []
+        self.latencies: list[float] = []
+        self.rows: list[dict] = []
+        self.file = None
+        self.writer = None
+        self.interval_start = time.perf_counter()
+        self.episode_start = self.interval_start
+        self.episode = 0
+
+    def instrument(self, env: GenEnv = None, agent: dict[Stage, D3QNAgent] = None) -> 'Instrumentation':
+        if env is not None:
+            self.wrap(env, 'step', 'env.step', key=lambda: env.stage.name, keys=[stage.name for stage in Stage])
+            self.wrap(env, 'reset', 'env.reset')
+            self.wrap(env, 'advance', 'env.advance')
+            self.wrap(env, '_poll_events', 'env.events')
+            for name in ('walls', 'enemy', 'items', 'solver'):
+                self.wrap(env, f'_get_complete_obs_{name}', f'env.obs.{name}')
+            for name in ('walls', 'enemy', 'item', 'solver'):
+                self.wrap(env, f'_apply_action_{name}', f'env.action.{name}')
+            self.wrap(env.game, 'tick', 'game.tick')
+            self.wrap(env.game, 'render', 'game.render')
+        for (stage, a) in (agent or {}).items():
+            for method in ('act', 'step', 'update_model'):
+                self.wrap(a, method, f'agent.{method}.{stage.name}')
+            self.wrap(a, 'extend', f'agent.extend.{stage.name}', count=len)
+        return self
+
+    def wrap(self, obj, attr: str, name: str, key=None, keys=(), count=None):
+        '''
+        Time the method ``attr`` of ``obj`` as ``name``, or as ``name.<key()>`` with ``key`` evaluated before
+        every call. ``keys`` registers the timers of the expected keys up front, so every row has their columns.
+        With ``count``, every call adds ``count(*args, **kwargs)`` to the calls instead of 1.
+        '''
+        method = getattr(obj, attr)
+        totals = self.totals
+        perf_counter = time.perf_counter
+        for k in keys if key is not None else [None]:
+            totals.setdefault(name if k is None else f'{name}.{k}', [0., 0])
+
+        def timed(*args, **kwargs):
+            entry = totals.setdefault(name if key is None else f'{name}.{key()}', [0., 0])
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                entry[0] += perf_counter() - start
+                entry[1] += 1 if count is None else count(*args, **kwargs)
+
+        setattr(obj, attr, timed)
+        self.wrapped.append((obj, attr))
+
+    def collect(self) -> dict[str, list]:
+        '''
+        The seconds and calls of every timer since the previous call, which resets them. Used to send the timers
+        of another process to the learner's instrumentation, see merge().
+        '''
+        totals = {name: list(entry) for (name, entry) in self.totals.items() if entry[1]}
+        for entry in self.totals.values():
+            entry[0], entry[1] = 0., 0
+        return totals
+
+    def merge(self, totals: dict[str, list]):
+        '''
+        Add the timers collected by the instrumentation of another process.
+        '''
+        for (name, (seconds, n)) in totals.items():
+            entry = self.totals.setdefault(name, [0., 0])
+            entry[0] += seconds
+            entry[1] += n
+
+    @contextmanager
+    def timer(self, name: str):
+        '''
+        Time the body of a with statement as ``name``.
+        '''
+        entry = self.totals.setdefault(name, [0., 0])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry[0] += time.perf_counter() - start
+            entry[1] += 1
+
+    def remove(self):
+        '''
+        Restore the methods replaced by instrument() and wrap().
+        '''
+        for (obj, attr) in reversed(self.wrapped):
+            delattr(obj, attr)
+        self.wrapped = []
+
+    def begin_episode(self, i_episode: int):
+        self.episode = i_episode
+        if self.profile is not None and self.profiler is None and self.profile[0] <= i_episode <= self.profile[1]:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.episode_start = time.perf_counter()
+
+    def end_episode(self, i_episode: int):
+        self.latencies.append(time.perf_counter() - self.episode_start)
+        if self.profiler is not None and i_episode >= self.profile[1]:
+            self.__dump_profile()
+        if len(self.latencies) >= self.log_every:
+            self.log()
+
+    def log(self) -> dict | None:
+        '''
+        Log a row over the episodes since the previous one and reset the timers, see the class description.
+        '''
+        if not self.latencies:
+            return None
+        now = time.perf_counter()
+        elapsed = now - self.interval_start
+
+        def calls(prefix: str) -> int:
+            return sum(n for (name, (_, n)) in self.totals.items() if name.startswith(prefix))
+
+        latencies = np.array(self.latencies) * 1000
+        row = {
+            "episode": self.episode,
+            "elapsed_s": elapsed,
+            "episodes_per_s": len(latencies) / elapsed,
+            "steps_per_s": calls('env.step.') / elapsed,
+            "transitions_per_s": (calls('agent.step.') + calls('agent.extend.')) / elapsed,
+            "updates_per_s": calls('agent.update_model.') / elapsed,
+            "episode_ms_p50": float(np.percentile(latencies, 50)),
+            "episode_ms_p90": float(np.percentile(latencies, 90)),
+            "episode_ms_p99": float(np.percentile(latencies, 99)),
+        }
+        for (name, (seconds, n)) in self.totals.items():
+            row[f'time/{name}'] = seconds
+            row[f'calls/{name}'] = n
+        self.__write(row)
+        self.rows.append(row)
+
+        for entry in self.totals.values():
+            entry[0], entry[1] = 0., 0
+        self.latencies = []
+        self.interval_start = now
+        return row
+
+    def close(self):
+        self.log()
+        if self.profiler is not None:
+            self.__dump_profile()
+        self.remove()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self) -> 'Instrumentation':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __write(self, row: dict):
+        if self.log_path is None:
+            return
+        if self.file is None:
+            self.file = open(self.log_path, 'a', newline='')
+        if self.log_path.endswith('.csv'):
+            if self.writer is None:
+                # the columns are those of the first row, timers started later are left out
+                self.writer = csv.DictWriter(self.file, fieldnames=list(row), extrasaction='ignore', restval=0)
+                if self.file.tell() == 0:
+                    self.writer.writeheader()
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + '\n')
+        self.file.flush()
+
+    def __dump_profile(self):
+        self.profiler.disable()
+        self.profiler.dump_stats(self.profile_path)
+        self.profiler = None
+        self.profile = None
@@ -0,0 +1,162 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from game.solvability import shortest_path
+from .agent import D3QNAgent
+from .environment import Stage
+from .vec_environment import VecGenEnv
+
+# level parameters a request may set, as taken by GenEnv.__init__
+PARAMS = ('map_size', 'wall_density', 'item', 'health', 'damage', 'safe_zone')
+
+
+class LevelService:
+    '''
+    Generates levels on request with the WALLS, ENEMY and ITEM generators, micro-batching concurrent requests.
+
+    Requests are queued by submit() and picked up by a single worker thread. It waits at most ``max_wait`` seconds
+    after the first queued request for more to arrive, then generates up to ``max_batch`` levels together with
+    VecGenEnv.generate, so each policy call of a batch is one forward pass over the cells of all its levels. The
+    latency of every request, from submit() until its level is ready, is kept for metrics().
+
+    Parameters
+    ----------
+    agent: dict[Stage, D3QNAgent]
+        The generator agents, they act greedily.
+    max_batch: int, default=64
+        The most requests generated together.
+    max_wait: float, default=0.001
+        Seconds to wait for more requests before generating a batch.
+    window: int, default=10000
+        The number of latest requests and batches the metrics are computed over.
+    seed: int, optional
+        Seed of the random level parameters and entry/exit points.
+    '''
+
+    def __init__(self, agent: dict[Stage, D3QNAgent], max_batch=64, max_wait=0.001, window=10000, seed=None):
+        self.agent = agent
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.env = VecGenEnv(max_batch, seed=seed, solve=False)
+        self.requests = queue.Queue()
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.served = 0
+        self.stop = threading.Event()
+        self.worker = threading.Thread(target=self.__serve, daemon=True)
+
+    def start(self) -> 'LevelService':
+        self.worker.start()
+        return self
+
+    def submit(self, **params) -> Future:
+        '''
+        Queue the generation of one level, ``params`` take the names of PARAMS and default to random values.
+        Raises ValueError when a parameter is out of range: map_size must fit the service's maps, wall_density
+        lie in [0, 1], item and health be at least 1, damage be positive and safe_zone lie between 0 and half the
+        map_size (of the smallest random size when map_size is not given).
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to a dict of the level: its (S, S) maps under the names of game.level_dataset.LAYERS, and
+            map_size, start, end, its parameters, solvable and path_length.
+        '''
+        for name in params:
+            if name not in PARAMS:
+                raise TypeError(f'unknown level parameter {name!r}')
+        # written so that NaN fails every check
+        if not 1 <= params.get('map_size', 1) <= self.env.S:
+            raise ValueError(f'map_size must be between 1 and {self.env.S}')
+        if not 0 <= params.get('wall_density', 0) <= 1:
+            raise ValueError('wall_density must be between 0 and 1')
+        for name in ('item', 'health'):
+            if not params.get(name, 1) >= 1:
+                raise ValueError(f'{name} must be at least 1')
+        if not params.get('damage', 1) > 0:
+            raise ValueError('damage must be positive')
+        half = params.get('map_size', VecGenEnv.RANDOM_SIZES[0]) / 2
+        if not 0 <= params.get('safe_zone', 0) <= half:
+            raise ValueError(f'safe_zone must be between 0 and {half:g}')
+        future = Future()
+        self.requests.put((time.perf_counter(), params, future))
+        return future
+
+    def generate(self, **params) -> dict:
+        return self.submit(**params).result()
+
+    def metrics(self) -> dict:
+        '''
+        Request count, p50/p99/max latency in milliseconds over the latest requests, and the mean batch size.
+        '''
+        latencies = np.array(self.latencies) * 1000
+        if not latencies.size:
+            return {"served": self.served}
+        return {
+            "served": self.served,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "max_ms": float(latencies.max()),
+            "mean_batch": float(np.mean(self.batch_sizes)),
+        }
+
+    def close(self):
+        self.stop.set()
+        self.worker.join()
+
+    def __enter__(self) -> 'LevelService':
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __serve(self):
+        act = {stage: self.agent[stage].act_batch for stage in (Stage.WALLS, Stage.ENEMY, Stage.ITEM)}
+        while not self.stop.is_set():
+            batch = self.__take()
+            if not batch:
+                continue
+            idx = np.arange(len(batch))
+            options = {name: np.array([params.get(name, np.nan) for (_, params, _) in batch]) for name in PARAMS}
+            try:
+                self.env.reset_levels(idx, options)
+                levels = self.env.generate(act, idx)
+            except Exception as e:
+                for (_, _, future) in batch:
+                    future.set_exception(e)
+                continue
+            self.__resolve(levels, batch)
+
+    def __take(self) -> list:
+        '''
+        Wait for a queued request, then up to ``max_wait`` for more, and return at most ``max_batch`` of them.
+        '''
+        try:
+            batch = [self.requests.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.requests.get(timeout=max(deadline - time.perf_counter(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def __resolve(self, levels: dict[str, np.ndarray], batch: list):
+        cells = np.arange(self.env.S)
+        size = levels["map_size"][:, None, None]
+        inside = (cells[None, :, None] < size) & (cells[None, None, :] < size)
+        levels["solvable"], levels["path_length"] = shortest_path(levels["wall_map"], levels["start"],
+                                                                  levels["end"], inside)
+        done = time.perf_counter()
+        for (i, (submitted, _, future)) in enumerate(batch):
+            future.set_result({key: value[i] for (key, value) in levels.items()})
+            self.latencies.append(done - submitted)
+        self.batch_sizes.append(len(batch))
+        self.served += len(batch)
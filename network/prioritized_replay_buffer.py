@@ -0,0 +1,170 @@
+import numpy as np
+
+from .replay_buffer import ReplayBuffer
+
+
+class SumTree:
+    '''
+    Binary tree over a fixed number of leaves where every inner node holds the sum of its children, stored in a flat
+    array (root at 1, leaf i at capacity + i). Updating a leaf and finding the leaf of a prefix sum are O(log n),
+    and both work on whole index vectors at once.
+
+    Parameters
+    ----------
+    capacity: int
+        The number of leaves, rounded up to a power of two internally.
+    '''
+
+    def __init__(self, capacity):
+        self.capacity = 1 << max(0, int(capacity - 1).bit_length())
+        self.depth = self.capacity.bit_length() - 1
+        self.tree = np.zeros(2 * self.capacity, dtype=np.float64)
+
+    def total(self) -> float:
+        return self.tree[1]
+
+    def get(self, indices: np.ndarray) -> np.ndarray:
+        return self.tree[self.capacity + indices]
+
+    def set(self, index: int, value: float):
+        node = self.capacity + index
+        self.tree[node] = value
+        tree = self.tree
+        while node > 1:
+            node //= 2
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+
+    def update(self, indices: np.ndarray, values: np.ndarray):
+        '''
+        Set the leaves at ``indices`` to ``values`` and recompute the sums above them, one tree level at a time.
+        '''
+        tree = self.tree
+        nodes = self.capacity + np.asarray(indices, dtype=np.int64)
+        tree[nodes] = values
+        # repeated parents are all assigned the same sum, so they need no deduplication
+        for _ in range(self.depth):
+            nodes >>= 1
+            left = nodes << 1
+            tree[nodes] = tree.take(left) + tree.take(left + 1)
+
+    def find(self, prefix: np.ndarray) -> np.ndarray:
+        '''
+        Indices of the leaves where the running sum of the leaves first exceeds each value of ``prefix``.
+        '''
+        tree = self.tree
+        nodes = np.ones(len(prefix), dtype=np.int64)
+        prefix = np.array(prefix, dtype=np.float64)
+        for _ in range(self.depth):
+            nodes <<= 1
+            left = tree.take(nodes)
+            right = prefix >= left
+            prefix -= left * right
+            nodes += right
+        return nodes - self.capacity
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    '''
+    Replay buffer that samples experiences proportionally to their priority (Schaul et al., 2016).
+
+    Priorities are kept in a SumTree, so pushing, sampling and updating priorities are O(log n). New experiences get
+    the highest priority seen so far, so each is replayed at least once soon after it was pushed. The sampling bias is
+    corrected with importance-sampling weights whose exponent beta is annealed towards 1.
+
+    Parameters
+    ----------
+    buffer_size: int, default=10000
+        The maximum number of experiences that can be stored in the buffer.
+    alpha: float, default=0.6
+        How strongly priorities shape the sampling distribution, 0 is uniform sampling.
+    beta: float, default=0.4
+        Initial importance-sampling exponent.
+    beta_increment: float, default=1e-4
+        Amount added to beta after every sampled batch, up to 1.
+    priority_eps: float, default=1e-3
+        Added to every TD error so that no experience gets a zero priority.
+    '''
+
+    def __init__(self, buffer_size=10000, alpha=0.6, beta=0.4, beta_increment=1e-4, priority_eps=1e-3):
+        super().__init__(buffer_size)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.priority_eps = priority_eps
+        self.max_priority = 1.0
+        self.tree = SumTree(buffer_size)
+
+    def push(self, state, action, reward, next_state, done):
+        i = self.position
+        super().push(state, action, reward, next_state, done)
+        self.tree.set(i, self.max_priority ** self.alpha)
+
+    def push_batch(self, states, actions, rewards, next_states, dones) -> np.ndarray:
+        idx = super().push_batch(states, actions, rewards, next_states, dones)
+        self.tree.update(idx, np.full(len(idx), self.max_priority ** self.alpha))
+        return idx
+
+    def sample_indices(self, batch_size):
+        '''
+        Draw one position from each of ``batch_size`` equal slices of the total priority.
+        '''
+        segment = self.tree.total() / batch_size
+        prefix = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+        return np.minimum(self.tree.find(prefix), self.size - 1)
+
+    def sample(self, batch_size):
+        '''
+        Sample a batch of experiences proportionally to their priorities.
+
+        Parameters
+        ----------
+        batch_size: int
+            The number of experiences to sample from the buffer.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            States, actions, rewards, next states and done flags like ReplayBuffer.sample, followed by the
+            importance-sampling weight of every experience (normalised so the largest is 1) and the positions to
+            pass back to update_priorities.
+        '''
+        idx = self.sample_indices(batch_size)
+        probabilities = self.tree.get(idx) / self.tree.total()
+        weights = (self.size * probabilities) ** -self.beta
+        weights = (weights / weights.max()).astype(np.float32)
+        self.beta = min(1.0, self.beta + self.beta_increment)
+        states, actions, rewards, next_states, dones = self._gather(idx)
+        return states, actions, rewards, next_states, dones, weights, idx
+
+    def update_priorities(self, indices, td_errors):
+        '''
+        Set the priorities of sampled experiences from their new absolute TD errors.
+        '''
+        priorities = np.abs(td_errors) + self.priority_eps
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.tree.update(indices, priorities ** self.alpha)
+
+    def load(self, path):
+        super().load(path)
+        self.max_priority = 1.0
+        self.tree = SumTree(self.buffer_size)
+        if self.size:
+            self.tree.update(np.arange(self.size), np.ones(self.size))
+
+    def state_dict(self) -> dict:
+        return {**super().state_dict(), "beta": self.beta, "max_priority": self.max_priority}
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {**super().arrays(), "priorities": self.tree.tree}
+
+    def load_state_dict(self, state: dict, arrays: dict[str, np.ndarray]):
+        arrays = dict(arrays)
+        priorities = arrays.pop("priorities", None)
+        super().load_state_dict(state, arrays)
+        self.beta = state["beta"]
+        self.max_priority = state["max_priority"]
+        self.tree = SumTree(self.buffer_size)
+        if priorities is not None and len(priorities) == len(self.tree.tree):
+            self.tree.tree = priorities
+        elif self.size:
+            self.tree.update(np.arange(self.size), np.ones(self.size))
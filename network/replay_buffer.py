@@ -1,8 +1,8 @@
 import pickle
+import random
+import zipfile
 
 import numpy as np
-import random
-from collections import deque
 
 
 class ReplayBuffer:
@@ -11,6 +11,9 @@ class ReplayBuffer:
     The buffer stores past experiences in the environment, allowing the agent to sample and learn from them at later times.
     This helps to break the correlation of sequential observations and stabilize the learning process.
 
+    Experiences are kept in preallocated NumPy arrays used as a ring buffer, so pushing is O(1) and a batch is gathered
+    with a single fancy index per field. The arrays are allocated on the first push, once the state shape is known.
+
     Parameters
     ----------
     buffer_size: int, default=10000
@@ -18,12 +21,28 @@ class ReplayBuffer:
     '''
 
     def __init__(self, buffer_size=10000):
-        self.buffer = deque(maxlen=buffer_size)
+        self.buffer_size = buffer_size
+        self.position = 0
+        self.size = 0
+        self.states: np.ndarray | None = None
+        self.actions: np.ndarray | None = None
+        self.rewards: np.ndarray | None = None
+        self.next_states: np.ndarray | None = None
+        self.dones: np.ndarray | None = None
+        self.rng = np.random.default_rng(seed=random.getrandbits(32))
+
+    def _allocate(self, state_shape):
+        self.states = np.zeros((self.buffer_size, *state_shape), dtype=np.float32)
+        self.actions = np.zeros(self.buffer_size, dtype=np.int64)
+        self.rewards = np.zeros(self.buffer_size, dtype=np.float32)
+        self.next_states = np.zeros((self.buffer_size, *state_shape), dtype=np.float32)
+        self.dones = np.zeros(self.buffer_size, dtype=np.float32)
 
     def push(self, state, action, reward, next_state, done):
         '''
         Add a new experience to the buffer. Each experience is a tuple containing a state, action, reward,
         the resulting next state, and a done flag indicating whether the episode has ended.
+        Once the buffer is full, the oldest experience is overwritten.
 
         Parameters
         ----------
@@ -38,7 +57,47 @@ class ReplayBuffer:
         done: bool
             A flag indicating whether the episode has ended after taking the action.
         '''
-        self.buffer.append((state, action, reward, next_state, done))
+        if self.states is None:
+            self._allocate(np.shape(state))
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.position = (i + 1) % self.buffer_size
+        self.size = min(self.size + 1, self.buffer_size)
+
+    def push_batch(self, states, actions, rewards, next_states, dones) -> np.ndarray:
+        '''
+        Add many experiences at once, in order, with one fancy index per field. Only the last buffer_size of them
+        are kept when there are more.
+
+        Returns
+        -------
+        numpy.ndarray
+            The positions the experiences were written to.
+        '''
+        states = np.asarray(states, dtype=np.float32)
+        n = len(states)
+        if self.states is None:
+            self._allocate(states.shape[1:])
+        keep = slice(max(0, n - self.buffer_size), n)
+        idx = (self.position + np.arange(n)[keep]) % self.buffer_size
+        self.states[idx] = states[keep]
+        self.actions[idx] = np.asarray(actions)[keep]
+        self.rewards[idx] = np.asarray(rewards)[keep]
+        self.next_states[idx] = np.asarray(next_states, dtype=np.float32)[keep]
+        self.dones[idx] = np.asarray(dones)[keep]
+        self.position = (self.position + n) % self.buffer_size
+        self.size = min(self.size + n, self.buffer_size)
+        return idx
+
+    def sample_indices(self, batch_size):
+        '''
+        Draw uniformly random positions of stored experiences, with replacement.
+        '''
+        return self.rng.integers(0, self.size, size=batch_size)
 
     def sample(self, batch_size):
         '''
@@ -53,9 +112,12 @@ class ReplayBuffer:
         -------
         tuple of numpy.ndarray
             A tuple containing arrays of states, actions, rewards, next states, and done flags.
+            The arrays are contiguous float32/int64 copies that torch.from_numpy can wrap without copying.
         '''
-        states, actions, rewards, next_states, dones = zip(*random.sample(self.buffer, batch_size))
-        return np.stack(states), actions, rewards, np.stack(next_states), dones
+        return self._gather(self.sample_indices(batch_size))
+
+    def _gather(self, idx):
+        return self.states[idx], self.actions[idx], self.rewards[idx], self.next_states[idx], self.dones[idx]
 
     def __len__(self):
         '''
@@ -66,11 +128,82 @@ class ReplayBuffer:
         int
             The number of experiences in the buffer.
         '''
-        return len(self.buffer)
+        return self.size
 
     def save(self, path):
-        pickle.dump(self.buffer, open(path, "wb"))
+        with open(path, "wb") as f:
+            if self.states is None:
+                np.savez(f, position=self.position, size=self.size)
+                return
+            np.savez(f, position=self.position, size=self.size, states=self.states, actions=self.actions,
+                     rewards=self.rewards, next_states=self.next_states, dones=self.dones)
 
     def load(self, path):
-        self.buffer = pickle.load(open(path, "rb"))
+        '''
+        Load the experiences written by save(), or by the pickled deque of (state, action, reward, next_state, done)
+        tuples that save() wrote before the buffer was backed by arrays. The experiences are pushed oldest first,
+        so a smaller buffer keeps the newest of them. A file that cannot be read raises a ValueError and leaves the
+        buffer as it was.
+        '''
+        with open(path, "rb") as f:
+            # npz files are zip archives, older files are pickles
+            legacy = f.read(2) != b"PK"
+            f.seek(0)
+            try:
+                fields = []
+                if legacy:
+                    experiences = list(pickle.load(f))[-self.buffer_size:]
+                    if experiences:
+                        fields = [np.asarray(field) for field in zip(*experiences)]
+                else:
+                    with np.load(f) as data:
+                        (position, size) = (int(data["position"]), int(data["size"]))
+                        if "states" in data and size:
+                            # unroll the saved ring, oldest experience first
+                            fields = [np.roll(data[name][:size], -position, axis=0)
+                                      for name in ("states", "actions", "rewards", "next_states", "dones")]
+            except (EOFError, KeyError, TypeError, ValueError, pickle.UnpicklingError, zipfile.BadZipFile) as error:
+                raise ValueError(f"{path} is not a replay buffer file") from error
+
+        # pushed in order, the newest buffer_size experiences are kept and position follows the newest
+        (self.position, self.size, self.states) = (0, 0, None)
+        if fields:
+            self.push_batch(*fields)
+
+    def state_dict(self) -> dict:
+        '''
+        Everything but the experiences needed to restore the buffer, see arrays().
+        '''
+        return {"position": self.position, "size": self.size, "rng": self.rng.bit_generator.state}
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        '''
+        The stored experiences, as views of the first ``size`` rows of every field array (which is all of them
+        once the buffer wrapped around).
+        '''
+        if self.states is None:
+            return {}
+        return {name: getattr(self, name)[:self.size] for name in ("states", "actions", "rewards", "next_states",
+                                                                     "dones")}
 
+    def load_state_dict(self, state: dict, arrays: dict[str, np.ndarray]):
+        '''
+        Restore the buffer from state_dict() and arrays(). Field arrays that fill the whole buffer are used as they
+        are, so memory-mapped arrays (opened copy-on-write) are only read from disk as they are sampled.
+        '''
+        self.position = state["position"]
+        self.size = state["size"]
+        self.rng.bit_generator.state = state["rng"]
+        if "states" not in arrays:
+            self.states = None
+            return
+        if len(arrays["states"]) == self.buffer_size:
+            for (name, array) in arrays.items():
+                setattr(self, name, array)
+            return
+        self._allocate(arrays["states"].shape[1:])
+        n = min(len(arrays["states"]), self.buffer_size)
+        for (name, array) in arrays.items():
+            getattr(self, name)[:n] = array[:n]
+        self.size = min(self.size, self.buffer_size)
+        self.position %= self.buffer_size
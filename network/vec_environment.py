@@ -0,0 +1,737 @@
+import numpy as np
+
+from game.solvability import shortest_path
+from game.utils import Utils
+from network.environment import Stage
+
+
+class VecGenEnv:
+    '''
+    A batch of N GenEnv levels stepped together with NumPy array operations.
+
+    Every level is stored as a slice of stacked (N, S, S) boolean maps, where S is the largest map size the
+    environment can produce; cells outside a smaller level are masked out. Each level runs through the same
+    stage pipeline as GenEnv (WALLS -> WALL_SOLVER -> ENEMY -> ITEM -> SOLVER) with the same reward and
+    transition rules, but advances to the next stage on its own as soon as its current stage ends, and
+    starts a new level after the SOLVER stage. Since levels can be in different stages, observations are
+    returned zero padded to the widest observation space; ``obs[stage == s, :obs_width(s)]`` gives the
+    observations for the agent of stage ``s``.
+
+    Parameters
+    ----------
+    n_envs: int
+        The number of levels stepped in parallel.
+    map_size, wall_density, item, health, damage, safe_zone:
+        Same as for GenEnv, None means the value is drawn at random for every new level.
+    seed: int, optional
+        Seed of the generator used for level parameters and entry/exit points.
+    solve: bool, default=True
+        Whether levels go through the WALL_SOLVER and SOLVER stages. Without them a level runs WALLS -> ENEMY ->
+        ITEM and is replaced by a new one as soon as its ITEM stage ends, which is all level generation needs.
+
+    '''
+
+    OBS_WIDTH = 33
+
+    # player and enemy constants, see game.player.Player and game.enemy.Enemy
+    PLAYER_POWER = 3
+    ENEMY_HEALTH = 9
+    ENEMY_POWER = 2
+    STATE_FRAMES = 4
+    # smallest and largest size of levels drawn without a map_size
+    RANDOM_SIZES = (5, 10)
+
+    IDLE = Utils.EntityState.IDLE.value
+    HURT = Utils.EntityState.HURT.value
+    ATTACK = Utils.EntityState.ATTACK.value
+    DEAD = Utils.EntityState.DEAD.value
+
+    # player moves for solver actions 0-3, see Player.get_next_pos
+    MOVES = np.array([[0, 1], [0, -1], [-1, 0], [1, 0]])
+    # neighbour cells of the player in the order Game.attack_enemy visits them
+    NEAR_ORDER = ((0, -1), (-1, 0), (0, 0), (1, 0), (0, 1))
+
+    def __init__(self,
+                 n_envs: int,
+                 map_size: int = None,
+                 wall_density: float = None,
+                 item: int = None,
+                 health: int = None,
+                 damage: int = None,
+                 safe_zone: int = None,
+                 seed: int = None,
+                 solve: bool = True):
+        self.agent_spaces: dict[Stage, tuple[int, int]] = {
+            Stage.WALLS: (26, 2),
+            Stage.ENEMY: (14, 2),
+            Stage.ITEM: (21, 3),
+            Stage.SOLVER: (33, 8),
+        }
+        self.n_envs: int = n_envs
+        self.solve: bool = solve
+        self.rng = np.random.default_rng(seed)
+
+        self.SIZE: int = map_size
+        self.DENSITY: float = wall_density
+        self.DAMAGE: int = damage
+        self.HEALTH: int = health
+        self.ITEM: int = item
+        self.SAFE_ZONE: int = safe_zone
+        self.S: int = 10 if map_size is None else map_size
+
+        n, s = n_envs, self.S
+        self.wall_map = np.zeros((n, s, s), dtype=bool)
+        self.enemy_map = np.zeros((n, s, s), dtype=bool)
+        self.heal_map = np.zeros((n, s, s), dtype=bool)
+        self.power_map = np.zeros((n, s, s), dtype=bool)
+        self.route = np.zeros((n, s, s), dtype=bool)
+        self.inside = np.zeros((n, s, s), dtype=bool)
+
+        self.enemy_health = np.zeros((n, s, s), dtype=np.int32)
+        self.enemy_state = np.zeros((n, s, s), dtype=np.int8)
+        self.enemy_frame = np.zeros((n, s, s), dtype=np.int32)
+        self.enemy_cooldown = np.zeros((n, s, s), dtype=np.int32)
+
+        self.map_size = np.zeros(n, dtype=np.int64)
+        self.start_location = np.zeros((n, 2), dtype=np.int64)
+        self.end_location = np.zeros((n, 2), dtype=np.int64)
+        self.agent_location = np.zeros((n, 2), dtype=np.int64)
+        self.stage = np.zeros(n, dtype=np.int64)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.game_over = np.zeros(n, dtype=bool)
+
+        self.player_health = np.zeros(n, dtype=np.int64)
+        self.player_power = np.zeros(n, dtype=np.int64)
+        self.player_state = np.zeros(n, dtype=np.int8)
+        self.player_frame = np.zeros(n, dtype=np.int64)
+
+        self.current_density = np.zeros(n)
+        self.current_damage = np.zeros(n)
+        self.current_item = np.zeros(n, dtype=np.int64)
+        self.current_safe_zone = np.zeros(n, dtype=np.int64)
+        self.current_health = np.zeros(n, dtype=np.int64)
+
+        self.reset(seed=seed)
+
+    def obs_width(self, stage: Stage) -> int:
+        if stage == Stage.WALL_SOLVER:
+            stage = Stage.SOLVER
+        return self.agent_spaces[stage][0]
+
+    def solvability(self) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Reachability of every exit from its start through the current walls, and the shortest path lengths.
+        '''
+        return shortest_path(self.wall_map, self.start_location, self.end_location, self.inside)
+
+    def levels(self, idx: np.ndarray) -> dict[str, np.ndarray]:
+        '''
+        Copy of the layer maps, size, start, exit and parameters of the levels at ``idx``, under the names
+        game.level_dataset.LevelWriter.write_batch takes.
+        '''
+        return {
+            "wall_map": self.wall_map[idx],
+            "enemy_map": self.enemy_map[idx],
+            "heal_map": self.heal_map[idx],
+            "power_map": self.power_map[idx],
+            "map_size": self.map_size[idx],
+            "start": self.start_location[idx],
+            "end": self.end_location[idx],
+            "density": self.current_density[idx],
+            "damage": self.current_damage[idx],
+            "health": self.current_health[idx],
+            "item": self.current_item[idx],
+            "safe_zone": self.current_safe_zone[idx],
+        }
+
+    def generate(self, act: dict, idx: np.ndarray = None) -> dict[str, np.ndarray]:
+        '''
+        Run the WALLS, ENEMY and ITEM stages of the levels at ``idx`` (all by default) without sweeping them cell
+        by cell.
+
+        The ENEMY and ITEM observations of a cell do not depend on the actions taken at other cells in the same
+        stage, so each of these stages is decided for all cells with one call of its policy. A WALLS observation
+        sees the walls of its 5x5 window only, and every cell of that window the sweep visits earlier has a smaller
+        x + 3y, so the WALLS stage is decided in 4S-3 wavefronts of the cells with equal x + 3y. A greedy policy
+        therefore places exactly what the sweep would, with 4S-1 policy calls instead of 3 S*S steps.
+
+        The levels must be at the start of their WALLS stage, as they are after reset() or once they finished.
+        Afterwards they are advanced as step() would after their ITEM stage; WALL_SOLVER is skipped either way.
+
+        Parameters
+        ----------
+        act: dict[Stage, callable]
+            The policy of every generator stage, taking (M, obs_width) observations to (M,) actions, e.g.
+            D3QNAgent.act_batch.
+        idx: numpy.ndarray, optional
+            The levels to generate.
+
+        Returns
+        -------
+        dict of numpy.ndarray
+            The generated levels, see levels().
+        '''
+        idx = np.arange(self.n_envs) if idx is None else np.asarray(idx)
+        if ((self.stage[idx] != Stage.WALLS.value) | self.agent_location[idx].any(axis=1)).any():
+            raise ValueError('levels must be at the start of their WALLS stage')
+        cells = np.arange(self.S)
+        (x, y) = (np.tile(cells, self.S), np.repeat(cells, self.S))
+        size = self.map_size[idx, None]
+        inside = (x[None] < size) & (y[None] < size)
+        rows = idx[:, None]
+
+        def decide(stage, obs, cell):
+            actions = np.zeros(obs.shape[:2], dtype=np.int64)
+            if cell.any():
+                actions[cell] = act[stage](obs[cell])
+            return actions
+
+        wave = x + 3 * y
+        for t in range(wave.max() + 1):
+            cell = wave == t
+            actions = decide(Stage.WALLS, self._cell_obs_walls(idx, x[cell], y[cell]), inside[:, cell])
+            self.wall_map[rows, x[cell], y[cell]] |= actions == 1
+
+        actions = decide(Stage.ENEMY, self._cell_obs_enemy(idx, x, y), inside)
+        (level, cell) = np.nonzero(actions == 1)
+        placed = (idx[level], x[cell], y[cell])
+        self.enemy_map[placed] = True
+        self.enemy_health[placed] = self.ENEMY_HEALTH
+        self.enemy_state[placed] = self.IDLE
+        self.enemy_frame[placed] = 0
+        self.enemy_cooldown[placed] = 1
+
+        actions = decide(Stage.ITEM, self._cell_obs_items(idx, x, y), inside)
+        self.heal_map[rows, x, y] |= actions == 1
+        self.power_map[rows, x, y] |= actions >= 2
+
+        levels = self.levels(idx)
+        self.stage[idx] = Stage.ITEM.value
+        self._advance(idx)
+        return levels
+
+    def reset(self, seed=None, options=None) -> tuple[np.ndarray, dict]:
+        '''
+        Start a new level in every slot. ``options`` may set the parameters of GenEnv.__init__ for these levels,
+        see _reset_levels; levels started later use the environment's own again.
+        '''
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        return self.reset_levels(np.arange(self.n_envs), options), {"stage": self.stage.copy()}
+
+    def reset_levels(self, idx: np.ndarray, options: dict = None) -> np.ndarray:
+        '''
+        Start new levels at ``idx`` only, e.g. to hand slots to new requests, and return their observations.
+        '''
+        self._reset_levels(idx, options)
+        return self._get_obs(idx)
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, dict]:
+        '''
+        Apply one action per level.
+
+        Returns the observations of the stage every level is in after the step, the rewards, and the
+        terminated and truncated masks of the stage the action was applied in. Levels whose stage ended have
+        already been advanced to the next stage (or to a new level after SOLVER); the observation they
+        finished the stage with is in ``info["final_obs"]`` and the stage the action was applied in is in
+        ``info["stage"]``. Levels that finished their last stage are listed in ``info["finished"]``, with a
+        snapshot of them in ``info["levels"]``.
+        '''
+        actions = np.asarray(actions, dtype=np.int64)
+        rewards = np.zeros(self.n_envs)
+        terminated = np.zeros(self.n_envs, dtype=bool)
+        truncated = np.zeros(self.n_envs, dtype=bool)
+        stage = self.stage.copy()
+
+        idx = np.flatnonzero(stage == Stage.WALLS.value)
+        if idx.size:
+            rewards[idx] = self._apply_action_walls(idx, actions[idx])
+            terminated[idx] = self._move_agent_sweep(idx)
+        idx = np.flatnonzero(stage == Stage.ENEMY.value)
+        if idx.size:
+            rewards[idx] = self._apply_action_enemy(idx, actions[idx])
+            terminated[idx] = self._move_agent_sweep(idx)
+        idx = np.flatnonzero(stage == Stage.ITEM.value)
+        if idx.size:
+            rewards[idx] = self._apply_action_item(idx, actions[idx])
+            terminated[idx] = self._move_agent_sweep(idx)
+        idx = np.flatnonzero((stage == Stage.WALL_SOLVER.value) | (stage == Stage.SOLVER.value))
+        if idx.size:
+            reward = self._apply_action_solver(idx, actions[idx])
+            rewards[idx] = reward
+            self.steps[idx] += 1 - 3 * (reward > 0)
+            at_exit = (self.agent_location[idx] == self.end_location[idx]).all(axis=1)
+            limit = self.map_size[idx] ** 2
+            wall_solver = stage[idx] == Stage.WALL_SOLVER.value
+            terminated[idx] = np.where(wall_solver, at_exit, at_exit | (self.steps[idx] > limit * 8))
+            truncated[idx] = np.where(wall_solver, self.steps[idx] > limit * 4, self.player_health[idx] <= 0)
+
+        obs = self._get_obs(np.arange(self.n_envs))
+        final_obs = obs.copy()
+        done = np.flatnonzero(terminated | truncated)
+        last = Stage.SOLVER.value if self.solve else Stage.ITEM.value
+        finished = done[stage[done] == last]
+        levels = self.levels(finished)
+        if done.size:
+            self._advance(done)
+            obs[done] = self._get_obs(done)
+
+        return obs, rewards, terminated, truncated, {"stage": stage, "final_obs": final_obs,
+                                                     "finished": finished, "levels": levels}
+
+    def _reset_levels(self, idx: np.ndarray, options: dict = None):
+        '''
+        Start new levels at ``idx``. ``options`` may give the parameters of GenEnv.__init__ per level, as
+        (idx.size,) arrays or scalars; NaN entries and missing names fall back to the environment's own value.
+        '''
+        n = idx.size
+        rng = self.rng
+
+        def param(name, fixed, draw):
+            value = None if options is None else options.get(name)
+            default = (lambda: draw() if fixed is None else np.full(n, fixed))
+            if value is None:
+                return default()
+            value = np.array(np.broadcast_to(value, n), dtype=float)
+            missing = np.isnan(value)
+            if missing.any():
+                value[missing] = default()[missing]
+            return value
+
+        (smallest, largest) = self.RANDOM_SIZES
+        map_size = param("map_size", self.SIZE,
+                         lambda: rng.integers(smallest, largest, size=n, endpoint=True)).astype(np.int64)
+        if ((map_size < 1) | (map_size > self.S)).any():
+            raise ValueError(f'map_size must be between 1 and {self.S}')
+        health = param("health", self.HEALTH, lambda: rng.integers(2, 11, size=n)).astype(np.int64)
+        self.current_density[idx] = param("wall_density", self.DENSITY, lambda: rng.integers(10, 501, size=n) / 1000)
+        self.current_damage[idx] = param("damage", self.DAMAGE,
+                                         lambda: rng.integers(10, 601, size=n) / 1000 * health)
+        self.current_item[idx] = param("item", self.ITEM,
+                                       lambda: rng.integers(1, np.maximum(map_size ** 2 // 8, 1), endpoint=True))
+        self.current_safe_zone[idx] = param("safe_zone", self.SAFE_ZONE,
+                                            lambda: rng.integers(0, map_size // 3, endpoint=True))
+
+        # same rule as Level.__init__: redraw the entry while its signed offset from the exit is too large
+        exit_point = rng.integers(0, map_size[:, None], size=(n, 2))
+        entry_point = rng.integers(0, map_size[:, None], size=(n, 2))
+        redraw = (entry_point - exit_point).sum(axis=1) > map_size / 3
+        while redraw.any():
+            entry_point[redraw] = rng.integers(0, map_size[redraw, None], size=(redraw.sum(), 2))
+            redraw = (entry_point - exit_point).sum(axis=1) > map_size / 3
+
+        for _map in (self.wall_map, self.enemy_map, self.heal_map, self.power_map, self.route):
+            _map[idx] = False
+        cells = np.arange(self.S)
+        self.inside[idx] = ((cells[None, :, None] < map_size[:, None, None])
+                            & (cells[None, None, :] < map_size[:, None, None]))
+
+        self.map_size[idx] = map_size
+        self.end_location[idx] = exit_point
+        self.start_location[idx] = entry_point
+        self.agent_location[idx] = 0
+        self.stage[idx] = Stage.WALLS.value
+        self.steps[idx] = 0
+        self.game_over[idx] = False
+        self.player_health[idx] = health
+        self.current_health[idx] = health
+        self.player_power[idx] = self.PLAYER_POWER
+        self.player_state[idx] = self.IDLE
+        self.player_frame[idx] = 0
+
+    def _advance(self, idx: np.ndarray):
+        stage = self.stage[idx]
+        to_wall_solver = idx[stage == Stage.WALLS.value]
+        to_enemy = idx[stage == Stage.WALL_SOLVER.value]
+        to_item = idx[stage == Stage.ENEMY.value]
+        to_solver = idx[stage == Stage.ITEM.value]
+        to_reset = idx[stage == Stage.SOLVER.value]
+        if not self.solve:
+            (to_enemy, to_wall_solver) = (np.concatenate((to_enemy, to_wall_solver)), to_wall_solver[:0])
+            (to_reset, to_solver) = (np.concatenate((to_reset, to_solver)), to_solver[:0])
+
+        self.stage[to_wall_solver] = Stage.WALL_SOLVER.value
+        self.agent_location[to_wall_solver] = self.start_location[to_wall_solver]
+        self.steps[to_wall_solver] = 0
+
+        self.stage[to_enemy] = Stage.ENEMY.value
+        self.agent_location[to_enemy] = 0
+
+        self.stage[to_item] = Stage.ITEM.value
+        self.agent_location[to_item] = 0
+
+        self.stage[to_solver] = Stage.SOLVER.value
+        self.agent_location[to_solver] = self.start_location[to_solver]
+        self.steps[to_solver] = 0
+
+        if to_reset.size:
+            self._reset_levels(to_reset)
+
+    def _move_agent_sweep(self, idx: np.ndarray) -> np.ndarray:
+        x, y = self.agent_location[idx, 0], self.agent_location[idx, 1]
+        size = self.map_size[idx]
+        y = y + (x == size - 1)
+        x = (x + 1) % size
+        self.agent_location[idx, 0] = x
+        self.agent_location[idx, 1] = y
+        return y >= size
+
+    def _at(self, _map: np.ndarray, idx: np.ndarray) -> np.ndarray:
+        return _map[idx, self.agent_location[idx, 0], self.agent_location[idx, 1]]
+
+    def _at_start_or_end(self, idx: np.ndarray) -> np.ndarray:
+        agent = self.agent_location[idx]
+        return ((agent == self.start_location[idx]).all(axis=1)
+                | (agent == self.end_location[idx]).all(axis=1))
+
+    def _apply_action_walls(self, idx: np.ndarray, action: np.ndarray) -> np.ndarray:
+        place = idx[action == 1]
+        self.wall_map[place, self.agent_location[place, 0], self.agent_location[place, 1]] = True
+
+        relative_density = (self.wall_map[idx].sum(axis=(1, 2)) / self.map_size[idx] ** 2
+                            / self.current_density[idx])
+        reward = 1 - 20 * self._at_start_or_end(idx) - np.round(relative_density * 4. - 3.)
+        return np.where(action == 1, reward, 0)
+
+    def _apply_action_enemy(self, idx: np.ndarray, action: np.ndarray) -> np.ndarray:
+        left = np.floor(self.player_health[idx] / self.current_damage[idx] - 1)
+        place = idx[action == 1]
+        x, y = self.agent_location[place, 0], self.agent_location[place, 1]
+        self.enemy_map[place, x, y] = True
+        self.enemy_health[place, x, y] = self.ENEMY_HEALTH
+        self.enemy_state[place, x, y] = self.IDLE
+        self.enemy_frame[place, x, y] = 0
+        self.enemy_cooldown[place, x, y] = 1
+
+        agent = self.agent_location[idx]
+        start_distance = np.abs(self.start_location[idx] - agent).sum(axis=1)
+        end_distance = np.abs(self.end_location[idx] - agent).sum(axis=1)
+        safe_zone = self.current_safe_zone[idx]
+        reward = (1
+                  - 10 * ((start_distance < safe_zone) | (end_distance < safe_zone))
+                  - 5 * self._at(self.wall_map, idx)
+                  - 1 * (self.enemy_map[idx].sum(axis=(1, 2)) > left))
+        return np.where(action == 1, reward, 0)
+
+    def _apply_action_item(self, idx: np.ndarray, action: np.ndarray) -> np.ndarray:
+        enemies = self.enemy_map[idx].sum(axis=(1, 2))
+        relative_density = ((self.heal_map[idx].sum(axis=(1, 2)) + self.power_map[idx].sum(axis=(1, 2)))
+                            / self.current_item[idx])
+        heal, power = idx[action == 1], idx[action >= 2]
+        self.heal_map[heal, self.agent_location[heal, 0], self.agent_location[heal, 1]] = True
+        self.power_map[power, self.agent_location[power, 0], self.agent_location[power, 1]] = True
+
+        damage = self.current_damage[idx]
+        spare = self.player_health[idx] - damage * enemies
+        reward = (1
+                  - np.round(relative_density * 4. - 3.)
+                  + np.where(action == 1, spare < damage, spare >= damage)
+                  - 10 * (self._at_start_or_end(idx) | self._at(self.wall_map, idx)))
+        return np.where(action >= 1, reward, 0)
+
+    def _apply_action_solver(self, idx: np.ndarray, action: np.ndarray) -> np.ndarray:
+        '''
+        Vectorized Game.tick for the levels in a solver stage.
+        '''
+        px, py = self.agent_location[idx, 0], self.agent_location[idx, 1]
+        self.route[idx, px, py] = True
+        self._tick_entities(idx)
+
+        reward = np.zeros(idx.size)
+        playing = ~self.game_over[idx]
+
+        # movement
+        move = playing & (action < 4)
+        step = self.MOVES[np.minimum(action, 3)]
+        nx, ny = px + step[:, 0], py + step[:, 1]
+        size = self.map_size[idx]
+        valid = (nx >= 0) & (nx < size) & (ny >= 0) & (ny < size)
+        valid[valid] = ~self.wall_map[idx[valid], nx[valid], ny[valid]]
+        valid &= move
+        ex, ey = self.end_location[idx, 0], self.end_location[idx, 1]
+        exit_distance = (px - ex) + (py - ey)
+        px, py = np.where(valid, nx, px), np.where(valid, ny, py)
+        self.agent_location[idx, 0], self.agent_location[idx, 1] = px, py
+        reward += np.where(move, np.where(valid, -1, -3) + ((px - ex) + (py - ey) < exit_distance), 0)
+        reached = move & (px == ex) & (py == ey)
+        self.game_over[idx[reached]] = True
+        playing &= ~reached
+
+        # attack
+        attack = playing & (action == 4)
+        killed, damaged = self._attack_enemy(idx[attack])
+        reward[attack] += -1 + killed * 5 + damaged
+
+        # pick up items
+        rows = idx[playing]
+        heal = self.heal_map[rows, px[playing], py[playing]]
+        power = self.power_map[rows, px[playing], py[playing]]
+        self.player_health[rows] += 2 * heal
+        self.player_power[rows] += 3 * power
+        self.heal_map[rows, px[playing], py[playing]] = False
+        self.power_map[rows, px[playing], py[playing]] = False
+        reward[playing] += 3 * (heal.astype(int) + power)
+
+        reward[playing] -= self._attack_player(rows)
+
+        dead = playing & (self.player_health[idx] <= 0)
+        self.player_frame[idx[dead]] = 0
+        self.player_state[idx[dead]] = self.DEAD
+        self.game_over[idx[dead]] = True
+
+        reward[reached] = 100
+        reward[dead] = -100
+        return reward
+
+    def _tick_entities(self, idx: np.ndarray):
+        # Player.tick
+        frame = self.player_frame[idx] + 1
+        state = self.player_state[idx]
+        ended = frame == self.STATE_FRAMES
+        frame[(state == self.DEAD) & ended] = self.STATE_FRAMES - 1
+        recover = ((state == self.HURT) | (state == self.ATTACK)) & ended
+        self.player_power[idx[(state == self.ATTACK) & ended]] = self.PLAYER_POWER
+        state[recover] = self.IDLE
+        frame[recover] = 0
+        self.player_frame[idx] = frame % self.STATE_FRAMES
+        self.player_state[idx] = state
+
+        # Enemy.tick
+        frame = self.enemy_frame[idx] + 1
+        state = self.enemy_state[idx]
+        recover = ((state == self.ATTACK) | (state == self.HURT)) & (frame == self.STATE_FRAMES)
+        state[recover] = self.IDLE
+        frame[recover] = 0
+        frame[frame >= self.STATE_FRAMES] = -self.STATE_FRAMES + 1
+        self.enemy_frame[idx] = frame
+        self.enemy_state[idx] = state
+
+    def _near(self, idx: np.ndarray) -> np.ndarray:
+        '''
+        Mask of the cells at most one step away from the agent, i.e. Entity.get_near_pos.
+        '''
+        cells = np.arange(self.S)
+        dx = np.abs(cells[None, :, None] - self.agent_location[idx, 0, None, None])
+        dy = np.abs(cells[None, None, :] - self.agent_location[idx, 1, None, None])
+        return dx + dy <= 1
+
+    def _attack_enemy(self, idx: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        if not idx.size:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        start = self.player_state[idx] != self.ATTACK
+        self.player_frame[idx[start]] = 0
+        self.player_state[idx[start]] = self.ATTACK
+
+        # Game.attack_enemy removes killed enemies from the list it is iterating over, so the enemy right
+        # after a killed one is skipped. Enemies are listed in sweep order (key y * S + x), which puts the
+        # neighbours of the player in the order of NEAR_ORDER; count tells whether anything lies in between.
+        rows = np.arange(idx.size)
+        count = np.cumsum(self.enemy_map[idx].transpose(0, 2, 1).reshape(idx.size, -1), axis=1)
+        px, py = self.agent_location[idx, 0], self.agent_location[idx, 1]
+        size = self.map_size[idx]
+        power = self.player_power[idx]
+        killed = np.zeros(idx.size, dtype=np.int64)
+        damaged = np.zeros(idx.size, dtype=np.int64)
+        killed_key = np.full(idx.size, -1)
+        for (dx, dy) in self.NEAR_ORDER:
+            x, y = px + dx, py + dy
+            valid = (x >= 0) & (x < size) & (y >= 0) & (y < size)
+            x, y = np.where(valid, x, 0), np.where(valid, y, 0)
+            key = y * self.S + x
+            valid &= self.enemy_map[idx, x, y]
+            skipped = (killed_key >= 0) & (count[rows, key - 1] - count[rows, killed_key] == 0)
+            hit = idx[valid & ~skipped]
+            hx, hy = x[valid & ~skipped], y[valid & ~skipped]
+
+            hurt = self.enemy_state[hit, hx, hy] != self.HURT
+            self.enemy_health[hit[hurt], hx[hurt], hy[hurt]] -= power[valid & ~skipped][hurt]
+            self.enemy_state[hit[hurt], hx[hurt], hy[hurt]] = self.HURT
+            self.enemy_frame[hit[hurt], hx[hurt], hy[hurt]] = -1
+
+            dead = np.zeros(idx.size, dtype=bool)
+            dead[valid & ~skipped] = self.enemy_health[hit, hx, hy] <= 0
+            self.enemy_map[idx[dead], x[dead], y[dead]] = False
+            killed += dead
+            damaged += valid & ~skipped & ~dead
+            killed_key = np.where(dead, key, np.where(valid, -1, killed_key))
+        return killed, damaged
+
+    def _attack_player(self, rows: np.ndarray) -> np.ndarray:
+        hurt = np.zeros(rows.size, dtype=np.int64)
+        exposed = self.player_state[rows] != self.ATTACK
+        idx = rows[exposed]
+        if not idx.size:
+            return hurt
+        near = self._near(idx) & self.enemy_map[idx]
+        state = self.enemy_state[idx]
+        cooldown = self.enemy_cooldown[idx]
+        tick = near & (state != self.ATTACK)
+        cooldown[tick] = (cooldown[tick] + 1) % Utils.COOLDOWN
+        attack = near & (cooldown == 0)
+        state[attack] = self.ATTACK
+        frame = self.enemy_frame[idx]
+        frame[attack] = -1
+        self.enemy_cooldown[idx] = cooldown
+        self.enemy_state[idx] = state
+        self.enemy_frame[idx] = frame
+
+        # only the first attacker gets through, Entity.hurt ignores damage while HURT
+        hurt[exposed] = attack.sum(axis=(1, 2))
+        damaged = rows[(hurt > 0) & (self.player_state[rows] != self.HURT)]
+        self.player_frame[damaged] = -1
+        self.player_state[damaged] = self.HURT
+        self.player_health[damaged] -= self.ENEMY_POWER
+        return hurt
+
+    def _get_obs(self, idx: np.ndarray) -> np.ndarray:
+        obs = np.zeros((idx.size, self.OBS_WIDTH), dtype=np.float32)
+        builders = (
+            (Stage.WALLS, self._get_complete_obs_walls),
+            (Stage.WALL_SOLVER, self._get_complete_obs_solver),
+            (Stage.ENEMY, self._get_complete_obs_enemy),
+            (Stage.ITEM, self._get_complete_obs_items),
+            (Stage.SOLVER, self._get_complete_obs_solver),
+        )
+        stage = self.stage[idx]
+        for (s, builder) in builders:
+            selected = stage == s.value
+            if selected.any():
+                block = builder(idx[selected])
+                obs[selected, :block.shape[1]] = block
+        return obs
+
+    def _get_obs_of(self, world: np.ndarray, idx: np.ndarray, r: int = 1, pad: int = 0) -> np.ndarray:
+        '''
+        (2r+1)x(2r+1) windows of ``world`` around every agent, flattened, same layout as GenEnv._get_obs_of.
+        '''
+        world = self._padded(world, r, pad)
+        offsets = np.arange(2 * r + 1)
+        x = self.agent_location[idx, 0, None, None] + offsets[None, :, None]
+        y = self.agent_location[idx, 1, None, None] + offsets[None, None, :]
+        return world[np.arange(idx.size)[:, None, None], x, y].reshape(idx.size, -1)
+
+    def _padded(self, world: np.ndarray, r: int, pad: int) -> np.ndarray:
+        (n, s) = world.shape[:2]
+        padded = np.full((n, s + 2 * r + 1, s + 2 * r + 1), pad, dtype=world.dtype)
+        padded[:, r:r + s, r:r + s] = world
+        return padded
+
+    def _closest(self, _map: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Same pick as GenEnv._get_obs_closest_delta_to: the first cell in row-major order with the smallest
+        x + y of every map, and whether the map has any cell set at all.
+        '''
+        cells = np.arange(self.S)
+        score = np.where(_map, cells[None, :, None] + cells[None, None, :], 2 * self.S)
+        closest = score.reshape(len(_map), -1).argmin(axis=1)
+        return np.stack(np.divmod(closest, self.S), axis=1), _map.any(axis=(1, 2))
+
+    def _get_obs_closest_delta_to(self, _map: np.ndarray, idx: np.ndarray) -> np.ndarray:
+        '''
+        The closest cell of _closest as a delta from the agent, or (0, 0) when the map is empty.
+        '''
+        (closest, found) = self._closest(_map)
+        return np.where(found[:, None], closest - self.agent_location[idx], 0)
+
+    def _get_obs_entry_distance(self, idx: np.ndarray) -> np.ndarray:
+        return np.abs(self.start_location[idx] - self.agent_location[idx]).sum(axis=1)
+
+    def _get_obs_exit_distance(self, idx: np.ndarray) -> np.ndarray:
+        return np.abs(self.end_location[idx] - self.agent_location[idx]).sum(axis=1)
+
+    def _get_obs_enemy_density(self, idx: np.ndarray) -> np.ndarray:
+        return (np.floor(self.player_health[idx] / self.current_damage[idx] - 1)
+                / self.map_size[idx] ** 2)
+
+    def _get_complete_obs_walls(self, idx: np.ndarray) -> np.ndarray:  # 26
+        world = self.wall_map[idx].astype(int)
+        world[np.arange(idx.size), self.end_location[idx, 0], self.end_location[idx, 1]] = -1
+        return np.column_stack((
+            self._get_obs_of(world, idx, r=2),  # 25
+            self.current_density[idx],  # 1
+        ))
+
+    def _get_complete_obs_enemy(self, idx: np.ndarray) -> np.ndarray:  # 14
+        return np.column_stack((
+            self._get_obs_of(self.wall_map[idx], idx),  # 9
+            self._get_obs_closest_delta_to(self.route[idx], idx).sum(axis=1),  # 1
+            self._get_obs_entry_distance(idx),  # 1
+            self._get_obs_exit_distance(idx),  # 1
+            self._get_obs_enemy_density(idx),  # 1
+            self.player_health[idx],  # 1
+        ))
+
+    def _get_complete_obs_items(self, idx: np.ndarray) -> np.ndarray:  # 21
+        return np.column_stack((
+            self._get_obs_of(self.wall_map[idx], idx),  # 9
+            self._get_obs_of(self.enemy_map[idx], idx),  # 9
+            self._get_obs_closest_delta_to(self.route[idx], idx).sum(axis=1),  # 1
+            self.player_health[idx],  # 1
+            self.current_item[idx] / self.map_size[idx] ** 2,  # 1
+        ))
+
+    def _get_complete_obs_solver(self, idx: np.ndarray) -> np.ndarray:  # 33
+        walls = self.wall_map[idx]
+        objects = self.enemy_map[idx].astype(int) + self.heal_map[idx] + self.power_map[idx]
+        world = np.where(walls, -1, objects)
+        world[np.arange(idx.size), self.end_location[idx, 0], self.end_location[idx, 1]] = 3
+        world[~self.inside[idx]] = -1
+        exit_delta = self.end_location[idx] - self.agent_location[idx]
+        return np.column_stack((
+            self._get_obs_of(world, idx, r=2, pad=-1),  # 25
+            (self._near(idx) & self.enemy_map[idx]).sum(axis=(1, 2)),  # 1
+            self._get_obs_closest_delta_to(self.heal_map[idx], idx),  # 2
+            self._get_obs_closest_delta_to(self.power_map[idx], idx),  # 2
+            np.sign(exit_delta),  # 2
+            self.player_health[idx],  # 1
+        ))
+
+    def _cell_obs_of(self, world: np.ndarray, x: np.ndarray, y: np.ndarray, r: int = 1, pad: int = 0) -> np.ndarray:
+        '''
+        _get_obs_of for an agent at every cell (x, y) of every level at once, (N, K, (2r+1)**2).
+        '''
+        world = self._padded(world, r, pad)
+        offsets = np.arange(2 * r + 1)
+        wx = x[:, None, None] + offsets[None, :, None]
+        wy = y[:, None, None] + offsets[None, None, :]
+        return world[:, wx, wy].reshape(len(world), x.size, -1)
+
+    def _cell_columns(self, *columns: np.ndarray) -> np.ndarray:
+        '''
+        Stack (N, K, w) blocks, (N, K) and (N,) columns into (N, K, width) cell observations.
+        '''
+        (n, k) = columns[0].shape[:2]
+        blocks = [c if c.ndim == 3 else c.reshape(n, -1, 1) for c in columns]
+        return np.concatenate([np.broadcast_to(b, (n, k, b.shape[2])) for b in blocks], axis=2).astype(np.float32)
+
+    def _cell_route_delta(self, idx: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        (closest, found) = self._closest(self.route[idx])
+        return np.where(found[:, None], closest.sum(axis=1)[:, None] - (x + y)[None], 0)
+
+    def _cell_obs_walls(self, idx: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:  # 26
+        world = self.wall_map[idx].astype(int)
+        world[np.arange(idx.size), self.end_location[idx, 0], self.end_location[idx, 1]] = -1
+        return self._cell_columns(
+            self._cell_obs_of(world, x, y, r=2),  # 25
+            self.current_density[idx],  # 1
+        )
+
+    def _cell_obs_enemy(self, idx: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:  # 14
+        (start, end) = (self.start_location[idx, :, None], self.end_location[idx, :, None])
+        return self._cell_columns(
+            self._cell_obs_of(self.wall_map[idx], x, y),  # 9
+            self._cell_route_delta(idx, x, y),  # 1
+            np.abs(start[:, 0] - x) + np.abs(start[:, 1] - y),  # 1
+            np.abs(end[:, 0] - x) + np.abs(end[:, 1] - y),  # 1
+            self._get_obs_enemy_density(idx),  # 1
+            self.player_health[idx],  # 1
+        )
+
+    def _cell_obs_items(self, idx: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:  # 21
+        return self._cell_columns(
+            self._cell_obs_of(self.wall_map[idx], x, y),  # 9
+            self._cell_obs_of(self.enemy_map[idx], x, y),  # 9
+            self._cell_route_delta(idx, x, y),  # 1
+            self.player_health[idx],  # 1
+            self.current_item[idx] / self.map_size[idx] ** 2,  # 1
+        )
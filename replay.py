@@ -0,0 +1,80 @@
+'''
+Watch episodes recorded by training with train(trace_dir="traces"), see network.episode_trace.
+
+Run from the repository root:
+
+    python replay.py --traces traces --list
+    python replay.py --traces traces --episode 1200 --stages WALL_SOLVER SOLVER
+
+An episode is replayed by resetting a GenEnv to its recorded level and stepping the recorded actions, so the game
+plays out exactly as it did in training; the stages given with --stages are rendered. Every reward is compared
+with the recorded one, --check replays the whole log without rendering and only reports those that differ.
+'''
+import argparse
+
+from network.environment import GenEnv, Stage
+from network.episode_trace import EpisodeTrace, read_traces
+
+
+def replay(env: GenEnv, trace: EpisodeTrace, watch=(Stage.WALL_SOLVER, Stage.SOLVER)) -> int:
+    '''
+    Step the actions of ``trace`` through ``env``, rendering the stages in ``watch``.
+
+    Returns
+    -------
+    int
+        The number of steps whose reward differs from the recorded one.
+    '''
+    env.reset(options=trace.level)
+    mismatches = 0
+    for (stage, actions, rewards) in trace.segments():
+        while env.stage.value != stage:
+            env.advance()
+        env.render = Stage(stage) in watch
+        for (action, reward) in zip(actions, rewards):
+            mismatches += env.step(action)[1] != reward
+    env.render = False
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--traces", default="traces")
+    parser.add_argument("--episode", type=int, nargs="*", help="episodes to replay, the last one when left out")
+    parser.add_argument("--stages", nargs="+", default=["WALL_SOLVER", "SOLVER"], choices=[s.name for s in Stage])
+    parser.add_argument("--delay", type=int, default=120, help="milliseconds per rendered step")
+    parser.add_argument("--list", action="store_true", help="list the recorded episodes")
+    parser.add_argument("--check", action="store_true", help="replay every episode without rendering")
+    args = parser.parse_args()
+
+    env = GenEnv()
+    env.game.render_delay = args.delay
+    if args.list:
+        for (episode, trace) in read_traces(args.traces):
+            stages = " ".join(f"{Stage(stage).name}:{len(actions)}/{sum(rewards)}"
+                              for (stage, actions, rewards) in trace.segments())
+            print(f"{episode:>8}  size {trace.level['map_size']:>2}  {stages}")
+        return
+    if args.check:
+        (episodes, differing) = (0, 0)
+        for (episode, trace) in read_traces(args.traces):
+            mismatches = replay(env, trace, watch=())
+            if mismatches:
+                print(f"episode {episode}: {mismatches} rewards differ")
+            (episodes, differing) = (episodes + 1, differing + bool(mismatches))
+        print(f"replayed {episodes} episodes, {differing} differed")
+        return
+
+    traces = dict(read_traces(args.traces))
+    if not traces:
+        raise SystemExit(f"no episodes recorded in {args.traces}")
+    watch = tuple(Stage[name] for name in args.stages)
+    for episode in args.episode or [max(traces)]:
+        if episode not in traces:
+            raise SystemExit(f"episode {episode} is not in {args.traces}, see --list")
+        mismatches = replay(env, traces[episode], watch)
+        print(f"episode {episode} replayed" + (f", {mismatches} rewards differ" if mismatches else ""))
+
+
+if __name__ == '__main__':
+    main()
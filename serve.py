@@ -0,0 +1,116 @@
+'''
+Local HTTP server handing out freshly generated levels.
+
+Run from the repository root:
+
+    python serve.py --models models --port 8000
+
+    GET /level?map_size=8&health=5    one level as JSON, parameters as for GenEnv and random when left out
+    GET /level?format=record          the same level as one record of a level dataset (see game.level_dataset)
+    GET /metrics                      served requests, p50/p99 latency and mean batch size
+
+Concurrent requests are generated together, see network.level_service.LevelService. benchmarks/level_service.py
+load-tests a running server.
+'''
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import torch
+
+from game.level_dataset import LAYERS, pack_records
+from generate import load_generators
+from network.level_service import PARAMS, LevelService
+from network.vec_environment import VecGenEnv
+
+
+def to_json(level: dict) -> dict:
+    '''
+    A level returned by LevelService as plain JSON types, with its maps cut to its size and indexed [x][y].
+    '''
+    s = int(level["map_size"])
+    result = {layer: level[layer][:s, :s].astype(int).tolist() for layer in LAYERS}
+    result["start"] = level["start"].tolist()
+    result["end"] = level["end"].tolist()
+    for key in ("map_size", "health", "item", "safe_zone", "path_length"):
+        result[key] = int(level[key])
+    for key in ("density", "damage"):
+        result[key] = float(level[key])
+    result["solvable"] = bool(level["solvable"])
+    return result
+
+
+def to_record(level: dict, max_size: int) -> bytes:
+    record = pack_records(max_size, *(level[layer][None] for layer in LAYERS),
+                          map_size=[level["map_size"]], start=[level["start"]], end=[level["end"]],
+                          **{key: [level[key]] for key in ("density", "damage", "health", "item", "safe_zone")},
+                          solved=[level["solvable"]], path_length=[level["path_length"]])
+    return record.tobytes()
+
+
+class LevelRequestHandler(BaseHTTPRequestHandler):
+    service: LevelService = None
+    max_size: int = 10
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = dict(parse_qsl(url.query))
+        if url.path == "/metrics":
+            return self.__reply(200, json.dumps(self.service.metrics()).encode(), "application/json")
+        if url.path != "/level":
+            return self.__reply(404, b'{"error": "not found"}', "application/json")
+        try:
+            fmt = query.pop("format", "json")
+            params = {name: float(value) if name in ("wall_density", "damage") else int(value)
+                      for (name, value) in query.items() if name in PARAMS}
+            unknown = set(query) - set(PARAMS)
+            if unknown or fmt not in ("json", "record"):
+                raise ValueError(f'unknown parameters {sorted(unknown)}' if unknown else f'unknown format {fmt}')
+            level = self.service.generate(**params)
+        except ValueError as e:
+            return self.__reply(400, json.dumps({"error": str(e)}).encode(), "application/json")
+        if fmt == "record":
+            return self.__reply(200, to_record(level, self.max_size), "application/octet-stream")
+        return self.__reply(200, json.dumps(to_json(level)).encode(), "application/json")
+
+    def log_message(self, format, *args):
+        pass
+
+    def __reply(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", default="models")
+    parser.add_argument("--hidden-size", type=int, default=64)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait", type=float, default=0.001, help="seconds to wait for a batch to fill")
+    parser.add_argument("--threads", type=int, default=1, help="torch threads of the forward passes")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    env = VecGenEnv(1)
+    agent = load_generators(args.models, env.agent_spaces, args.hidden_size)
+    with LevelService(agent, max_batch=args.max_batch, max_wait=args.max_wait, seed=args.seed) as service:
+        LevelRequestHandler.service = service
+        LevelRequestHandler.max_size = env.S
+        server = ThreadingHTTPServer((args.host, args.port), LevelRequestHandler)
+        print(f"serving levels on http://{args.host}:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
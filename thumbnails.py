@@ -0,0 +1,62 @@
+'''
+Contact sheets and PNGs of the levels of a level dataset, for auditing generated levels without a display.
+
+Run from the repository root:
+
+    python thumbnails.py --levels levels.lvl --out sheets/sheet.png --count 2000 --columns 25 --tile 4
+
+Levels are rasterized in batches with game.rasterizer and laid out --per-sheet to a contact sheet, written as
+sheet-0000.png, sheet-0001.png and so on; with --png-dir every level is also written on its own as <index>.png.
+'''
+import argparse
+import os
+import time
+
+import numpy as np
+
+from game.level_dataset import LAYERS, LevelReader
+from game.rasterizer import contact_sheet, rasterize, save_png
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="levels.lvl")
+    parser.add_argument("--out", default="sheet.png")
+    parser.add_argument("--first", type=int, default=0, help="index of the first level")
+    parser.add_argument("--count", type=int, default=400)
+    parser.add_argument("--sample", action="store_true", help="draw --count random levels instead")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--per-sheet", type=int, default=400)
+    parser.add_argument("--tile", type=int, default=4, help="pixels per cell, a divisor of 16")
+    parser.add_argument("--png-dir", help="also write every level to <png-dir>/<index>.png")
+    args = parser.parse_args()
+
+    reader = LevelReader(args.levels)
+    if args.sample:
+        indices = np.sort(np.random.default_rng(args.seed).integers(0, len(reader), size=args.count))
+    else:
+        indices = np.arange(args.first, min(args.first + args.count, len(reader)))
+    (root, ext) = os.path.splitext(args.out)
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    if args.png_dir:
+        os.makedirs(args.png_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    for (sheet, first) in enumerate(range(0, len(indices), args.per_sheet)):
+        batch_indices = indices[first:first + args.per_sheet]
+        batch = reader.load(batch_indices)
+        images = rasterize(*(batch[layer] for layer in LAYERS), start=batch["start"], end=batch["end"],
+                           map_size=batch["map_size"], tile_size=args.tile)
+        save_png(f"{root}-{sheet:04d}{ext or '.png'}", contact_sheet(images, args.columns))
+        if args.png_dir:
+            for (index, image, size) in zip(batch_indices, images, batch["map_size"]):
+                s = int(size) * args.tile
+                save_png(os.path.join(args.png_dir, f"{index}.png"), image[:s, :s])
+    elapsed = time.perf_counter() - start
+    print(f"rasterized {len(indices)} levels in {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()